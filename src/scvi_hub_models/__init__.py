@@ -1,3 +1,10 @@
-from . import config, models
+from importlib import import_module
 
-__all__ = ["config", "models"]
+__all__ = ["config", "models", "utils"]
+
+
+def __getattr__(name: str):
+    # Submodules are imported on first access so that the CLI does not pay for scvi-tools on `--help`.
+    if name in __all__:
+        return import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
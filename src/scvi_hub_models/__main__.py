@@ -1,9 +1,9 @@
+import json
 import logging
+import os
 
 import click
 
-from scvi_hub_models.config import json_data_store
-
 logging.basicConfig(level=logging.INFO)
 
 
@@ -14,24 +14,101 @@ logging.basicConfig(level=logging.INFO)
 @click.option("--save_dir", type=str, help="Directory to save intermediate results (defaults temporary).")
 @click.option("--reload_data", type=bool, help="Reload the data or get from DVC.")
 @click.option("--reload_model", type=bool, help="Reload the model or get from DVC.")
+@click.option("--workers", type=int, default=1, help="Number of worker processes for multi-dataset workflows.")
+@click.option("--resume", is_flag=True, default=False, help="Skip stages completed in a previous run in save_dir.")
 def run_workflow(
     model_name: str,
     dry_run: bool,
     config_key: str = None,
     save_dir: str = None,
     reload_data: bool = False,
-    reload_model: bool = False) -> None:
+    reload_model: bool = False,
+    workers: int = 1,
+    resume: bool = False) -> None:
     """Run the workflow for a specific model."""
-    from importlib import import_module
-    if not config_key:
-        config_key = model_name
+    from scvi_hub_models._runner import build_workflow
+
+    workflow = build_workflow(
+        model_name,
+        config_key=config_key,
+        save_dir=save_dir,
+        dry_run=dry_run,
+        reload_data=reload_data,
+        reload_model=reload_model,
+        workers=workers,
+        resume=resume,
+    )
+    try:
+        with workflow.track_artifacts(), workflow.upload_queue:
+            workflow.run()
+    finally:
+        if workflow.profiler.records:
+            click.echo(workflow.profiler.format_table())
+
+
+@click.command()
+@click.argument("jobs", nargs=-1)
+@click.option("--all", "run_all", is_flag=True, default=False, help="Run every model with a config.")
+@click.option("--workers", type=int, default=1, help="Maximum number of workflows running at the same time.")
+@click.option("--max_memory_gb", type=float, default=None, help="Memory budget shared by running workflows.")
+@click.option("--max_threads", type=int, default=None, help="Thread budget shared by running workflows.")
+@click.option("--dry_run", type=bool, default=False, help="Dry run the workflows.")
+@click.option("--save_dir", type=str, help="Directory with one subdirectory per workflow (defaults temporary).")
+@click.option("--reload_data", type=bool, help="Reload the data or get from DVC.")
+@click.option("--reload_model", type=bool, help="Reload the model or get from DVC.")
+@click.option("--resume", is_flag=True, default=False, help="Skip stages completed in a previous run in save_dir.")
+@click.option("--report", type=str, default=None, help="JSON file for the combined status report.")
+def run_many(
+    jobs: tuple[str],
+    run_all: bool,
+    workers: int,
+    max_memory_gb: float | None,
+    max_threads: int | None,
+    dry_run: bool,
+    save_dir: str = None,
+    reload_data: bool = False,
+    reload_model: bool = False,
+    resume: bool = False,
+    report: str = None,
+) -> None:
+    """Run the workflows JOBS, given as MODEL or MODEL:CONFIG_KEY, in long-lived worker processes."""
+    from scvi_hub_models._runner import PRELOAD_MODULES, job_resources, parse_job, run_job, workflow_configs
+    from scvi_hub_models.utils import format_summary, run_scheduled
+
+    specs = [parse_job(job) for job in jobs]
+    if run_all:
+        specs += [(key, key) for key in workflow_configs() if (key, key) not in specs]
+    if not specs:
+        raise click.UsageError("Pass at least one model or --all.")
 
-    workflow_module = import_module(f"scvi_hub_models.models._{model_name}")
-    Workflow = workflow_module._Workflow
-    config = json_data_store[config_key]
+    scheduled = []
+    for model_name, config_key in specs:
+        kwargs = {
+            "save_dir": None if save_dir is None else os.path.join(save_dir, config_key),
+            "dry_run": dry_run,
+            "reload_data": reload_data,
+            "reload_model": reload_model,
+            "resume": resume,
+        }
+        scheduled.append(
+            {
+                "name": config_key,
+                "fn": run_job,
+                "args": (model_name, config_key),
+                "kwargs": kwargs,
+                **job_resources(config_key),
+            }
+        )
 
-    workflow = Workflow(save_dir=save_dir, dry_run=dry_run, config=config, reload_data=reload_data, reload_model=reload_model)
-    workflow.run()
+    summary = run_scheduled(
+        scheduled, workers, max_memory_gb=max_memory_gb, max_threads=max_threads, preload=PRELOAD_MODULES
+    )
+    click.echo(format_summary(summary))
+    if report is not None:
+        with open(report, "w") as f:
+            json.dump(summary, f, indent=2)
+    if any(result["status"] != "success" for result in summary.values()):
+        raise SystemExit(1)
 
 
 if __name__ == "__main__":
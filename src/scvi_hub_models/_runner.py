@@ -0,0 +1,78 @@
+import logging
+import os
+
+from scvi_hub_models.config import json_data_store
+
+logger = logging.getLogger(__name__)
+
+# modules preloaded by the workers of `run_many`
+PRELOAD_MODULES = ("torch", "scanpy", "scvi", "scvi_hub_models.models")
+
+
+def build_workflow(
+    model_name: str,
+    config_key: str | None = None,
+    save_dir: str | None = None,
+    dry_run: bool = False,
+    reload_data: bool = False,
+    reload_model: bool = False,
+    workers: int = 1,
+    resume: bool = False,
+):
+    """Instantiate the workflow of ``model_name`` with the config ``config_key``."""
+    from importlib import import_module
+
+    if not config_key:
+        config_key = model_name
+
+    workflow_module = import_module(f"scvi_hub_models.models._{model_name}")
+    Workflow = workflow_module._Workflow
+    config = json_data_store[config_key]
+
+    return Workflow(
+        save_dir=save_dir,
+        dry_run=dry_run,
+        config=config,
+        reload_data=reload_data,
+        reload_model=reload_model,
+        workers=workers,
+        resume=resume,
+    )
+
+
+def run_job(model_name: str, config_key: str | None = None, **kwargs) -> list[dict]:
+    """Run a workflow with DVC tracking and return its stage records.
+
+    ``kwargs`` are passed to :func:`build_workflow`. Used as the task of the batch runner, so it
+    has to stay importable at module level.
+    """
+    workflow = build_workflow(model_name, config_key, **kwargs)
+    try:
+        with workflow.track_artifacts(), workflow.upload_queue:
+            workflow.run()
+    finally:
+        if workflow.profiler.records:
+            logger.info(f"{config_key or model_name}:\n{workflow.profiler.format_table()}")
+    return workflow.profiler.records
+
+
+def workflow_configs() -> list[str]:
+    """Config keys that have a workflow module of the same name, excluding test configs."""
+    models_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
+    return [
+        config_key
+        for config_key in json_data_store
+        if not config_key.startswith("test") and os.path.isfile(os.path.join(models_dir, f"_{config_key}.py"))
+    ]
+
+
+def parse_job(spec: str) -> tuple[str, str]:
+    """Split a ``MODEL[:CONFIG_KEY]`` job specification into model name and config key."""
+    model_name, _, config_key = spec.partition(":")
+    return model_name, config_key or model_name
+
+
+def job_resources(config_key: str) -> dict:
+    """Resource hints of a workflow from the ``resources`` block of its config."""
+    resources = json_data_store[config_key].get("resources", {})
+    return {key: resources[key] for key in ("memory_gb", "threads") if resources.get(key) is not None}
@@ -0,0 +1,15 @@
+from ._download import benchmark_download
+from ._genes import benchmark_gene_alignment
+from ._suite import benchmark_config, compare_to_baseline, environment_info, run_benchmark, write_results
+from ._synthetic import synthetic_adata
+
+__all__ = [
+    "benchmark_config",
+    "benchmark_download",
+    "benchmark_gene_alignment",
+    "compare_to_baseline",
+    "environment_info",
+    "run_benchmark",
+    "synthetic_adata",
+    "write_results",
+]
@@ -0,0 +1,91 @@
+import json
+import logging
+import os
+
+import click
+
+logging.basicConfig(level=logging.INFO)
+
+
+@click.command()
+@click.option("--n_cells", type=int, multiple=True, default=[10_000], help="Number of cells, can be repeated.")
+@click.option("--modality", type=click.Choice(["rna", "cite"]), multiple=True, default=["rna"], help="Can be repeated.")
+@click.option("--n_genes", type=int, default=2_000, help="Number of genes.")
+@click.option("--max_epochs", type=int, default=1, help="Training epochs of the benchmarked model.")
+@click.option("--criticism_max_cells", type=int, default=None, help="Subsample size for the criticism report.")
+@click.option("--load_mode", type=click.Choice(["memory", "backed"]), default="memory", help="Dataset load mode.")
+@click.option("--output", type=str, default="benchmark_results.json", help="JSON file for the results.")
+@click.option("--gene_alignment", is_flag=True, default=False, help="Also run the gene alignment micro-benchmarks.")
+@click.option("--download", is_flag=True, default=False, help="Also run the download benchmarks on a local server.")
+@click.option("--baseline", type=str, default=None, help="JSON results to compare against.")
+@click.option("--threshold", type=float, default=0.2, help="Relative slowdown that counts as a regression.")
+def run_benchmarks(
+    n_cells: tuple[int],
+    modality: tuple[str],
+    n_genes: int,
+    max_epochs: int,
+    criticism_max_cells: int | None,
+    load_mode: str,
+    output: str,
+    gene_alignment: bool,
+    download: bool,
+    baseline: str | None,
+    threshold: float,
+) -> None:
+    """Benchmark the workflow stages offline on synthetic data."""
+    # CUDA is initialized lazily, so hiding GPUs here keeps the benchmark on CPU
+    os.environ["CUDA_VISIBLE_DEVICES"] = ""
+    from scvi_hub_models.benchmarks import (
+        benchmark_download,
+        benchmark_gene_alignment,
+        compare_to_baseline,
+        environment_info,
+        run_benchmark,
+        write_results,
+    )
+
+    criticism_settings = {"n_samples": 3, "cell_type_key": "labels", "max_cells": criticism_max_cells}
+    results = {"environment": environment_info(), "scenarios": {}}
+    for scenario_modality in modality:
+        for scenario_n_cells in n_cells:
+            scenario = f"{scenario_modality}-{scenario_n_cells}"
+            click.echo(f"Running benchmark {scenario}.")
+            results["scenarios"][scenario] = run_benchmark(
+                n_cells=scenario_n_cells,
+                modality=scenario_modality,
+                n_genes=n_genes,
+                max_epochs=max_epochs,
+                load_mode=load_mode,
+                criticism_settings=criticism_settings,
+            )
+            write_results(results, output)
+
+    if gene_alignment:
+        click.echo("Running gene alignment benchmarks.")
+        results["gene_alignment"] = benchmark_gene_alignment()
+        write_results(results, output)
+        for scenario, timings in results["gene_alignment"].items():
+            click.echo(f"{scenario}: " + ", ".join(f"{name} {value * 1000:.1f} ms" for name, value in timings.items()))
+
+    if download:
+        click.echo("Running download benchmarks.")
+        results["download"] = benchmark_download()
+        write_results(results, output)
+        for scenario, timings in results["download"].items():
+            click.echo(
+                f"{scenario}: retrieve {timings['retrieve_mb_s']:.0f} MB/s, "
+                f"download_file {timings['download_file_mb_s']:.0f} MB/s, "
+                f"parallel {timings['download_file_parallel_mb_s']:.0f} MB/s"
+            )
+
+    if baseline is not None:
+        with open(baseline) as f:
+            regressions = compare_to_baseline(results, json.load(f), threshold=threshold)
+        for regression in regressions:
+            click.echo(f"Regression: {regression}")
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    run_benchmarks()
@@ -0,0 +1,127 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from tempfile import TemporaryDirectory
+
+from scvi_hub_models.utils import download_file
+
+
+class _RangeHandler(SimpleHTTPRequestHandler):
+    """Static file handler with single byte-range requests, as served by Zenodo and S3."""
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        path = self.translate_path(self.path)
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return
+        size = os.path.getsize(path)
+        etag = f'"{os.stat(path).st_mtime_ns}-{size}"'
+        start, stop = 0, size
+        match = re.fullmatch(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        if match and self.headers.get("If-Range", etag) == etag:
+            start = int(match.group(1))
+            stop = min(int(match.group(2)) + 1, size) if match.group(2) else size
+            if start >= size:
+                self.send_error(416)
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{stop - 1}/{size}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(stop - start))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", etag)
+        self.end_headers()
+
+        limit = stop - start
+        with open(path, "rb") as f:
+            f.seek(start)
+            while limit > 0 and (chunk := f.read(min(2**20, limit))):
+                self.wfile.write(chunk)
+                limit -= len(chunk)
+
+
+@contextmanager
+def _serve_directory(directory: str):
+    """Serve ``directory`` over HTTP on a free local port, yielding the base URL."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(_RangeHandler, directory=directory))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _write_payload(path: str, size: int, seed: int) -> str:
+    """Write ``size`` pseudo-random bytes to ``path`` and return their SHA256."""
+    hasher = hashlib.sha256()
+    block = hashlib.sha256(str(seed).encode()).digest() * (2**20 // 32)
+    with open(path, "wb") as f:
+        for start in range(0, size, len(block)):
+            chunk = block[: size - start]
+            f.write(chunk)
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def benchmark_download(
+    size_mb: tuple[int, ...] = (64, 512),
+    connections: int = 4,
+    repeats: int = 3,
+    seed: int = 0,
+) -> dict[str, dict]:
+    """Time downloads from a local HTTP server that supports ranges and injected failures.
+
+    ``retrieve`` is :func:`pooch.retrieve`, which writes the file and reads it back to check the
+    hash, ``download_file`` is :func:`~scvi_hub_models.utils.download_file` over one connection
+    and ``download_file_parallel`` over ``connections`` byte ranges. Hash verification, resuming
+    and parallel ranges are covered by ``tests/test_download.py``.
+
+    Returns
+    -------
+    Mapping from ``"size-<n>mb"`` to the best wall time in seconds and throughput in MB/s of every
+    downloader.
+    """
+    from pooch import retrieve
+
+    results = {}
+    with TemporaryDirectory() as served, TemporaryDirectory() as downloads, _serve_directory(served) as base:
+        for size in size_mb:
+            name = f"payload_{size}mb.bin"
+            sha256 = _write_payload(os.path.join(served, name), size * 2**20, seed)
+            url = f"{base}/{name}"
+
+            timings = {}
+            for downloader in ("retrieve", "download_file", "download_file_parallel"):
+                best = float("inf")
+                for _ in range(repeats):
+                    target = os.path.join(downloads, name)
+                    start = time.perf_counter()
+                    if downloader == "retrieve":
+                        retrieve(url, known_hash=sha256, fname=name, path=downloads, progressbar=False)
+                    else:
+                        parallel = downloader == "download_file_parallel"
+                        download_file(
+                            url,
+                            target,
+                            known_hash=sha256,
+                            connections=connections if parallel else 1,
+                            min_split_size=2**20,
+                        )
+                    best = min(best, time.perf_counter() - start)
+                    os.remove(target)
+                timings[downloader] = best
+                timings[f"{downloader}_mb_s"] = size / best
+            results[f"size-{size}mb"] = timings
+            os.remove(os.path.join(served, name))
+    return results
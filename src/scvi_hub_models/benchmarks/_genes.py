@@ -0,0 +1,55 @@
+import time
+
+import anndata
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from scvi_hub_models.utils import align_genes, gene_indexer
+
+
+def _best_time(fn, repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def benchmark_gene_alignment(
+    n_genes: tuple[int, ...] = (30_000, 60_000),
+    n_cells: int = 10_000,
+    missing_fraction: float = 0.01,
+    density: float = 0.01,
+    repeats: int = 3,
+    seed: int = 0,
+) -> dict[str, dict]:
+    """Time gene alignment against a shuffled reference gene list.
+
+    For every number of genes, ``loop`` is the per-gene ``get_loc`` lookup that workflows used
+    before, ``indexer`` the vectorized :func:`~scvi_hub_models.utils.gene_indexer` and ``align``
+    the full :func:`~scvi_hub_models.utils.align_genes` of a CSR dataset with ``n_cells`` cells,
+    where ``missing_fraction`` of the reference genes are padded.
+
+    Returns
+    -------
+    Mapping from ``"genes-<n>"`` to the best wall time in seconds of every operation.
+    """
+    rng = np.random.default_rng(seed)
+    results = {}
+    for n in n_genes:
+        var_names = pd.Index([f"gene_{i}" for i in range(n)])
+        n_missing = int(missing_fraction * n)
+        reference = np.concatenate([rng.permutation(var_names)[: n - n_missing], [f"new_{i}" for i in range(n_missing)]])
+        present = reference[: n - n_missing]
+        adata = anndata.AnnData(
+            X=sparse.random(n_cells, n, density=density, format="csr", random_state=seed, dtype=np.float32),
+            var=pd.DataFrame(index=var_names),
+        )
+        results[f"genes-{n}"] = {
+            "loop": _best_time(lambda: [var_names.get_loc(gene) for gene in present], repeats),  # noqa: B023
+            "indexer": _best_time(lambda: gene_indexer(var_names, reference), repeats),  # noqa: B023
+            "align": _best_time(lambda: align_genes(adata, reference), repeats),  # noqa: B023
+        }
+    return results
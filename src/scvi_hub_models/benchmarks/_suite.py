@@ -0,0 +1,192 @@
+import json
+import logging
+import os
+import platform
+from tempfile import TemporaryDirectory
+
+from scvi_hub_models.config import json_data_store
+from scvi_hub_models.models import BaseModelWorkflow
+
+from ._synthetic import synthetic_adata
+
+logger = logging.getLogger(__name__)
+
+METRICS = (
+    "wall_time",
+    "cpu_time",
+    "process_cpu_time",
+    "peak_rss",
+    "tracemalloc_peak",
+    "bytes_read",
+    "bytes_written",
+)
+
+MODALITIES = {
+    "rna": {"model_class": "SCVI", "n_proteins": 0},
+    "cite": {"model_class": "TOTALVI", "n_proteins": 100},
+}
+
+
+class _BenchmarkWorkflow(BaseModelWorkflow):
+    """Workflow that runs the stages offline, with uploads and DVC tracking stubbed out."""
+
+    def _upload_hub_model(self, hub_model, repo_name=None, **kwargs):
+        logger.info("Skipping upload in benchmark.")
+        return hub_model
+
+    @property
+    def id(self) -> str:
+        return "benchmark"
+
+
+def benchmark_config(modality: str = "rna", **settings) -> dict:
+    """Workflow config for a benchmark scenario, based on the ``test_scvi`` config.
+
+    ``settings`` override top-level config entries, e.g. ``latent_settings`` or ``load_mode``.
+    """
+    base_config = json_data_store["test_scvi"]
+    config = {
+        "model_dir": "benchmark_model",
+        "model_class": MODALITIES[modality]["model_class"],
+        "repo_name": "scvi-tools/benchmark",
+        "minify_model": True,
+        "cache_settings": {"enabled": False},
+        "metadata": dict(base_config["metadata"]),
+        "criticism_settings": {"n_samples": 3, "cell_type_key": "labels"},
+    }
+    config.update(settings)
+    return config
+
+
+def _setup_and_train(adata, model_class: str, max_epochs: int):
+    if model_class == "SCVI":
+        from scvi.model import SCVI
+
+        SCVI.setup_anndata(adata, batch_key="batch", labels_key="labels")
+        model = SCVI(adata)
+    else:
+        from scvi.model import TOTALVI
+
+        TOTALVI.setup_mudata(
+            adata,
+            batch_key="batch",
+            modalities={"rna_layer": "rna", "protein_layer": "protein", "batch_key": "rna"},
+        )
+        model = TOTALVI(adata)
+    model.train(max_epochs=max_epochs, accelerator="cpu")
+    return model
+
+
+def run_benchmark(
+    n_cells: int = 10_000,
+    modality: str = "rna",
+    n_genes: int = 2_000,
+    n_train_cells: int = 5_000,
+    max_epochs: int = 1,
+    seed: int = 0,
+    **settings,
+) -> dict[str, dict]:
+    """Time the workflow stages on a synthetic dataset.
+
+    The model is trained briefly on a subset of ``n_train_cells`` cells and then loaded onto the
+    full dataset, so that the timed stages (``load``, ``model_load``, ``minify`` with its
+    ``criticism``, ``latent`` and ``save_model`` steps, and ``hub_model``) do not depend on
+    training time. ``load`` reads the dataset like :meth:`~BaseModelWorkflow.get_adata` does
+    after pulling it, the DVC pull itself is not timed.
+
+    Parameters
+    ----------
+    n_cells
+        Number of cells of the synthetic dataset.
+    modality
+        ``"rna"`` for an RNA-only dataset and SCVI, ``"cite"`` for a CITE-seq-like MuData and TOTALVI.
+    n_genes
+        Number of genes.
+    n_train_cells
+        Number of cells the model is trained on.
+    max_epochs
+        Number of training epochs.
+    seed
+        Seed of the synthetic data.
+    **settings
+        Config overrides passed to :func:`benchmark_config`.
+
+    Returns
+    -------
+    Mapping from stage name to its recorded metrics.
+    """
+    config = benchmark_config(modality, **settings)
+    data = synthetic_adata(
+        n_cells=n_cells, n_genes=n_genes, n_proteins=MODALITIES[modality]["n_proteins"], seed=seed
+    )
+
+    with TemporaryDirectory() as save_dir:
+        workflow = _BenchmarkWorkflow(save_dir=save_dir, config=config)
+        if modality == "cite":
+            data_path = os.path.join(save_dir, "data.h5mu")
+            data.write_h5mu(data_path)
+        else:
+            data_path = os.path.join(save_dir, "data.h5ad")
+            data.write_h5ad(data_path)
+        train_data = data[: min(n_train_cells, n_cells)].copy()
+        del data
+
+        model_path = os.path.join(save_dir, config["model_dir"])
+        _setup_and_train(train_data, config["model_class"], max_epochs).save(model_path, overwrite=True)
+        del train_data
+
+        profiler = workflow.profiler
+        with profiler.profile("load"):
+            # the dataset as it is read after a DVC pull, including the backed working copy
+            adata = workflow._read_dataset(data_path)
+        with profiler.profile("model_load"):
+            model = workflow.default_load_model(adata, config["model_class"], model_path)
+        with profiler.profile("minify"):
+            mini_model_path = workflow._minify_and_save_model(model, adata)
+        with profiler.profile("hub_model"):
+            hub_model = workflow._create_hub_model(mini_model_path)
+        workflow._upload_hub_model(hub_model)
+
+        return {record["stage"]: {metric: record[metric] for metric in METRICS} for record in profiler.records}
+
+
+def environment_info() -> dict:
+    """Versions of the packages that determine benchmark results."""
+    import anndata
+    import scvi
+    import torch
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scvi-tools": scvi.__version__,
+        "anndata": anndata.__version__,
+        "torch": torch.__version__,
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare_to_baseline(
+    results: dict, baseline: dict, threshold: float = 0.2, metric: str = "wall_time", min_value: float = 0.1
+) -> list[str]:
+    """Return a message for every scenario and stage that regressed against ``baseline``.
+
+    A stage regressed if ``metric`` grew by more than ``threshold`` (relative). Stages whose
+    baseline value is below ``min_value`` are ignored, as their timings are dominated by noise.
+    """
+    regressions = []
+    for scenario, stages in results["scenarios"].items():
+        baseline_stages = baseline["scenarios"].get(scenario, {})
+        for stage, metrics in stages.items():
+            old, new = baseline_stages.get(stage, {}).get(metric, None), metrics.get(metric, None)
+            if old is None or new is None or old < min_value:
+                continue
+            if new > old * (1 + threshold):
+                regressions.append(f"{scenario} {stage}: {metric} {old:.3g} -> {new:.3g} (+{new / old - 1:.0%})")
+    return regressions
+
+
+def write_results(results: dict, path: str) -> None:
+    """Write benchmark results to a JSON file."""
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
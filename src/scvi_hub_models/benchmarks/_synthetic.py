@@ -0,0 +1,76 @@
+import anndata
+import mudata
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+def synthetic_adata(
+    n_cells: int = 10_000,
+    n_genes: int = 2_000,
+    n_proteins: int = 0,
+    n_batches: int = 2,
+    n_labels: int = 10,
+    density: float = 0.05,
+    chunk_size: int = 100_000,
+    seed: int = 0,
+) -> anndata.AnnData | mudata.MuData:
+    """Generate a synthetic count dataset at a given scale.
+
+    Counts are sparse (CSR) with integer negative binomial values and generated in chunks of
+    cells, so that datasets with millions of cells fit in memory. scvi-tools' posterior predictive
+    checks only accept sparse counts with an integer dtype.
+
+    Parameters
+    ----------
+    n_cells
+        Number of cells.
+    n_genes
+        Number of genes.
+    n_proteins
+        Number of proteins. If positive, a CITE-seq-like :class:`~mudata.MuData` with ``"rna"``
+        and ``"protein"`` modalities is returned, otherwise an RNA-only AnnData.
+    n_batches
+        Number of batches in ``obs["batch"]``.
+    n_labels
+        Number of cell types in ``obs["labels"]``.
+    density
+        Approximate fraction of non-zero RNA counts.
+    chunk_size
+        Number of cells generated at a time.
+    seed
+        Seed of the random number generator.
+    """
+    rng = np.random.default_rng(seed)
+    nnz_per_cell = max(1, int(density * n_genes))
+    chunks = []
+    for start in range(0, n_cells, chunk_size):
+        n_chunk = min(chunk_size, n_cells - start)
+        # genes drawn twice for a cell are summed by `sum_duplicates`
+        indices = np.sort(rng.integers(n_genes, size=(n_chunk, nnz_per_cell), dtype=np.int32), axis=1)
+        data = (rng.negative_binomial(2, 0.3, size=indices.size) + 1).astype(np.int32)
+        indptr = np.arange(0, indices.size + 1, nnz_per_cell, dtype=np.int64)
+        chunk = sparse.csr_matrix((data, indices.ravel(), indptr), shape=(n_chunk, n_genes))
+        chunk.sum_duplicates()
+        chunks.append(chunk)
+    counts = sparse.vstack(chunks, format="csr")
+
+    obs = pd.DataFrame(
+        {
+            "batch": pd.Categorical(rng.integers(n_batches, size=n_cells).astype(str)),
+            "labels": pd.Categorical(rng.integers(n_labels, size=n_cells).astype(str)),
+        },
+        index=[f"cell_{i}" for i in range(n_cells)],
+    )
+    var = pd.DataFrame(index=[f"gene_{i}" for i in range(n_genes)])
+    rna = anndata.AnnData(X=counts, obs=obs, var=var)
+    if n_proteins <= 0:
+        return rna
+
+    protein_counts = rng.negative_binomial(5, 0.1, size=(n_cells, n_proteins)).astype(np.float32)
+    protein = anndata.AnnData(
+        X=protein_counts,
+        obs=obs.copy(),
+        var=pd.DataFrame(index=[f"protein_{i}" for i in range(n_proteins)]),
+    )
+    return mudata.MuData({"rna": rna, "protein": protein})
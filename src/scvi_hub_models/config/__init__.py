@@ -1,22 +1,49 @@
 import json
 import os
+from collections.abc import Iterator, Mapping
 
 from frozendict import frozendict
 
-# Initialize a dictionary to store frozendicts
-json_data_store = {}
 repo_path = os.path.dirname(os.path.abspath(__file__))
 
-for file_name in os.listdir(repo_path):
-    if file_name.endswith(".json"):  # Process only JSON files
-        file_path = os.path.join(repo_path, file_name)
 
-        with open(file_path) as f:
-            data = json.load(f)
+class _JsonDataStore(Mapping):
+    """Read-only mapping from config key to a :class:`~frozendict.frozendict` of its JSON file.
 
-        # Store the frozendict with the file name (without extension) as the key
-        key = os.path.splitext(file_name)[0]
-        json_data_store[key] = frozendict(data)
+    Configs are only parsed on first access to their key, so looking up a single ``config_key``
+    does not pay for parsing every JSON file in this directory.
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+        self._cache = {}
+
+    def _file_path(self, key: str) -> str:
+        return os.path.join(self._path, f"{key}.json")
+
+    def __getitem__(self, key: str) -> frozendict:
+        if key not in self._cache:
+            file_path = self._file_path(key)
+            if not os.path.isfile(file_path):
+                raise KeyError(key)
+            with open(file_path) as f:
+                self._cache[key] = frozendict(json.load(f))
+        return self._cache[key]
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, str) and (key in self._cache or os.path.isfile(self._file_path(key)))
+
+    def __iter__(self) -> Iterator[str]:
+        for file_name in sorted(os.listdir(self._path)):
+            if file_name.endswith(".json"):  # Process only JSON files
+                yield os.path.splitext(file_name)[0]
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
+# Store the frozendict with the file name (without extension) as the key
+json_data_store = _JsonDataStore(repo_path)
 
 # Expose the json_data_store as a module-level variable
 __all__ = ["json_data_store"]
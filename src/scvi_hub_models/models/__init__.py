@@ -1,3 +1,4 @@
 from ._base_workflow import BaseModelWorkflow
+from ._registry import MODEL_CLASSES, get_model_class, register_model_class
 
-__all__ = ["BaseModelWorkflow"]
+__all__ = ["MODEL_CLASSES", "BaseModelWorkflow", "get_model_class", "register_model_class"]
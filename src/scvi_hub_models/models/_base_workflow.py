@@ -1,27 +1,74 @@
+import hashlib
+import json
 import logging
 import os
+import time
+from contextlib import contextmanager, nullcontext
+from functools import cache
 from pathlib import Path
 from tempfile import TemporaryDirectory
 
 import anndata
-import git
 import mudata
+import numpy as np
 from anndata import __version__ as anndata_version
-from dvc.repo import Repo
 from frozendict import frozendict
-from pooch import retrieve
 from scvi.criticism import create_criticism_report
 from scvi.hub import HubMetadata, HubModel, HubModelCardHelper
 from scvi.model.base import BaseModelClass
 
+from scvi_hub_models.utils import (
+    ArtifactCache,
+    ArtifactTracker,
+    MetadataCache,
+    Profiler,
+    Stage,
+    UploadManifestStore,
+    UploadQueue,
+    apply_gene_selection,
+    cast_latent,
+    changed_files,
+    compute_gene_selection,
+    content_manifest,
+    create_chunked_criticism_report,
+    download_file,
+    file_fingerprint,
+    hash_anndata,
+    hash_inputs,
+    limit_threads,
+    read_dataset,
+    remote_manifest,
+    s3_to_https,
+    stratified_subsample,
+    write_backed_copy,
+    write_compact_h5ad,
+)
+
+from ._registry import get_model_class
+
 # Specify your repository and target file
 
 repo_path = os.path.abspath(Path(__file__).parent.parent.parent.parent)
-dvc_repo = Repo(repo_path)
-git_repo = git.Repo(repo_path)
 
 logger = logging.getLogger(__name__)
 
+
+@cache
+def get_dvc_repo():
+    """Return the DVC repository handle, initializing it on first use."""
+    from dvc.repo import Repo
+
+    return Repo(repo_path)
+
+
+@cache
+def get_git_repo():
+    """Return the git repository handle, initializing it on first use."""
+    import git
+
+    return git.Repo(repo_path)
+
+
 SUPPORTED_PPC_MODELS = [
     "SCVI",
     "SCANVI",
@@ -35,6 +82,18 @@ SUPPORTED_MINIFIED_MODELS = [
     "TOTALVI",
 ]
 
+# Default Hugging Face collections per model class, in the order scvi-tools matches them against class names,
+# replaced by ``upload_settings["collections"]`` and ``upload_settings["test_collection"]``
+HUB_COLLECTIONS = {
+    "SCANVI": "scvi-tools/scanvi-673c3a4aabddf849496e9079",
+    "CondSCVI": "scvi-tools/destvi-673c3dbf537347953810a215",
+    "SCVI": "scvi-tools/scvi-673c2c0f2bf4163ef14d018d",
+    "TOTALVI": "scvi-tools/totalvi-673c3d67e2882005a1d180c1",
+    "Stereoscope": "scvi-tools/stereoscope-673c3ddcf1f9f7542b8819d6",
+}
+TEST_HUB_COLLECTION = "scvi-tools/test-674f56b9eb86e62d57eac5cf"
+
+
 class BaseModelWorkflow:
     """Base class for model workflows.
 
@@ -52,8 +111,17 @@ class BaseModelWorkflow:
         If ``True``, the data will be reloaded. Otherwise, it will be pulled from DVC. Defaults to ``False``.
     reload_model
         If ``True``, the model will be reloaded. Otherwise, it will be pulled from DVC. Defaults to ``False``.
+    workers
+        Number of worker processes for workflows that process several datasets. Defaults to ``1``,
+        which runs everything in the current process.
+    resume
+        If ``True``, stages that completed in a previous run with the same inputs and ``save_dir``
+        are skipped. Defaults to ``False``.
     """
 
+    # CELLxGENE census version from which source datasets are downloaded
+    census_version = "stable"
+
     def __init__(
         self,
         save_dir: str | None = None,
@@ -61,12 +129,17 @@ class BaseModelWorkflow:
         config: frozendict | None = None,
         reload_data: bool = True,
         reload_model: bool = True,
+        workers: int = 1,
+        resume: bool = False,
     ):
         self.save_dir = save_dir
         self.dry_run = dry_run
         self.config = config
         self.reload_data = reload_data
         self.reload_model = reload_model
+        self.workers = workers
+        self.resume = resume
+        self._created_repos = set()
 
     @property
     def save_dir(self):
@@ -103,6 +176,62 @@ class BaseModelWorkflow:
             value = frozendict(value)
         self._config = value
 
+    @property
+    def artifact_cache(self) -> ArtifactCache | None:
+        """Persistent artifact cache configured by ``cache_settings``, ``None`` if disabled."""
+        if not hasattr(self, "_artifact_cache"):
+            cache_settings = self.config.get("cache_settings", {})
+            if cache_settings.get("enabled", True):
+                self._artifact_cache = ArtifactCache.from_config(cache_settings)
+            else:
+                self._artifact_cache = None
+        return self._artifact_cache
+
+    def _fetch_artifact(self, key: str, fetch, known_hash: str | None = None, variant: str | None = None) -> str:
+        """Resolve an artifact through the artifact cache.
+
+        ``fetch`` downloads the artifact into the directory it is passed and returns its path. If
+        the cache is disabled, the artifact is fetched into ``save_dir`` directly. Cached paths are
+        not evicted until they are passed to :meth:`_release_artifacts` or the process exits.
+        """
+        if self.artifact_cache is None:
+            return fetch(self.save_dir)
+        return self.artifact_cache.fetch(key, fetch, known_hash=known_hash, variant=variant)
+
+    def _release_artifacts(self, *paths: str) -> None:
+        """Allow the artifact cache to evict ``paths`` again once they are no longer read."""
+        if self.artifact_cache is None:
+            return
+        for path in paths:
+            self.artifact_cache.release(path)
+
+    @property
+    def artifact_tracker(self) -> ArtifactTracker:
+        """DVC tracker for workflow outputs, configured by ``dvc_settings``.
+
+        Outputs tracked inside :meth:`track_artifacts` are added, committed and pushed together
+        at the end of the block.
+        """
+        if not hasattr(self, "_artifact_tracker"):
+            dvc_settings = self.config.get("dvc_settings", {})
+            self._artifact_tracker = ArtifactTracker(
+                get_dvc_repo(),
+                get_git_repo(),
+                jobs=dvc_settings.get("jobs", None),
+                dvc_remote=dvc_settings.get("remote", None),
+                git_remote=dvc_settings.get("git_remote", "origin"),
+            )
+        return self._artifact_tracker
+
+    @contextmanager
+    def track_artifacts(self):
+        """Batch DVC tracking of all outputs produced within the block into one transaction."""
+        if self.dry_run:
+            yield
+            return
+        with self.artifact_tracker:
+            yield
+
     @property
     def reload_data(self):
         return self._reload_data
@@ -123,6 +252,159 @@ class BaseModelWorkflow:
             raise AttributeError("`reload_model` can only be set once.")
         self._reload_model = value
 
+    @property
+    def workers(self):
+        return self._workers
+
+    @workers.setter
+    def workers(self, value: int):
+        if hasattr(self, "_workers"):
+            raise AttributeError("`workers` can only be set once.")
+        elif value < 1:
+            raise ValueError("`workers` must be at least 1.")
+        self._workers = value
+
+    @property
+    def resume(self):
+        return self._resume
+
+    @resume.setter
+    def resume(self, value: bool):
+        if hasattr(self, "_resume"):
+            raise AttributeError("`resume` can only be set once.")
+        self._resume = value
+
+    @property
+    def profiler(self) -> Profiler:
+        """Per-stage timing and memory profiler, configured by ``instrumentation_settings``.
+
+        The report is written to ``instrumentation.json`` in ``save_dir``.
+        """
+        if not hasattr(self, "_profiler"):
+            instrumentation_settings = self.config.get("instrumentation_settings", {})
+            self._profiler = Profiler(
+                report_path=None if self.dry_run else os.path.join(self.save_dir, "instrumentation.json"),
+                trace_memory=instrumentation_settings.get("tracemalloc", False),
+                sample_interval=instrumentation_settings.get("sample_interval", 0.1),
+            )
+        return self._profiler
+
+    @property
+    def upload_queue(self) -> UploadQueue:
+        """Background queue for Hugging Face uploads, configured by ``upload_settings``.
+
+        Can be set once, e.g. to share a queue between workflows. Uploads are only guaranteed to
+        have finished after leaving the queue as a context manager.
+        """
+        if not hasattr(self, "_upload_queue"):
+            upload_settings = self.config.get("upload_settings", {})
+            self._upload_queue = UploadQueue(
+                max_workers=upload_settings.get("workers", 2),
+                retries=upload_settings.get("retries", 3),
+                backoff=upload_settings.get("backoff", 1.0),
+            )
+        return self._upload_queue
+
+    @upload_queue.setter
+    def upload_queue(self, value: UploadQueue):
+        if hasattr(self, "_upload_queue"):
+            raise AttributeError("`upload_queue` can only be set once.")
+        self._upload_queue = value
+
+    @property
+    def upload_manifests(self) -> UploadManifestStore:
+        """Content of the last push to each repository, stored in ``upload_settings["manifest_dir"]``."""
+        if not hasattr(self, "_upload_manifests"):
+            upload_settings = self.config.get("upload_settings", {})
+            self._upload_manifests = UploadManifestStore(upload_settings.get("manifest_dir", None))
+        return self._upload_manifests
+
+    @property
+    def metadata_cache(self) -> MetadataCache:
+        """Cache of remote record listings, configured by ``metadata_settings`` (``cache_dir``, ``ttl`` in seconds)."""
+        if not hasattr(self, "_metadata_cache"):
+            metadata_settings = self.config.get("metadata_settings", {})
+            self._metadata_cache = MetadataCache(
+                metadata_settings.get("cache_dir", None),
+                ttl=metadata_settings.get("ttl", 3600.0),
+            )
+        return self._metadata_cache
+
+    def _make_stage(self, name: str, inputs: dict | None = None) -> Stage:
+        manifest_path = os.path.join(self.save_dir, ".stages", f"{name.replace('/', '--')}.json")
+        return Stage(
+            name,
+            manifest_path,
+            inputs={
+                "config": dict(self.config),
+                "reload_data": self.reload_data,
+                "reload_model": self.reload_model,
+                **(inputs or {}),
+            },
+            resume=self.resume and not self.dry_run,
+        )
+
+    @contextmanager
+    def stage(self, name: str, inputs: dict | None = None):
+        """Checkpoint a workflow stage.
+
+        Yields a :class:`~scvi_hub_models.utils.Stage` whose ``done`` attribute is ``True`` if
+        :attr:`resume` is set and the stage completed before with the same config, ``reload_data``,
+        ``reload_model`` and ``inputs``, e.g. :meth:`_artifact_digests`, in which case ``outputs``
+        holds the recorded outputs and the stage body should be skipped.
+        Otherwise, the body should set ``outputs`` and a completion manifest is written to
+        ``save_dir`` when the block exits without an error.
+        """
+        stage = self._make_stage(name, inputs)
+        with self.profiler.profile(name):
+            yield stage
+        if not stage.done and not self.dry_run:
+            stage.complete()
+
+    @staticmethod
+    def _dvc_digest(path: str) -> str | None:
+        """SHA256 of the DVC file of ``path``, which records the hash of the tracked data, ``None`` if untracked."""
+        dvc_path = f"{path}.dvc"
+        if not os.path.exists(dvc_path):
+            return None
+        with open(dvc_path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+
+    def _source_digest(self) -> str | None:
+        """Digest of the source data from which :meth:`download_adata` creates the dataset.
+
+        The configured ``hash`` or ``reference_adata_hash`` of ``extra_data_kwargs``, or for
+        CELLxGENE datasets without a hash the dataset ID and the release of :attr:`census_version`.
+        """
+        extra_data_kwargs = self.config["extra_data_kwargs"]
+        known_hash = extra_data_kwargs.get("hash", None) or extra_data_kwargs.get("reference_adata_hash", None)
+        if known_hash is None and "reference_adata_cxg_id" in extra_data_kwargs:
+            return f"cellxgene:{self._census_release(self.census_version)}:{extra_data_kwargs['reference_adata_cxg_id']}"
+        return known_hash
+
+    def _model_digest(self) -> str | None:
+        """Digest of the model of :meth:`get_model` if it is not trained from the dataset and the config."""
+        if self.reload_model:
+            return None
+        return self._dvc_digest(os.path.join(f'{repo_path}/data/', self.config['model_dir']))
+
+    def _artifact_digests(self) -> dict:
+        """Digests of the dataset and model of the workflow, as inputs of the stages that use them.
+
+        Datasets and models pulled from DVC are identified by their DVC files, regenerated datasets
+        by :meth:`_source_digest` and converted models by :meth:`_model_digest`. Resolved without
+        downloading or loading anything.
+        """
+        if self.dry_run:
+            return {}
+        if self.reload_data:
+            data = self._source_digest()
+        else:
+            data = self._dvc_digest(
+                os.path.join(f'{repo_path}/data/', self.config['extra_data_kwargs']['large_training_file_name'])
+            )
+        return {"data": data, "model": self._model_digest()}
+
     def get_adata(self) -> anndata.AnnData | None:
         """Download and load the dataset."""
         logger.info("Loading dataset.")
@@ -130,19 +412,135 @@ class BaseModelWorkflow:
             return None
         if self.reload_data:
             path_file = os.path.join(f'{repo_path}/data/', self.config['extra_data_kwargs']['large_training_file_name'])
-            print(path_file)
-            adata = self.download_adata(path_file)
-            dvc_repo.add(path_file)
-            git_repo.index.commit(f"Track {path_file} with DVC")
-            dvc_repo.push()
-            git_repo.remote().push()
+            with self.stage("get_adata", inputs={"data": self._artifact_digests()["data"]}) as stage:
+                if stage.done:
+                    adata = self._read_dataset(path_file)
+                else:
+                    adata = self.download_adata(path_file)
+                    stage.outputs["path"] = path_file
+            self.artifact_tracker.track(path_file)
+            if self.load_mode == "backed" and not stage.done:
+                # release the in-memory copy and continue from the file that was just written
+                del adata
+                adata = self._read_dataset(path_file)
         else:
             path_file = os.path.join(f'{repo_path}/data/', self.config['extra_data_kwargs']['large_training_file_name'])
-            dvc_repo.pull([path_file])
-            if path_file.endswith(".h5mu"):
-                adata = mudata.read_h5mu(path_file)
-            else:
-                adata = anndata.read_h5ad(path_file)
+            get_dvc_repo().pull([path_file])
+            adata = self._read_dataset(path_file)
+        return adata
+
+    @property
+    def load_mode(self) -> str:
+        """How datasets are read from disk, set by the ``load_mode`` config setting.
+
+        ``"memory"`` (default) reads the full dataset into memory. ``"backed"`` opens the file in
+        backed mode, so that only ``.obs``, ``.var`` and the embeddings are held in memory and
+        counts are streamed from disk until a stage calls :meth:`_materialize`.
+        """
+        load_mode = self.config.get("load_mode", "memory")
+        if load_mode not in ("memory", "backed"):
+            raise ValueError(f"`load_mode` must be one of 'memory' or 'backed', got {load_mode}.")
+        return load_mode
+
+    def _write_adata(self, adata: anndata.AnnData | mudata.MuData, path: str) -> None:
+        """Write a dataset to ``.h5ad`` or ``.h5mu``, e.g. the file that is tracked with DVC."""
+        if isinstance(adata, mudata.MuData):
+            adata.write_h5mu(path)
+        else:
+            adata.write_h5ad(path)
+
+    def _read_adata(self, path: str) -> anndata.AnnData | mudata.MuData:
+        """Read an ``.h5ad`` or ``.h5mu`` file according to :attr:`load_mode`.
+
+        See :func:`~scvi_hub_models.utils.read_dataset` for which layers are streamed from disk in
+        backed mode.
+        """
+        return read_dataset(path, backed=self.load_mode == "backed")
+
+    def _read_dataset(self, path: str) -> anndata.AnnData | mudata.MuData:
+        """Read a dataset written by :meth:`download_adata` according to :attr:`load_mode`.
+
+        In backed mode, a working copy in ``save_dir`` is opened instead, in which the ``counts``
+        layers are stored as ``X`` so that they are streamed from disk, see
+        :func:`~scvi_hub_models.utils.write_backed_copy`. Models do not use the replaced ``X``.
+        The file at ``path`` keeps its layers.
+        """
+        if self.load_mode == "backed":
+            path = write_backed_copy(path, os.path.join(self.save_dir, "backed", os.path.basename(path)))
+        return self._read_adata(path)
+
+    @staticmethod
+    def _materialize(adata: anndata.AnnData | mudata.MuData) -> anndata.AnnData | mudata.MuData:
+        """Load a backed dataset fully into memory, in place, for stages that need the full matrix."""
+        if isinstance(adata, mudata.MuData):
+            for mod in adata.mod.values():
+                BaseModelWorkflow._materialize(mod)
+        elif adata.isbacked:
+            logger.info("Loading backed dataset into memory.")
+            adata.filename = None
+        return adata
+
+    @staticmethod
+    def _load_subset(adata: anndata.AnnData | mudata.MuData, indices: np.ndarray) -> anndata.AnnData | mudata.MuData:
+        """Copy the cells ``indices`` of a dataset into memory, reading only those cells if it is backed."""
+        subset = adata[indices]
+        if not isinstance(subset, mudata.MuData):
+            return subset.to_memory() if subset.isbacked else subset.copy()
+        # backed MuData can only be copied into a new file, so the modalities are loaded one by one
+        mods = {
+            mod: mod_adata.to_memory() if mod_adata.isbacked else mod_adata.copy()
+            for mod, mod_adata in subset.mod.items()
+        }
+        return mudata.MuData(mods, obs=subset.obs.copy(), obsm=dict(subset.obsm), uns=dict(subset.uns))
+
+    def _select_genes(
+        self,
+        adata: anndata.AnnData,
+        layer: str | None = None,
+        min_counts: int | None = None,
+        var_mask: np.ndarray | None = None,
+        **hvg_kwargs,
+    ) -> anndata.AnnData:
+        """Filter genes and subset to highly variable genes in place, reusing cached selections.
+
+        See :func:`~scvi_hub_models.utils.compute_gene_selection` for the parameters. The
+        selection is cached in the artifact cache under the content hash of the counts and the
+        batch key together with the parameters. ``preprocessing_settings`` can disable the cache
+        with ``{"cache": false}`` or recompute a cached selection with ``{"refresh": true}``.
+        """
+        import pandas as pd
+        import scanpy as sc
+
+        preprocessing_settings = self.config.get("preprocessing_settings", {})
+        if not preprocessing_settings.get("cache", True):
+            compute_gene_selection(adata, layer=layer, min_counts=min_counts, var_mask=var_mask, **hvg_kwargs)
+            return adata
+
+        batch_key = hvg_kwargs.get("batch_key", None)
+        params = {"layer": layer, "min_counts": min_counts, **hvg_kwargs, "scanpy": sc.__version__}
+        if var_mask is not None:
+            params["var_mask"] = np.flatnonzero(var_mask).tolist()
+        data_hash = hash_anndata(adata, layers=(None, layer), obs_keys=() if batch_key is None else (batch_key,))
+        key = f"genes:{data_hash}:{hash_inputs(params)}"
+        if preprocessing_settings.get("refresh", False) and self.artifact_cache is not None:
+            self.artifact_cache.invalidate(key)
+
+        computed = []
+
+        def fetch(path: str) -> str:
+            selection = compute_gene_selection(
+                adata, layer=layer, min_counts=min_counts, var_mask=var_mask, **hvg_kwargs
+            )
+            computed.append(True)
+            selection_path = os.path.join(path, "gene_selection.csv")
+            selection.to_csv(selection_path)
+            return selection_path
+
+        selection_path = self._fetch_artifact(key, fetch)
+        if not computed:
+            logger.info(f"Reusing cached gene selection {selection_path}.")
+            apply_gene_selection(adata, pd.read_csv(selection_path, index_col=0))
+        self._release_artifacts(selection_path)
         return adata
 
     def get_model(self, adata) -> BaseModelClass | None:
@@ -152,15 +550,17 @@ class BaseModelWorkflow:
             return None
         if self.reload_model:
             path_file = os.path.join(f'{repo_path}/data/', self.config['model_dir'])
-            model = self.load_model(adata)
-            model.save(path_file, overwrite=True, save_anndata=False)
-            dvc_repo.add(path_file)
-            git_repo.index.commit(f"Track {path_file} with DVC")
-            dvc_repo.push()
-            git_repo.remote().push()
+            with self.stage("get_model", inputs=self._artifact_digests()) as stage:
+                if stage.done:
+                    model = self.default_load_model(adata, self.config['model_class'], path_file)
+                else:
+                    model = self.load_model(adata)
+                    model.save(path_file, overwrite=True, save_anndata=False)
+                    stage.outputs["path"] = path_file
+            self.artifact_tracker.track(path_file)
         else:
             path_file = os.path.join(f'{repo_path}/data/', self.config['model_dir'])
-            dvc_repo.pull([path_file])
+            get_dvc_repo().pull([path_file])
             model = self.default_load_model(adata, self.config['model_class'], path_file)
         return model
 
@@ -168,44 +568,304 @@ class BaseModelWorkflow:
         logger.info("Downloading and reading data.")
         if self.dry_run:
             return None
+        path = self._download_file(url, hash, file_path, processor=processor)
+        backed = False
+        try:
+            adata = self._read_adata(path)
+            backed = adata.isbacked
+        finally:
+            # backed datasets keep reading from the cached file, which stays leased until the process exits
+            if not backed:
+                self._release_artifacts(path)
+        return adata
 
-        file_out = retrieve(
-            url=url,
-            known_hash=hash,
-            fname=file_path,
-            path=self.save_dir,
-            processor=processor,
-        )
-        return anndata.read_h5ad(file_out)
+    def _download_kwargs(self) -> dict:
+        """Arguments of :func:`~scvi_hub_models.utils.download_file` from ``download_settings``.
+
+        ``connections`` parallel connections per file (default 1), ``min_split_mb`` minimum size of
+        a range per connection, ``retries`` of interrupted downloads and ``timeout`` in seconds.
+        """
+        download_settings = self.config.get("download_settings", {})
+        return {
+            "connections": download_settings.get("connections", 1),
+            "min_split_size": int(download_settings.get("min_split_mb", 64) * 1024**2),
+            "retries": download_settings.get("retries", 5),
+            "timeout": download_settings.get("timeout", 60.0),
+        }
+
+    def _download_file(self, url: str, hash: str, file_path: str, processor=None) -> str:
+        """Download a file through the artifact cache and return its local path.
+
+        The file is hashed while it is streamed to disk, see :func:`~scvi_hub_models.utils.download_file`.
+        Archives are extracted with a pooch ``processor`` such as :class:`~pooch.Untar` or
+        :class:`~scvi_hub_models.utils.ExtractMembers`, in which case the path of the extracted
+        directory is returned.
+        """
+        logger.info(f"Downloading {file_path}.")
+        if self.dry_run:
+            return None
+
+        def fetch(path: str) -> str:
+            downloaded = download_file(url, os.path.join(path, file_path), known_hash=hash, **self._download_kwargs())
+            if processor is None:
+                return downloaded
+            extracted = processor(downloaded, "download", None)
+            # extractors return the extracted files and record the directory they extracted into
+            return extracted if isinstance(extracted, str) else processor.extract_dir
+
+        variant = None if processor is None else getattr(processor, "variant", processor.__class__.__name__)
+        key = hash or url
+        if variant is not None:
+            key = f"{key}+{variant}"
+        return self._fetch_artifact(key, fetch, known_hash=hash, variant=variant)
+
+    def _census_release(self, census_version: str) -> str:
+        """Release build of ``census_version``, e.g. ``"2025-01-30"`` for ``"stable"``, resolved once per workflow."""
+        if not hasattr(self, "_census_releases"):
+            self._census_releases = {}
+        if census_version not in self._census_releases:
+            from cellxgene_census import get_census_version_description
+
+            release = get_census_version_description(census_version)["release_build"]
+            logger.info(f"Resolved CELLxGENE census version {census_version} to {release}.")
+            self._census_releases[census_version] = release
+        return self._census_releases[census_version]
+
+    def _download_cellxgene(
+        self, dataset_id: str, file_path: str, known_hash: str | None = None, census_version: str | None = None
+    ) -> str:
+        """Download the source ``.h5ad`` of a CELLxGENE dataset through the artifact cache.
+
+        The file is streamed from the public census bucket and checked against ``known_hash`` or,
+        if the hash is not configured, against the size reported by the server. Aliases such as
+        ``"stable"`` are resolved to their release first, so that the cached file is tied to it.
+        ``census_version`` defaults to :attr:`census_version`. The path is leased, see
+        :meth:`_fetch_artifact`.
+        """
+        logger.info(f"Downloading CELLxGENE dataset {dataset_id}.")
+        if self.dry_run:
+            return None
+        release = self._census_release(census_version or self.census_version)
+
+        def fetch(path: str) -> str:
+            from cellxgene_census import get_source_h5ad_uri
+
+            locator = get_source_h5ad_uri(dataset_id, census_version=release)
+            url = s3_to_https(locator["uri"], locator.get("s3_region", None))
+            return download_file(url, os.path.join(path, file_path), known_hash=known_hash, **self._download_kwargs())
+
+        return self._fetch_artifact(f"cellxgene:{release}:{dataset_id}", fetch, known_hash=known_hash)
 
     def default_load_model(self, adata: anndata.AnnData, model_name: str, model_path: str | None = None) -> BaseModelClass:
-        """Load the model."""
+        """Load the model registered as ``model_name``, see :func:`~scvi_hub_models.models.get_model_class`."""
         logger.info("Loading model.")
         if self.dry_run:
             return None
-        if model_name == "SCVI":
-            from scvi.model import SCVI
-            model_cls = SCVI
-        elif model_name == "SCANVI":
-            from scvi.model import SCANVI
-            model_cls = SCANVI
-        elif model_name == "CondSCVI":
-            from scvi.model import CondSCVI
-            model_cls = CondSCVI
-        elif model_name == "TOTALVI":
-            from scvi.model import TOTALVI
-            model_cls = TOTALVI
-        elif model_name == "Stereoscope":
-            from scvi.external import RNAStereoscope
-            model_cls = RNAStereoscope
-        else:
-            raise ValueError(f"Model {model_name} not recognized.")
+        model_cls = get_model_class(model_name)
 
         if model_path is None:
             model_path = os.path.join(self.save_dir, self.config["model_dir"])
         model = model_cls.load(model_path, adata=adata)
         return model
 
+    def _train_kwargs(self, max_epochs: int) -> dict:
+        """Arguments of ``model.train`` from ``training_settings``.
+
+        ``max_epochs`` (defaults to the epochs of the workflow), ``batch_size``, data loader
+        ``num_workers`` and ``persistent_workers``, Lightning ``precision``, ``early_stopping`` on
+        the validation ELBO with ``early_stopping_patience`` and ``early_stopping_min_delta``, and a
+        wall-clock budget ``max_time_minutes`` after which training stops at the end of the epoch.
+        Settings that are not configured keep the defaults of the model.
+        """
+        from datetime import timedelta
+
+        training_settings = self.config.get("training_settings", {})
+        kwargs = {"max_epochs": training_settings.get("max_epochs", max_epochs)}
+        for key in ("batch_size", "precision"):
+            if key in training_settings:
+                kwargs[key] = training_settings[key]
+
+        num_workers = training_settings.get("num_workers", None)
+        if num_workers is not None:
+            datasplitter_kwargs = {"num_workers": num_workers}
+            # persistent workers are only valid for worker processes
+            if num_workers > 0:
+                datasplitter_kwargs["persistent_workers"] = training_settings.get("persistent_workers", True)
+            kwargs["datasplitter_kwargs"] = datasplitter_kwargs
+
+        if "early_stopping" in training_settings:
+            kwargs["early_stopping"] = training_settings["early_stopping"]
+        if kwargs.get("early_stopping", False):
+            kwargs["early_stopping_monitor"] = "elbo_validation"
+            for key in ("early_stopping_patience", "early_stopping_min_delta"):
+                if key in training_settings:
+                    kwargs[key] = training_settings[key]
+
+        max_time_minutes = training_settings.get("max_time_minutes", None)
+        if max_time_minutes is not None:
+            kwargs["max_time"] = timedelta(minutes=max_time_minutes)
+        return kwargs
+
+    def default_train_model(self, model: BaseModelClass, max_epochs: int) -> BaseModelClass:
+        """Train ``model`` for up to ``max_epochs`` epochs with the ``training_settings`` of the config.
+
+        ``threads`` caps the number of CPU threads used for training. The number of epochs that were
+        run and the time per epoch are logged, e.g. to tell whether early stopping or the time
+        budget ended training.
+        """
+        if self.dry_run:
+            return model
+        train_kwargs = self._train_kwargs(max_epochs)
+        threads = self.config.get("training_settings", {}).get("threads", None)
+        if threads is not None:
+            limit_threads(threads)
+
+        start_time = time.perf_counter()
+        model.train(**train_kwargs)
+        elapsed = time.perf_counter() - start_time
+
+        history = getattr(model, "history", None) or {}
+        n_epochs = len(history["elbo_train"]) if "elbo_train" in history else train_kwargs["max_epochs"]
+        stopped = "" if n_epochs >= train_kwargs["max_epochs"] else " (stopped early)"
+        logger.info(
+            f"Trained for {n_epochs} of {train_kwargs['max_epochs']} epochs{stopped} in {elapsed:.1f}s, "
+            f"{elapsed / max(n_epochs, 1):.2f}s per epoch."
+        )
+        return model
+
+    def _get_latent_representation(self, model: BaseModelClass) -> tuple[np.ndarray, np.ndarray]:
+        """Compute the latent posterior mean and variance in chunks of cells.
+
+        Each chunk is written straight into preallocated float32 arrays, optionally memory-mapped
+        into ``save_dir``, so that only one chunk of intermediate results is held in memory.
+        Configured by ``latent_settings``: ``chunk_size`` (cells per chunk), ``batch_size``
+        (minibatch size of the model) and ``memmap``.
+        """
+        latent_settings = self.config.get("latent_settings", {})
+        chunk_size = latent_settings.get("chunk_size", 100_000)
+        batch_size = latent_settings.get("batch_size", None)
+        n_obs = model.adata.n_obs
+        model_name = model.__class__.__name__.lower()
+
+        qzm = qzv = None
+        start_time = time.perf_counter()
+        for start in range(0, n_obs, chunk_size):
+            stop = min(start + chunk_size, n_obs)
+            qzm_chunk, qzv_chunk = model.get_latent_representation(
+                indices=np.arange(start, stop), give_mean=False, return_dist=True, batch_size=batch_size
+            )
+            if qzm is None:
+                shape = (n_obs, qzm_chunk.shape[1])
+                if latent_settings.get("memmap", False):
+                    latent_dir = os.path.join(self.save_dir, "latent")
+                    os.makedirs(latent_dir, exist_ok=True)
+                    qzm = np.lib.format.open_memmap(
+                        os.path.join(latent_dir, f"{model_name}_qzm.npy"), mode="w+", dtype=np.float32, shape=shape
+                    )
+                    qzv = np.lib.format.open_memmap(
+                        os.path.join(latent_dir, f"{model_name}_qzv.npy"), mode="w+", dtype=np.float32, shape=shape
+                    )
+                else:
+                    qzm = np.empty(shape, dtype=np.float32)
+                    qzv = np.empty(shape, dtype=np.float32)
+            qzm[start:stop] = qzm_chunk
+            qzv[start:stop] = qzv_chunk
+            logger.debug(f"Computed latent representation for {stop}/{n_obs} cells.")
+
+        elapsed = time.perf_counter() - start_time
+        logger.info(
+            f"Computed latent representation of {n_obs} cells in {elapsed:.1f}s "
+            f"({n_obs / max(elapsed, 1e-9):.0f} cells/sec)."
+        )
+        return qzm, qzv
+
+    def _create_criticism_report(self, model: BaseModelClass, save_folder: str) -> None:
+        """Create the criticism report, optionally on a stratified subsample of cells.
+
+        With ``max_cells`` in ``criticism_settings``, posterior predictive samples are only drawn
+        for a subsample of cells, stratified by ``cell_type_key`` and drawn with ``seed``. The
+        subsample is recorded in ``criticism_subsample.json`` next to the report. With
+        ``chunk_size``, the samples are drawn and summarized for that many cells at a time.
+        """
+        criticism_settings = self.config["criticism_settings"]
+        label_key = criticism_settings.get("cell_type_key", None)
+        max_cells = criticism_settings.get("max_cells", None)
+        seed = criticism_settings.get("seed", 0)
+        adata = model.adata
+
+        report_adata = None
+        if max_cells is not None and adata.n_obs > max_cells:
+            labels = adata.obs[label_key].to_numpy() if label_key is not None and label_key in adata.obs else None
+            indices = stratified_subsample(adata.n_obs, max_cells, labels=labels, seed=seed)
+            logger.info(f"Creating criticism report on {len(indices)} of {adata.n_obs} cells.")
+            report_adata = self._load_subset(adata, indices)
+            with open(os.path.join(save_folder, "criticism_subsample.json"), "w") as f:
+                json.dump(
+                    {
+                        "seed": seed,
+                        "max_cells": max_cells,
+                        "stratify_key": None if labels is None else label_key,
+                        "n_cells_total": adata.n_obs,
+                        "n_cells": len(indices),
+                        "obs_names": report_adata.obs_names.tolist(),
+                    },
+                    f,
+                )
+        else:
+            # posterior predictive checks compare against the full count matrix
+            self._materialize(adata)
+
+        import torch
+
+        n_samples = criticism_settings.get("n_samples", 3)
+        chunk_size = criticism_settings.get("chunk_size", None)
+        # the seed fixes the posterior predictive draws without reseeding the rest of the process
+        with torch.random.fork_rng():
+            torch.manual_seed(seed)
+            with nullcontext() if report_adata is None else self._model_on_subset(model, report_adata, indices):
+                if chunk_size is not None and model.adata.n_obs > chunk_size:
+                    create_chunked_criticism_report(
+                        model, save_folder, chunk_size, n_samples=n_samples, label_key=label_key
+                    )
+                else:
+                    create_criticism_report(model, save_folder=save_folder, n_samples=n_samples, label_key=label_key)
+
+    @staticmethod
+    @contextmanager
+    def _model_on_subset(model: BaseModelClass, subset: anndata.AnnData | mudata.MuData, indices: np.ndarray):
+        """Point ``model`` at the cells ``indices`` of its dataset, loaded as ``subset``.
+
+        The criticism report draws posterior predictive samples for ``model.adata`` and splits
+        cell-wise metrics by the train and validation positions of the model, so both are replaced
+        within the block. Annotations added to ``subset`` are copied to the full dataset on exit,
+        cell-wise ones are missing for the cells outside of the subset.
+        """
+        adata = model.adata
+        splits = {split: getattr(model, split, None) for split in ("train_indices", "validation_indices")}
+        try:
+            model.adata = subset
+            for split, split_indices in splits.items():
+                if split_indices is not None:
+                    setattr(model, split, np.flatnonzero(np.isin(indices, split_indices)))
+            yield
+        finally:
+            model.adata = adata
+            for split, split_indices in splits.items():
+                if split_indices is not None:
+                    setattr(model, split, split_indices)
+
+        if isinstance(adata, mudata.MuData):
+            pairs = [(adata.mod[mod], subset.mod[mod]) for mod in adata.mod]
+        else:
+            pairs = [(adata, subset)]
+        for full, sub in pairs:
+            for key in sub.obs.columns.difference(full.obs.columns):
+                full.obs[key] = sub.obs[key].reindex(full.obs_names).to_numpy()
+            for key in sub.var.columns.difference(full.var.columns):
+                full.var[key] = sub.var[key].to_numpy()
+            for key in sub.varm.keys() - full.varm.keys():
+                full.varm[key] = sub.varm[key]
+
     def _minify_and_save_model(
             self,
             model: BaseModelClass,
@@ -224,28 +884,82 @@ class BaseModelWorkflow:
         if not os.path.exists(mini_model_path):
             os.makedirs(mini_model_path)
         if self.config.get("create_criticism_report", True) and model.__class__.__name__ in SUPPORTED_PPC_MODELS:
-            create_criticism_report(
-                model,
-                save_folder=mini_model_path,
-                n_samples=self.config["criticism_settings"].get("n_samples", 3),
-                label_key=self.config["criticism_settings"].get("cell_type_key", None)
-            )
+            with self.profiler.profile("criticism"):
+                self._create_criticism_report(model, mini_model_path)
 
         if self.config.get("minify_model", True) and model.__class__.__name__ in SUPPORTED_MINIFIED_MODELS:
             qzm_key = f"{model_name.lower()}_latent_qzm"
             qzv_key = f"{model_name.lower()}_latent_qzv"
             if qzm_key not in adata.obsm and qzv_key not in adata.obsm:
-                qzm, qzv = model.get_latent_representation(give_mean=False, return_dist=True)
+                with self.profiler.profile("latent"):
+                    qzm, qzv = self._get_latent_representation(model)
+                qzm, qzv = self._compact_latent(qzm, qzv)
                 adata.obsm[qzm_key] = qzm
                 adata.obsm[qzv_key] = qzv
+                # scvi-tools copies the dataset to minify it, which backed datasets do not support
+                self._materialize(adata)
                 if isinstance(adata, mudata.MuData):
                     model.minify_mudata(use_latent_qzm_key=qzm_key, use_latent_qzv_key=qzv_key)
                 else:
                     model.minify_adata(use_latent_qzm_key=qzm_key, use_latent_qzv_key=qzv_key)
-        model.save(mini_model_path, overwrite=True, save_anndata=True)
+        if getattr(model, "minified_data_type", None) is None:
+            # the full dataset is saved alongside the model
+            self._materialize(model.adata)
+        with self.profiler.profile("save_model"):
+            self._save_model(model, mini_model_path)
 
         return mini_model_path
 
+    def _compact_latent(self, qzm: np.ndarray, qzv: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Cast the latent representation to ``latent_dtype`` of ``output_settings``.
+
+        With ``max_precision_loss``, a :class:`ValueError` is raised if any value changes by more
+        than this relative error.
+        """
+        output_settings = self.config.get("output_settings", {})
+        dtype = output_settings.get("latent_dtype", "float32")
+        max_precision_loss = output_settings.get("max_precision_loss", None)
+        compact = []
+        for name, array in (("qzm", qzm), ("qzv", qzv)):
+            array, error = cast_latent(array, dtype)
+            logger.info(f"Storing {name} as {dtype} with a maximum relative error of {error:.2e}.")
+            if max_precision_loss is not None and error > max_precision_loss:
+                raise ValueError(
+                    f"Storing {name} as {dtype} changes values by up to {error:.2e}, more than "
+                    f"`max_precision_loss` {max_precision_loss:.2e}."
+                )
+            compact.append(array)
+        return tuple(compact)
+
+    def _save_model(self, model: BaseModelClass, model_path: str) -> None:
+        """Save the model and its dataset with the ``compression`` and ``chunk_rows`` of ``output_settings``."""
+        output_settings = self.config.get("output_settings", {})
+        compression = output_settings.get("compression", None)
+        compression_opts = output_settings.get("compression_opts", None)
+        chunk_rows = output_settings.get("chunk_rows", None)
+        if compression is None and chunk_rows is None:
+            model.save(model_path, overwrite=True, save_anndata=True)
+            return
+        if isinstance(model.adata, mudata.MuData):
+            if chunk_rows is not None:
+                logger.warning("`chunk_rows` is not supported for MuData and is ignored.")
+            model.save(
+                model_path,
+                overwrite=True,
+                save_anndata=True,
+                compression=compression,
+                compression_opts=compression_opts,
+            )
+            return
+        model.save(model_path, overwrite=True, save_anndata=False)
+        write_compact_h5ad(
+            model.adata,
+            os.path.join(model_path, "adata.h5ad"),
+            compression=compression,
+            compression_opts=compression_opts,
+            chunk_rows=chunk_rows,
+        )
+
     def _create_hub_model(
             self,
             model_path: str,
@@ -277,24 +991,130 @@ class BaseModelWorkflow:
             references=metadata.get("references", None),
         )
 
-        return HubModel(model_path, hub_metadata, model_card)
+        return HubModel(model_path, metadata=hub_metadata, model_card=model_card)
+
+    @staticmethod
+    def _hub_model_files(hub_model: HubModel) -> dict[str, str | bytes]:
+        """Files pushed by :meth:`~scvi.hub.HubModel.push_to_huggingface_hub`, by path in the repository."""
+        from dataclasses import asdict
+
+        from scvi.hub._constants import _SCVI_HUB
+
+        files = {
+            "README.md": str(hub_model.model_card).encode(),
+            os.path.basename(hub_model._model_path): hub_model._model_path,
+        }
+        if os.path.isfile(hub_model._adata_path):
+            files[os.path.basename(hub_model._adata_path)] = hub_model._adata_path
+        files[_SCVI_HUB.METADATA_FILE_NAME] = json.dumps(asdict(hub_model.metadata), indent=4).encode()
+        return files
+
+    def _add_to_collection(self, hub_model: HubModel, repo_name: str, collection_name: str | None, token: str | None):
+        """Add ``repo_name`` to the collection of its model class, like a full push does.
+
+        Collections are looked up by model class name in ``upload_settings["collections"]``, the
+        ``"test"`` collection is ``upload_settings["test_collection"]``.
+        """
+        from huggingface_hub import add_collection_item
+
+        upload_settings = self.config.get("upload_settings", {})
+        model_cls_name = hub_model.metadata.model_cls_name
+        if collection_name == "test":
+            collection_slug = upload_settings.get("test_collection", TEST_HUB_COLLECTION)
+        else:
+            collections = upload_settings.get("collections", HUB_COLLECTIONS)
+            collection_slug = next((slug for name, slug in collections.items() if name in model_cls_name), None)
+        if collection_slug is None:
+            logger.warning(f"No collection found for {model_cls_name}, not adding {repo_name} to a collection.")
+            return
+        add_collection_item(
+            collection_slug=collection_slug, item_id=repo_name, item_type="model", exists_ok=True, token=token
+        )
+
+    def _create_repo(self, repo_name: str, token: str | None) -> None:
+        """Create ``repo_name`` on its first push by this workflow, retried pushes only upload."""
+        if repo_name in self._created_repos:
+            return
+        from huggingface_hub import create_repo
+
+        create_repo(repo_name, token=token, exist_ok=True)
+        self._created_repos.add(repo_name)
+
+    def _push_hub_model(
+        self, hub_model: HubModel, repo_name: str, collection_name: str | None = None, **kwargs
+    ) -> int:
+        """Push the files of the HubModel that changed since the last push to ``repo_name``.
+
+        The last push is looked up in :attr:`upload_manifests` and, if it is not recorded there,
+        in the repository itself. ``kwargs`` are passed to the commits of the files. A push that
+        fails drops the record, since the content of the repository is unknown afterwards.
+        Returns the number of bytes pushed.
+        """
+        repo_token = os.environ.get("HF_API_TOKEN", None)
+        upload_settings = self.config.get("upload_settings", {})
+        files = self._hub_model_files(hub_model)
+        manifest = content_manifest(files)
+        previous = None
+        if upload_settings.get("skip_unchanged", True):
+            previous = self.upload_manifests.load(repo_name)
+            if previous is None:
+                previous = remote_manifest(repo_name, list(files), token=repo_token)
+        changed = changed_files(manifest, previous)
+
+        try:
+            if not changed:
+                logger.info(f"{repo_name} is up to date, skipping the upload.")
+            elif len(changed) == len(files):
+                self._create_repo(repo_name, repo_token)
+                hub_model.push_to_huggingface_hub(
+                    repo_name=repo_name,
+                    repo_token=repo_token,
+                    collection_name=collection_name,
+                    **kwargs
+                )
+                if "collections" in upload_settings or "test_collection" in upload_settings:
+                    # scvi-tools only adds the repository to its default collections
+                    self._add_to_collection(hub_model, repo_name, collection_name, repo_token)
+            else:
+                from huggingface_hub import CommitOperationAdd, HfApi
+
+                logger.info(f"Uploading changed files of {repo_name}: {', '.join(changed)}.")
+                HfApi().create_commit(
+                    repo_name,
+                    operations=[
+                        CommitOperationAdd(path_in_repo=path, path_or_fileobj=files[path]) for path in changed
+                    ],
+                    token=repo_token,
+                    **{"commit_message": f"Update {', '.join(changed)}", **kwargs},
+                )
+                self._add_to_collection(hub_model, repo_name, collection_name, repo_token)
+        except BaseException:
+            self.upload_manifests.discard(repo_name)
+            raise
+        self.upload_manifests.save(repo_name, manifest)
+        return sum(manifest[path]["size"] for path in changed)
 
     def _upload_hub_model(self, hub_model: HubModel, repo_name: str | None = None, **kwargs) -> HubModel:
-        """Upload the HubModel to Hugging Face."""
+        """Queue the upload of the HubModel to Hugging Face.
+
+        The upload runs in the background on :attr:`upload_queue`, so the files in
+        ``hub_model.local_dir`` must not change until the queue is left. Files that did not
+        change since the last push are skipped, see :meth:`_push_hub_model`.
+        """
         collection_name = self.config.get("collection_name", None)
         if repo_name is None:
             repo_name = self.repo_name
         logger.info(f"Uploading the HubModel to {repo_name}. Collection: {collection_name}.")
 
         if not self.dry_run:
-            hub_model.push_to_huggingface_hub(
-                repo_name=repo_name,
-                repo_token=os.environ.get("HF_API_TOKEN", None),
-                repo_create=True,
-                repo_create_kwargs={"exist_ok": True},
-                collection_name=collection_name,
-                **kwargs
-            )
+            inputs = {"model": file_fingerprint(hub_model.local_dir), "repo_name": repo_name}
+            stage = self._make_stage(f"upload.{repo_name}", inputs=inputs)
+            if not stage.done:
+                self.upload_queue.submit(
+                    repo_name,
+                    lambda: self._push_hub_model(hub_model, repo_name, collection_name=collection_name, **kwargs),
+                    on_success=stage.complete,
+                )
         return hub_model
 
     @property
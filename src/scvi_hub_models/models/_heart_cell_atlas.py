@@ -16,18 +16,17 @@ class _Workflow(BaseModelWorkflow):
         return heart_cell_atlas_subsampled(save_path=self.save_dir)
 
     def _preprocess_adata(self, adata: AnnData) -> AnnData:
-        import scanpy as sc
+        from scvi_hub_models.utils import alias_layer
 
-        sc.pp.filter_genes(adata, min_counts=3)
-        adata.layers["counts"] = adata.X.copy()
-        sc.pp.highly_variable_genes(
+        # X holds the raw counts, so genes are selected on X and the counts layer aliases it
+        self._select_genes(
             adata,
+            min_counts=3,
             n_top_genes=1200,
-            subset=True,
-            layer="counts",
             flavor="seurat_v3",
             batch_key="cell_source",
         )
+        alias_layer(adata, "counts")
 
         return adata
 
@@ -38,7 +37,7 @@ class _Workflow(BaseModelWorkflow):
             return None
         adata = self._load_adata()
         adata = self._preprocess_adata(adata)
-        adata.write_h5ad(path)
+        self._write_adata(adata, path)
         return adata
 
     def _initialize_model(self, adata: AnnData) -> SCVI:
@@ -52,9 +51,7 @@ class _Workflow(BaseModelWorkflow):
 
     def _train_model(self, model: SCVI) -> SCVI:
         """Train the scVI model."""
-        model.train(max_epochs=200)
-
-        return model
+        return self.default_train_model(model, max_epochs=200)
 
     def load_model(self, adata) -> SCVI | None:
         """Initialize and train the scVI model."""
@@ -67,8 +64,10 @@ class _Workflow(BaseModelWorkflow):
     def run(self):
         super().run()
 
-        adata = self.get_adata()
-        model = self.get_model(adata)
-        model_path = self._minify_and_save_model(model, adata)
-        hub_model = self._create_hub_model(model_path)
+        with self.stage("minify", inputs=self._artifact_digests()) as stage:
+            if not stage.done:
+                adata = self.get_adata()
+                model = self.get_model(adata)
+                stage.outputs["model_path"] = self._minify_and_save_model(model, adata)
+        hub_model = self._create_hub_model(stage.outputs["model_path"])
         hub_model = self._upload_hub_model(hub_model)
@@ -16,16 +16,15 @@ class _Workflow(BaseModelWorkflow):
     def _download_model(self):
         from pathlib import Path
 
-        from pooch import Unzip, retrieve
+        from pooch import Unzip
 
-        untarred = retrieve(
-            url=self.config['extra_data_kwargs']["legacy_model_url"],
-            known_hash=self.config['extra_data_kwargs']["legacy_model_hash"],
-            fname=self.config['extra_data_kwargs']["legacy_model_dir"],
+        extract_dir = self._download_file(
+            self.config['extra_data_kwargs']["legacy_model_url"],
+            self.config['extra_data_kwargs']["legacy_model_hash"],
+            self.config['extra_data_kwargs']["legacy_model_dir"],
             processor=Unzip(),
-            path=self.save_dir,
         )
-        untarred = sorted(untarred)
+        untarred = sorted(str(p) for p in Path(extract_dir).rglob("*") if p.is_file())
         return str(Path(untarred[0]).parent)
 
     def _get_model(self) -> str:
@@ -37,37 +36,46 @@ class _Workflow(BaseModelWorkflow):
 
         model_path = os.path.join(self.save_dir, self.config["model_dir"])
         legacy_model_path = self._download_model()
-        SCANVI.convert_legacy_save(legacy_model_path, model_path, overwrite=True)
+        try:
+            SCANVI.convert_legacy_save(legacy_model_path, model_path, overwrite=True)
+        finally:
+            self._release_artifacts(legacy_model_path)
 
         return model_path
 
-    def _download_reference_adata(self) -> anndata.AnnData:
-        """Download the reference (core) dataset from CxG."""
-        from cellxgene_census import download_source_h5ad
-
-        adata_path = os.path.join(self.save_dir, self.config['extra_data_kwargs']["reference_adata_fname"])
-        if not os.path.exists(adata_path):
-            download_source_h5ad(self.config['extra_data_kwargs']["reference_adata_cxg_id"], to_path=adata_path)
-
-        ref_adata = anndata.io.read_h5ad(adata_path)
+    def _model_digest(self) -> str | None:
+        """The hash of the legacy model archive, from which the model is converted when it is reloaded."""
+        if self.reload_model:
+            return self.config['extra_data_kwargs']["legacy_model_hash"]
+        return super()._model_digest()
 
-        return ref_adata
+    def _download_reference_adata(self) -> anndata.AnnData:
+        """Download the reference (core) dataset from CxG and open it in backed mode."""
+        adata_path = self._download_cellxgene(
+            self.config['extra_data_kwargs']["reference_adata_cxg_id"],
+            self.config['extra_data_kwargs']["reference_adata_fname"],
+            known_hash=self.config['extra_data_kwargs'].get("reference_adata_hash", None),
+        )
+        # only annotations are read here, counts are loaded after subsetting
+        return anndata.io.read_h5ad(adata_path, backed="r")
 
     def _preprocess_reference_adata(self, adata: anndata.AnnData, model_path: str) -> anndata.AnnData:
-        """Preprocess the reference dataset.
+        """Preprocess the backed reference dataset.
 
-        1. Set .X to raw counts
-        2. Subset to genes that the model was trained on
-        3. Remove unnecessary .var columns
-        4. Pad empty genes with zeros
+        1. Load raw counts of the genes that the model was trained on into .X
+        2. Remove unnecessary .var columns
+        3. Pad empty genes with zeros
         """
-        from scvi.model.base import ArchesMixin
         from scvi.model.base._save_load import _load_saved_files
 
-        # .X does not contain raw counts initially
-        adata.X = adata.raw.X
-        _, genes, _, _ = _load_saved_files(os.path.join(self.save_dir, self.config["model_dir"]), load_adata=False)
-        adata = adata[:, adata.var.index.isin(genes)].copy()
+        from scvi_hub_models.utils import align_genes, read_backed_subset
+
+        _, genes, _, _ = _load_saved_files(model_path, load_adata=False)
+        # .X does not contain raw counts, so only the model's genes of raw.X are read from disk
+        gene_mask = adata.var.index.isin(genes)
+        backed_file = adata.file
+        adata = read_backed_subset(adata, var_index=gene_mask, x_key="raw/X")
+        backed_file.close()
 
         # get rid of some var columns that we dont need
         # -- will make later processing easier
@@ -75,11 +83,12 @@ class _Workflow(BaseModelWorkflow):
         del adata.var["feature_reference"]
         del adata.var["feature_biotype"]
 
-        ArchesMixin.prepare_query_anndata(adata, model_path)
-        return adata
+        return align_genes(adata, genes)
 
     def _postprocess_reference_adata(self, adata: anndata.AnnData) -> anndata.AnnData:
         """Postprocess the reference dataset by adding feature names for padded genes."""
+        from scvi_hub_models.utils import backfill_var
+
         gene_ids = [
             "ENSG00000253701",
             "ENSG00000269936",
@@ -87,37 +96,41 @@ class _Workflow(BaseModelWorkflow):
             "ENSG00000279576",
         ]
         feat_names = ["AL928768.3", "RP11-394O4.5", "RP3-492J12.2", "AP000769.1"]
-        adata.var["feature_name"] = adata.var["feature_name"].cat.add_categories(feat_names)
-        for gene, feature in zip(gene_ids, feat_names):  # noqa: B905
-            adata.var.loc[gene, "feature_name"] = feature
-
-        return adata
+        return backfill_var(adata, "feature_name", dict(zip(gene_ids, feat_names, strict=True)))
 
     def _download_embedding_adata(self) -> str:
         """Download the embedding dataset from Zenodo.
 
         Embedding dataset contains precomputed latent representations for core cells.
         """
-        from pooch import retrieve
-
-        adata = retrieve(
-            url=self.config['extra_data_kwargs']["embedding_adata_url"],
-            known_hash=self.config['extra_data_kwargs']["embedding_adata_hash"],
-            fname=self.config['extra_data_kwargs']["embedding_adata_fname"],
-            processor=None,
-            path=self.save_dir,
+        from scvi_hub_models.utils import read_backed_subset
+
+        adata_path = self._download_file(
+            self.config['extra_data_kwargs']["embedding_adata_url"],
+            self.config['extra_data_kwargs']["embedding_adata_hash"],
+            self.config['extra_data_kwargs']["embedding_adata_fname"],
         )
-        adata = anndata.io.read_h5ad(adata)
-        return adata[adata.obs["core_or_extension"] == "core"].copy()
+        try:
+            adata = anndata.io.read_h5ad(adata_path, backed="r")
+            core_adata = read_backed_subset(adata, obs_index=adata.obs["core_or_extension"] == "core")
+            adata.file.close()
+        finally:
+            self._release_artifacts(adata_path)
+        return core_adata
 
     def download_adata(self, path) -> anndata.AnnData:
         logging.info("Loading data.")
         if self.dry_run:
             return None
         ref_adata = self._download_reference_adata()
-        ref_adata = self._preprocess_reference_adata(ref_adata, self.model_path)
+        reference_path = str(ref_adata.filename)
+        model_path = os.path.join(self.save_dir, self.config["model_dir"])
+        try:
+            ref_adata = self._preprocess_reference_adata(ref_adata, model_path)
+        finally:
+            self._release_artifacts(reference_path)
         ref_adata = self._postprocess_reference_adata(ref_adata)
-        ref_adata.write_h5ad(path)
+        self._write_adata(ref_adata, path)
         return ref_adata
 
     @property
@@ -127,9 +140,11 @@ class _Workflow(BaseModelWorkflow):
     def run(self):
         super().run()
 
-        self._get_model()
-        adata = self.get_adata()
-        model = self.get_model(adata)
-        model_path = self._minify_and_save_model(model, adata)
-        hub_model = self._create_hub_model(model_path)
+        with self.stage("minify", inputs=self._artifact_digests()) as stage:
+            if not stage.done:
+                self._get_model()
+                adata = self.get_adata()
+                model = self.get_model(adata)
+                stage.outputs["model_path"] = self._minify_and_save_model(model, adata)
+        hub_model = self._create_hub_model(stage.outputs["model_path"])
         hub_model = self._upload_hub_model(hub_model)
@@ -1,5 +1,4 @@
 import logging
-import os
 
 import scanpy as sc
 from anndata import AnnData
@@ -12,24 +11,32 @@ logger = logging.getLogger(__name__)
 
 
 class _Workflow(BaseModelWorkflow):
+    # TODO for next LTX remove census_version='latest'.
+    census_version = "latest"
 
     def _load_adata(self) -> AnnData:
-        from cellxgene_census import download_source_h5ad
-
-        adata_path = os.path.join(self.save_dir, self.config['extra_data_kwargs']["reference_adata_fname"])
-        if not os.path.exists(adata_path):
-            # TODO for next LTX remove census_version='latest'.
-            download_source_h5ad(self.config['extra_data_kwargs']["reference_adata_cxg_id"], to_path=adata_path, census_version='latest')
-        return sc.read_h5ad(adata_path)
+        adata_path = self._download_cellxgene(
+            self.config['extra_data_kwargs']["reference_adata_cxg_id"],
+            self.config['extra_data_kwargs']["reference_adata_fname"],
+            known_hash=self.config['extra_data_kwargs'].get("reference_adata_hash", None),
+        )
+        try:
+            return sc.read_h5ad(adata_path)
+        finally:
+            self._release_artifacts(adata_path)
 
     def _preprocess_adata(self, adata: AnnData) -> AnnData:
-        matching_indices = [adata.raw.var_names.get_loc(gene) for gene in adata.var_names]
-        adata.layers["counts"] = adata.raw.X[:, matching_indices].copy()
-        sc.pp.highly_variable_genes(
+        from scvi_hub_models.utils import gene_indexer
+
+        matching_indices = gene_indexer(adata.raw.var_names, adata.var_names)
+        if (matching_indices < 0).any():
+            raise ValueError("Not all genes of the dataset are in its raw counts.")
+        # fancy indexing already copies, and only the columns of `var_names`
+        adata.layers["counts"] = adata.raw.X[:, matching_indices]
+        self._select_genes(
             adata,
-            n_top_genes=4000,
-            subset=True,
             layer="counts",
+            n_top_genes=4000,
             flavor="seurat_v3",
             span=1.0,
         )
@@ -51,7 +58,7 @@ class _Workflow(BaseModelWorkflow):
             return None
         adata = self._load_adata()
         mdata = self._preprocess_adata(adata)
-        mdata.write_h5mu(path)
+        self._write_adata(mdata, path)
         return mdata
 
     def _initialize_model(self, mdata: MuData) -> TOTALVI:
@@ -70,9 +77,7 @@ class _Workflow(BaseModelWorkflow):
 
     def _train_model(self, model: TOTALVI) -> TOTALVI:
         """Train the scVI model."""
-        model.train(max_epochs=200)
-
-        return model
+        return self.default_train_model(model, max_epochs=200)
 
     def load_model(self, adata) -> TOTALVI | None:
         """Initialize and train the scVI model."""
@@ -85,8 +90,10 @@ class _Workflow(BaseModelWorkflow):
     def run(self):
         super().run()
 
-        mdata = self.get_adata()
-        model = self.get_model(mdata)
-        model_path = self._minify_and_save_model(model, mdata)
-        hub_model = self._create_hub_model(model_path)
+        with self.stage("minify", inputs=self._artifact_digests()) as stage:
+            if not stage.done:
+                mdata = self.get_adata()
+                model = self.get_model(mdata)
+                stage.outputs["model_path"] = self._minify_and_save_model(model, mdata)
+        hub_model = self._create_hub_model(stage.outputs["model_path"])
         hub_model = self._upload_hub_model(hub_model)
@@ -1,6 +1,5 @@
 import logging
 
-import scanpy as sc
 from anndata import AnnData
 from mudata import MuData
 from pooch import Decompress
@@ -13,15 +12,19 @@ logger = logging.getLogger(__name__)
 
 class _Workflow(BaseModelWorkflow):
     def _preprocess_adata(self, adata: AnnData) -> AnnData:
-        rna = adata[:, adata.var['feature_types']=='GEX'].copy()
-        protein = adata[:, adata.var['feature_types']=='ADT'].copy()
+        from scvi_hub_models.utils import subset_var
+
+        feature_types = adata.var['feature_types'].to_numpy()
+        protein = subset_var(adata, feature_types == 'ADT')
+        # TOTALVI fits its protein background prior on dense rows; the few antibodies are cheap to densify
         protein.layers["counts"] = protein.layers["counts"].toarray()
-        sc.pp.filter_genes(rna, min_counts=3)
-        sc.pp.highly_variable_genes(
-            rna,
-            n_top_genes=4000,
-            subset=True,
+        # subsets `adata` in place to the selected genes, so only those are ever copied
+        rna = self._select_genes(
+            adata,
             layer="counts",
+            min_counts=3,
+            var_mask=feature_types == 'GEX',
+            n_top_genes=4000,
             flavor="seurat_v3",
             batch_key="Site",
             span=1.0,
@@ -42,7 +45,7 @@ class _Workflow(BaseModelWorkflow):
             processor=Decompress(),
         )
         mdata = self._preprocess_adata(adata)
-        mdata.write_h5mu(path)
+        self._write_adata(mdata, path)
         return mdata
 
     def _initialize_model(self, mdata: MuData) -> TOTALVI:
@@ -61,9 +64,7 @@ class _Workflow(BaseModelWorkflow):
 
     def _train_model(self, model: TOTALVI) -> TOTALVI:
         """Train the scVI model."""
-        model.train(max_epochs=200)
-
-        return model
+        return self.default_train_model(model, max_epochs=200)
 
     def load_model(self, adata) -> TOTALVI | None:
         """Initialize and train the scVI model."""
@@ -76,8 +77,10 @@ class _Workflow(BaseModelWorkflow):
     def run(self):
         super().run()
 
-        mdata = self.get_adata()
-        model = self.get_model(mdata)
-        model_path = self._minify_and_save_model(model, mdata)
-        hub_model = self._create_hub_model(model_path)
+        with self.stage("minify", inputs=self._artifact_digests()) as stage:
+            if not stage.done:
+                mdata = self.get_adata()
+                model = self.get_model(mdata)
+                stage.outputs["model_path"] = self._minify_and_save_model(model, mdata)
+        hub_model = self._create_hub_model(stage.outputs["model_path"])
         hub_model = self._upload_hub_model(hub_model)
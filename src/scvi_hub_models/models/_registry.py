@@ -0,0 +1,36 @@
+from importlib import import_module
+
+# Import paths of the model classes workflows can load by name, imported on first use.
+MODEL_CLASSES = {
+    "SCVI": "scvi.model:SCVI",
+    "SCANVI": "scvi.model:SCANVI",
+    "CondSCVI": "scvi.model:CondSCVI",
+    "TOTALVI": "scvi.model:TOTALVI",
+    "Stereoscope": "scvi.external:RNAStereoscope",
+}
+
+
+def register_model_class(name: str, model_class: type | str) -> None:
+    """Make ``model_class`` loadable by workflows as ``name``, e.g. from the ``model_class`` config key.
+
+    ``model_class`` is either the class or its import path ``"package.module:Class"``, which is
+    only imported when the model is loaded.
+    """
+    MODEL_CLASSES[name] = model_class
+
+
+def get_model_class(name: str) -> type:
+    """Return the model class registered as ``name``, importing it on first use.
+
+    Names that are not registered are accepted as import paths ``"package.module:Class"``.
+    """
+    model_class = MODEL_CLASSES.get(name, name)
+    if isinstance(model_class, type):
+        return model_class
+    module_name, _, class_name = model_class.partition(":")
+    if not class_name:
+        raise ValueError(f"Model {name} not recognized. Registered models: {', '.join(MODEL_CLASSES)}.")
+    model_class = getattr(import_module(module_name), class_name)
+    if name in MODEL_CLASSES:
+        MODEL_CLASSES[name] = model_class
+    return model_class
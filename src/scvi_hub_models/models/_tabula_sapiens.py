@@ -18,86 +18,222 @@ class _Workflow(BaseModelWorkflow):
     def get_model_collection(self, tissue, base_model_url):
         """Download the models for a given tissue from Zenodo.
 
-        Returns the path to the directory containing the models.
+        Only the directories of the models in ``extra_data_kwargs["models"]`` are extracted from
+        the archive. Returns the path to the directory containing the models.
         """
         logging.info(f"Downloading models for {tissue}.")
         if self.dry_run:
             return None
         from pathlib import Path
 
-        from pooch import Untar, retrieve
+        from scvi_hub_models.utils import ExtractMembers
 
-        untarred = retrieve(
-            url=base_model_url["links"]["self"],
-            known_hash=base_model_url["checksum"],
-            fname=f"{tissue}_models",
-            path=self.save_dir,
-            processor=Untar(),
+        model_dirs = [model_name.lower() for model_name in self.config["extra_data_kwargs"]["models"]]
+        extract_dir = self._download_file(
+            base_model_url["links"]["self"],
+            base_model_url["checksum"],
+            f"{tissue}_models",
+            processor=ExtractMembers(model_dirs),
         )
-        untarred = sorted(untarred)
-        return str(Path(untarred[-1]).parent.parent)
+        model_dir = next(p for p in sorted(Path(extract_dir).rglob("*")) if p.is_dir() and p.name in model_dirs)
+        return str(model_dir.parent)
 
     def get_download_links(self):
-        """Download the datasets for a list of tissues from Zenodo."""
+        """Get the download links of the datasets and models of the tissues from Zenodo.
+
+        The record listing and the links parsed from it are cached, see
+        :class:`~scvi_hub_models.utils.MetadataCache`.
+        """
         logging.info("Get download links from Zenodo.")
         if self.dry_run:
             return None
-        import requests
-        res = requests.get(self.config["extra_data_kwargs"]["zenodo_url"])
-        files = res.json()['files']
-
-        adata_urls = {}
-        base_model_urls = {}
-        for file in files:
-            tissue = '_'.join(file['key'].split('_')[: -2])
-            if tissue not in self.config["extra_data_kwargs"]["tissues"]:
-                continue
-            if file['key'].endswith(self.config["extra_data_kwargs"]["adata_suffix"]):
-                adata_urls[tissue] = file
-            elif file['key'].endswith(self.config["extra_data_kwargs"]["models_suffix"]):
-                base_model_urls[tissue] = file
-            else:
-                continue
-
-        return adata_urls, base_model_urls
+        from scvi_hub_models.utils import hash_inputs
+
+        extra_data_kwargs = self.config["extra_data_kwargs"]
+        tissues = list(extra_data_kwargs["tissues"])
+        adata_suffix = extra_data_kwargs["adata_suffix"]
+        models_suffix = extra_data_kwargs["models_suffix"]
+
+        def parse(record: dict) -> dict:
+            adata_urls = {}
+            base_model_urls = {}
+            for file in record['files']:
+                tissue = '_'.join(file['key'].split('_')[: -2])
+                if tissue not in tissues:
+                    continue
+                if file['key'].endswith(adata_suffix):
+                    adata_urls[tissue] = file
+                elif file['key'].endswith(models_suffix):
+                    base_model_urls[tissue] = file
+            return {"adata": adata_urls, "models": base_model_urls}
+
+        key = hash_inputs(
+            {"links": "tabula_sapiens", "tissues": tissues, "adata_suffix": adata_suffix, "models_suffix": models_suffix}
+        )
+        links = self.metadata_cache.get_parsed(extra_data_kwargs["zenodo_url"], parse, key)
+        return links["adata"], links["models"]
 
     def _copy_tensorboard_logs(self, model_dir, model_path):
-        """Copy tensorboard logs from model_dir to model_path."""
-        logging.info("Copy tensorboard logs.")
+        """Link tensorboard logs from model_dir into model_path instead of copying them."""
+        logging.info("Link tensorboard logs.")
         if self.dry_run:
             return None
         import os
-        import shutil
+
+        from scvi_hub_models.utils import link_tree
 
         tensorboard_logs = os.path.join(model_dir, "lightning_logs")
         if os.path.exists(tensorboard_logs):
-            import shutil
+            counts = link_tree(tensorboard_logs, os.path.join(model_path, "lightning_logs"))
+            logger.info(f"Linked tensorboard logs: {counts}.")
+
+    def fetch_tissue(self, tissue, adata_url, base_model_url):
+        """Download the dataset and the models of a tissue.
+
+        Returns the path to the dataset and the path to the directory containing the models.
+        """
+        logging.info(f"Fetching data and models for {tissue}.")
+        if self.dry_run:
+            return None
+        adata_path = self._download_file(
+            adata_url["links"]["self"],
+            adata_url["checksum"],
+            f"{tissue}_adata.h5ad"
+        )
+        model_collection_dir = self.get_model_collection(
+            tissue,
+            base_model_url
+        )
+        return adata_path, model_collection_dir
 
-            shutil.copytree(tensorboard_logs, os.path.join(model_path, "lightning_logs"), dirs_exist_ok=True)
+    def run_tissue(self, tissue, adata_url, base_model_url, fetched=None):
+        """Minify, upload and publish all models of a single tissue.
+
+        ``fetched`` are the outputs of :meth:`fetch_tissue` if the tissue was already downloaded.
+        """
+        logging.info(f"Processing tissue {tissue}.")
+        if self.dry_run:
+            return None
+        if fetched is None:
+            fetched = self.fetch_tissue(tissue, adata_url, base_model_url)
+            try:
+                self._process_tissue(tissue, adata_url, base_model_url, *fetched)
+            finally:
+                self._release_artifacts(*fetched)
+        else:
+            self._process_tissue(tissue, adata_url, base_model_url, *fetched)
+
+    def _process_tissue(self, tissue, adata_url, base_model_url, adata_path, model_collection_dir):
+        """Minify, upload and publish the models of a tissue from its downloaded files.
+
+        The minification stages of the models depend on the Zenodo checksums of the dataset and the
+        model archive.
+        """
+        import os
+
+        from scvi_hub_models.utils import dataset_overlay
+
+        adata = None
+        for model_name in self.config["extra_data_kwargs"]["models"]:
+            logging.info(f"Processing currently model: {tissue} {model_name}.")
+            model_dir = os.path.join(model_collection_dir, model_name.lower())
+            inputs = {"tissue": tissue, "data": adata_url["checksum"], "model": base_model_url["checksum"]}
+            with self.stage(f"{tissue}.{model_name}.minify", inputs=inputs) as stage:
+                if not stage.done:
+                    if adata is None:
+                        adata = self._read_adata(adata_path)
+                    # models register fields and add latent representations to their own overlay,
+                    # so every model of the tissue starts from the unmodified dataset
+                    model_adata = dataset_overlay(adata)
+                    model = self.default_load_model(model_adata, model_name, model_dir)
+                    model_path = self._minify_and_save_model(model, model_adata)
+                    self._copy_tensorboard_logs(model_dir, model_path)
+                    stage.outputs["model_path"] = model_path
+                    del model, model_adata
+            hub_model = self._create_hub_model(stage.outputs["model_path"])
+            hub_model = self._upload_hub_model(
+                hub_model, repo_name=f"scvi-tools/tabula-sapiens-{tissue.lower()}-{model_name.lower()}")
 
     def run(self):
         super().run()
 
-        adata_urls, base_model_urls = self.get_download_links()
+        if self.dry_run:
+            for tissue in self.config["extra_data_kwargs"]["tissues"]:
+                self.run_tissue(tissue, None, None)
+            return
 
-        for tissue in self.config["extra_data_kwargs"]["tissues"]:
-            adata_url, base_model_url = adata_urls[tissue], base_model_urls[tissue]
-            adata = self._get_adata(
-                adata_url["links"]["self"],
-                adata_url["checksum"],
-                f"{tissue}_adata.h5ad"
-            )
-            model_collection_dir = self.get_model_collection(
-                tissue,
-                base_model_url
-            )
-            for model_name in self.config["extra_data_kwargs"]["models"]:
-                logging.info(f"Processing currently model: {tissue} {model_name}.")
-                import os
-                model_dir = os.path.join(model_collection_dir, model_name.lower())
-                model = self._load_model(model_dir, adata, model_name)
-                model_path = self._minify_and_save_model(model, adata)
-                self._copy_tensorboard_logs(model_dir, model_path)
-                hub_model = self._create_hub_model(model_path)
-                hub_model = self._upload_hub_model(
-                    hub_model, repo_name=f"scvi-tools/tabula-sapiens-{tissue.lower()}-{model_name.lower()}")
+        from scvi_hub_models.utils import log_summary, prefetch, run_in_processes, summarize_call
+
+        adata_urls, base_model_urls = self.get_download_links()
+        tasks = {
+            tissue: (tissue, adata_urls[tissue], base_model_urls[tissue])
+            for tissue in self.config["extra_data_kwargs"]["tissues"]
+        }
+        task_kwargs = {
+            "config": dict(self.config),
+            "save_dir": self.save_dir,
+            "reload_data": self.reload_data,
+            "reload_model": self.reload_model,
+            "resume": self.resume,
+        }
+        if self.workers > 1:
+            summary = run_in_processes(_run_tissue, tasks, workers=self.workers, task_kwargs=task_kwargs)
+        else:
+            # download upcoming tissues while the current one is minified and uploaded
+            prefetch_settings = self.config.get("prefetch_settings", {})
+            max_gb = prefetch_settings.get("max_gb", None)
+            # uploads of a tissue continue in the background while the next one is processed
+            serial_kwargs = {**task_kwargs, "upload_queue": self.upload_queue}
+            summary = {}
+            for (tissue, args), fetched in prefetch(
+                tasks.items(),
+                lambda task: self.fetch_tissue(*task[1]),
+                depth=prefetch_settings.get("depth", 1),
+                size=lambda task: task[1][1].get("size", 0) + task[1][2].get("size", 0),
+                max_bytes=None if max_gb is None else int(max_gb * 1024**3),
+            ):
+                with self.profiler.profile(tissue):
+                    summary[tissue] = summarize_call(
+                        lambda: _run_tissue(*args, **serial_kwargs, fetched=fetched.result())  # noqa: B023
+                    )
+                if fetched.exception() is None:
+                    # the cache may evict the files of the tissue once prefetched tissues need the space
+                    self._release_artifacts(*fetched.result())
+
+        log_summary(summary)
+        failed = [tissue for tissue, result in summary.items() if result["status"] == "failed"]
+        if failed:
+            raise RuntimeError(f"Workflow failed for tissues: {', '.join(failed)}.")
+
+
+def _run_tissue(
+    tissue,
+    adata_url,
+    base_model_url,
+    config,
+    save_dir,
+    reload_data,
+    reload_model,
+    resume,
+    fetched=None,
+    upload_queue=None,
+):
+    """Run a single tissue with an isolated sub-directory of ``save_dir``, e.g. in a worker process.
+
+    Uploads go to ``upload_queue`` if given and are left to its owner, otherwise they are waited for.
+    """
+    import os
+
+    workflow = _Workflow(
+        save_dir=os.path.join(save_dir, tissue),
+        config=config,
+        reload_data=reload_data,
+        reload_model=reload_model,
+        resume=resume,
+    )
+    if upload_queue is not None:
+        workflow.upload_queue = upload_queue
+        workflow.run_tissue(tissue, adata_url, base_model_url, fetched=fetched)
+        return
+    with workflow.upload_queue:
+        workflow.run_tissue(tissue, adata_url, base_model_url, fetched=fetched)
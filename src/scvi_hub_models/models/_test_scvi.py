@@ -19,7 +19,7 @@ class _Workflow(BaseModelWorkflow):
         if self.dry_run:
             return None
         adata = synthetic_iid()
-        adata.write_h5ad(path)
+        self._write_adata(adata, path)
         return adata
 
     def load_model(self, adata: AnnData) -> SCVI:
@@ -28,8 +28,7 @@ class _Workflow(BaseModelWorkflow):
             return None
         SCVI.setup_anndata(adata)
         model = SCVI(adata)
-        model.train(max_epochs=10)
-        return model
+        return self.default_train_model(model, max_epochs=10)
 
     @property
     def id(self) -> str:
@@ -38,8 +37,10 @@ class _Workflow(BaseModelWorkflow):
     def run(self):
         super().run()
 
-        adata = self.get_adata()
-        model = self.get_model(adata)
-        model_path = self._minify_and_save_model(model, adata)
-        hub_model = self._create_hub_model(model_path)
+        with self.stage("minify", inputs=self._artifact_digests()) as stage:
+            if not stage.done:
+                adata = self.get_adata()
+                model = self.get_model(adata)
+                stage.outputs["model_path"] = self._minify_and_save_model(model, adata)
+        hub_model = self._create_hub_model(stage.outputs["model_path"])
         hub_model = self._upload_hub_model(hub_model)
@@ -0,0 +1,77 @@
+from ._artifact_cache import ArtifactCache, hash_path, normalize_hash, path_size
+from ._artifact_tracking import ArtifactTracker
+from ._backed import read_backed_subset, read_dataset, read_matrix_subset, write_backed_copy
+from ._criticism import create_chunked_criticism_report
+from ._download import download_file, host_session, s3_to_https
+from ._files import ExtractMembers, link_tree
+from ._genes import align_genes, backfill_var, gene_indexer
+from ._instrumentation import Profiler, record_transfer
+from ._metadata_cache import MetadataCache
+from ._output import cast_latent, write_compact_h5ad
+from ._overlay import dataset_overlay
+from ._parallel import limit_threads, log_summary, run_in_processes, summarize_call
+from ._prefetch import prefetch
+from ._preprocessing import (
+    alias_layer,
+    apply_gene_selection,
+    compute_gene_selection,
+    gene_counts,
+    hash_anndata,
+    subset_var,
+)
+from ._retry import is_transient_error
+from ._scheduler import format_summary, run_scheduled
+from ._stages import Stage, file_fingerprint, hash_inputs
+from ._subsample import stratified_subsample
+from ._upload_manifest import UploadManifestStore, changed_files, content_manifest, remote_manifest
+from ._upload_queue import UploadQueue
+
+__all__ = [
+    "ArtifactCache",
+    "ArtifactTracker",
+    "ExtractMembers",
+    "MetadataCache",
+    "Profiler",
+    "Stage",
+    "UploadManifestStore",
+    "UploadQueue",
+    "alias_layer",
+    "align_genes",
+    "apply_gene_selection",
+    "backfill_var",
+    "cast_latent",
+    "changed_files",
+    "compute_gene_selection",
+    "content_manifest",
+    "create_chunked_criticism_report",
+    "dataset_overlay",
+    "download_file",
+    "file_fingerprint",
+    "format_summary",
+    "gene_counts",
+    "gene_indexer",
+    "hash_anndata",
+    "hash_inputs",
+    "hash_path",
+    "host_session",
+    "is_transient_error",
+    "limit_threads",
+    "link_tree",
+    "log_summary",
+    "normalize_hash",
+    "path_size",
+    "prefetch",
+    "read_backed_subset",
+    "read_dataset",
+    "read_matrix_subset",
+    "record_transfer",
+    "remote_manifest",
+    "run_in_processes",
+    "run_scheduled",
+    "s3_to_https",
+    "stratified_subsample",
+    "subset_var",
+    "summarize_call",
+    "write_backed_copy",
+    "write_compact_h5ad",
+]
@@ -0,0 +1,316 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import socket
+import threading
+import time
+import uuid
+from collections.abc import Callable
+from pathlib import Path
+
+from filelock import FileLock
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "scvi-hub-models")
+
+_HASH_ALGORITHMS = ("md5", "sha1", "sha256", "sha512")
+
+
+def normalize_hash(known_hash: str) -> str:
+    """Normalize a pooch-style ``known_hash`` to ``"<algorithm>-<hexdigest>"``.
+
+    Pooch hashes without an algorithm prefix default to SHA256, Zenodo checksums are formatted
+    as ``"md5:<hexdigest>"``.
+    """
+    if ":" in known_hash:
+        algorithm, digest = known_hash.split(":", 1)
+    else:
+        algorithm, digest = "sha256", known_hash
+    algorithm = algorithm.lower()
+    if algorithm not in _HASH_ALGORITHMS:
+        raise ValueError(f"Hash algorithm {algorithm} not supported.")
+    return f"{algorithm}-{digest.lower()}"
+
+
+def hash_path(path: str, algorithm: str = "sha256", chunk_size: int = 2**20) -> str:
+    """Compute the content hash of a file or of a directory tree (relative paths and contents)."""
+    hasher = hashlib.new(algorithm)
+    path = Path(path)
+    files = [path] if path.is_file() else sorted(p for p in path.rglob("*") if p.is_file())
+    for file in files:
+        if path.is_dir():
+            hasher.update(str(file.relative_to(path)).encode())
+        with open(file, "rb") as f:
+            while chunk := f.read(chunk_size):
+                hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def path_size(path: str) -> int:
+    """Size in bytes of a file or of all files in a directory tree."""
+    path = Path(path)
+    if path.is_file():
+        return path.stat().st_size
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+class ArtifactCache:
+    """Persistent, content-addressed on-disk cache for downloaded artifacts.
+
+    Artifacts are stored once per content hash under ``<cache_dir>/objects`` and looked up
+    through an index that maps source keys (known hashes, URLs or dataset IDs) to content hashes.
+    The index is guarded by a file lock and each key has its own download lock, so concurrent
+    workflow runs on the same machine share downloads instead of repeating them.
+
+    Every path returned by :meth:`get` and :meth:`fetch` is leased to the calling process until it
+    is passed to :meth:`release` or the process exits. Leased artifacts are never evicted, so a path
+    stays valid while it is in use, e.g. while the models of an extracted archive are loaded one by
+    one as the next archive is prefetched. Leases record the host and process ID of their holder;
+    leases of processes that exited are cleared by processes on the same host, leases held on other
+    hosts sharing the cache directory are kept until they are released.
+
+    Parameters
+    ----------
+    cache_dir
+        Directory in which to store the cache. Defaults to ``$SCVI_HUB_MODELS_CACHE_DIR`` or
+        ``~/.cache/scvi-hub-models``.
+    max_size
+        Maximum total size of the cached artifacts in bytes. Least recently used artifacts are
+        evicted once the cap is exceeded. ``None`` disables eviction.
+    """
+
+    def __init__(self, cache_dir: str | None = None, max_size: int | None = None):
+        if cache_dir is None:
+            cache_dir = os.environ.get("SCVI_HUB_MODELS_CACHE_DIR", DEFAULT_CACHE_DIR)
+        self.cache_dir = Path(cache_dir)
+        self.max_size = max_size
+        for sub_dir in ("objects", "staging", "locks", "leases"):
+            (self.cache_dir / sub_dir).mkdir(parents=True, exist_ok=True)
+        self._index_path = self.cache_dir / "index.json"
+        self._index_lock = FileLock(str(self.cache_dir / "index.lock"))
+        # lease files held by this instance, per content address
+        self._leases = {}
+        self._leases_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, cache_settings: dict | None = None) -> "ArtifactCache":
+        """Build the cache from the ``cache_settings`` block of a workflow config."""
+        cache_settings = cache_settings or {}
+        max_size_gb = cache_settings.get("max_size_gb", None)
+        return cls(
+            cache_dir=cache_settings.get("cache_dir", None),
+            max_size=None if max_size_gb is None else int(max_size_gb * 1024**3),
+        )
+
+    def _read_index(self) -> dict:
+        if not self._index_path.exists():
+            return {"keys": {}, "objects": {}}
+        with open(self._index_path) as f:
+            return json.load(f)
+
+    def _write_index(self, index: dict) -> None:
+        tmp_path = self._index_path.with_suffix(".json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(index, f, indent=2)
+        os.replace(tmp_path, self._index_path)
+
+    def _key_lock(self, key: str) -> FileLock:
+        key_digest = hashlib.sha256(key.encode()).hexdigest()
+        return FileLock(str(self.cache_dir / "locks" / f"{key_digest}.lock"))
+
+    def _lease(self, digest: str) -> None:
+        """Protect ``digest`` from eviction, must be called while holding the index lock."""
+        lease_dir = self.cache_dir / "leases" / digest
+        lease_dir.mkdir(parents=True, exist_ok=True)
+        lease_path = lease_dir / f"{os.getpid()}-{uuid.uuid4().hex}-{socket.gethostname()}"
+        lease_path.touch()
+        with self._leases_lock:
+            self._leases.setdefault(digest, []).append(lease_path)
+
+    def _is_leased(self, digest: str) -> bool:
+        """Whether a live process holds a lease on ``digest``, removing leases of dead processes on this host."""
+        lease_dir = self.cache_dir / "leases" / digest
+        if not lease_dir.exists():
+            return False
+        leased = False
+        hostname = socket.gethostname()
+        for lease_path in lease_dir.iterdir():
+            pid, _, host = lease_path.name.split("-", 2)
+            # processes on other hosts cannot be checked
+            if host != hostname or _pid_alive(int(pid)):
+                leased = True
+            else:
+                lease_path.unlink(missing_ok=True)
+        return leased
+
+    def release(self, path: str) -> None:
+        """Return one lease on the artifact containing ``path``, so that it can be evicted again.
+
+        Paths outside of the cache are ignored.
+        """
+        try:
+            digest = Path(path).resolve().relative_to((self.cache_dir / "objects").resolve()).parts[0]
+        except (ValueError, IndexError):
+            return
+        with self._leases_lock:
+            leases = self._leases.get(digest, [])
+            if not leases:
+                return
+            lease_path = leases.pop()
+            if not leases:
+                del self._leases[digest]
+        lease_path.unlink(missing_ok=True)
+
+    def release_all(self) -> None:
+        """Return all leases held by this instance."""
+        with self._leases_lock:
+            leases, self._leases = self._leases, {}
+        for lease_paths in leases.values():
+            for lease_path in lease_paths:
+                lease_path.unlink(missing_ok=True)
+
+    def get(self, key: str) -> str | None:
+        """Return the leased cached path for ``key`` and mark it as recently used, or ``None``."""
+        with self._index_lock:
+            index = self._read_index()
+            digest = index["keys"].get(key, None)
+            if digest is None or digest not in index["objects"]:
+                return None
+            entry = index["objects"][digest]
+            path = self.cache_dir / "objects" / digest / entry["fname"]
+            if not path.exists():
+                del index["objects"][digest]
+                self._write_index(index)
+                return None
+            entry["last_access"] = time.time()
+            self._write_index(index)
+            self._lease(digest)
+        return str(path)
+
+    def fetch(
+        self,
+        key: str,
+        fetch: Callable[[str], str],
+        known_hash: str | None = None,
+        variant: str | None = None,
+    ) -> str:
+        """Return the leased cached artifact for ``key``, calling ``fetch`` to populate the cache on a miss.
+
+        Parameters
+        ----------
+        key
+            Key identifying the artifact, e.g. its known hash or source URL.
+        fetch
+            Callable that downloads the artifact into the given staging directory and returns the
+            path of the resulting file or directory.
+        known_hash
+            Pooch-style hash of the artifact. If given, it is used as the content address,
+            otherwise the content hash is computed after fetching.
+        variant
+            Name of the processing applied to the downloaded content (e.g. ``"Untar"``), appended to
+            the content address so that raw and processed artifacts do not collide.
+        """
+        path = self.get(key)
+        if path is not None:
+            logger.info(f"Using cached artifact for {key} at {path}.")
+            return path
+
+        with self._key_lock(key):
+            # Another process might have populated the cache while we waited for the lock.
+            path = self.get(key)
+            if path is not None:
+                logger.info(f"Using cached artifact for {key} at {path}.")
+                return path
+
+            # the staging directory is stable per key, so that a failed fetch can resume from the
+            # partial download it leaves behind
+            staging_dir = self.cache_dir / "staging" / hashlib.sha256(key.encode()).hexdigest()[:16]
+            staging_dir.mkdir(parents=True, exist_ok=True)
+            try:
+                fetched = Path(fetch(str(staging_dir)))
+                digest = normalize_hash(known_hash) if known_hash else f"sha256-{hash_path(fetched)}"
+                if variant is not None:
+                    digest = f"{digest}-{variant.lower()}"
+                with self._index_lock:
+                    index = self._read_index()
+                    entry = index["objects"].get(digest, None)
+                    object_dir = self.cache_dir / "objects" / digest
+                    if entry is None or not (object_dir / entry["fname"]).exists():
+                        # Identical content fetched under another key is only stored once.
+                        shutil.rmtree(object_dir, ignore_errors=True)
+                        object_dir.mkdir(parents=True)
+                        os.replace(fetched, object_dir / fetched.name)
+                        entry = {"fname": fetched.name, "size": path_size(object_dir / fetched.name)}
+                    entry["last_access"] = time.time()
+                    index["objects"][digest] = entry
+                    index["keys"][key] = digest
+                    self._lease(digest)
+                    self._evict(index)
+                    self._write_index(index)
+            except BaseException:
+                logger.info(f"Keeping partial downloads of {key} in {staging_dir} to resume from.")
+                raise
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+        object_path = object_dir / entry["fname"]
+        logger.info(f"Cached artifact for {key} at {object_path}.")
+        return str(object_path)
+
+    def _evict(self, index: dict) -> None:
+        """Evict least recently used objects that are not leased until the cache fits into ``max_size``."""
+        if self.max_size is None:
+            return
+        total_size = sum(entry["size"] for entry in index["objects"].values())
+        by_last_access = sorted(index["objects"].items(), key=lambda item: item[1]["last_access"])
+        for digest, entry in by_last_access:
+            if total_size <= self.max_size:
+                break
+            if self._is_leased(digest):
+                continue
+            logger.info(f"Evicting cached artifact {digest} ({entry['size']} bytes).")
+            shutil.rmtree(self.cache_dir / "objects" / digest, ignore_errors=True)
+            shutil.rmtree(self.cache_dir / "leases" / digest, ignore_errors=True)
+            del index["objects"][digest]
+            total_size -= entry["size"]
+        if total_size > self.max_size:
+            logger.info(f"Cache exceeds its size cap by {total_size - self.max_size} bytes of leased artifacts.")
+        index["keys"] = {key: digest for key, digest in index["keys"].items() if digest in index["objects"]}
+
+    def size(self) -> int:
+        """Total size of the cached artifacts in bytes."""
+        with self._index_lock:
+            return sum(entry["size"] for entry in self._read_index()["objects"].values())
+
+    def invalidate(self, key: str) -> None:
+        """Forget ``key``, removing its object unless other keys refer to the same content."""
+        with self._index_lock:
+            index = self._read_index()
+            digest = index["keys"].pop(key, None)
+            if digest is None:
+                return
+            if digest not in index["keys"].values() and digest in index["objects"]:
+                logger.info(f"Removing cached artifact {digest} for {key}.")
+                shutil.rmtree(self.cache_dir / "objects" / digest, ignore_errors=True)
+                del index["objects"][digest]
+            self._write_index(index)
+
+    def clear(self) -> None:
+        """Remove all cached artifacts and partial downloads."""
+        with self._index_lock:
+            shutil.rmtree(self.cache_dir / "staging", ignore_errors=True)
+            shutil.rmtree(self.cache_dir / "objects", ignore_errors=True)
+            (self.cache_dir / "objects").mkdir()
+            self._write_index({"keys": {}, "objects": {}})
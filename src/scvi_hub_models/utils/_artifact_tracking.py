@@ -0,0 +1,125 @@
+import logging
+import os
+
+from filelock import FileLock
+
+logger = logging.getLogger(__name__)
+
+
+class ArtifactTracker:
+    """Transactional DVC tracking of workflow outputs.
+
+    Outputs are queued with :meth:`track` and published together by :meth:`commit`: one
+    ``dvc add`` over all outputs, one git commit, one parallel ``dvc push`` and one git push. If
+    any of these steps fails, the git index, the DVC files and the local branch are rolled back so
+    that nothing is left half-tracked. Used as a context manager, the queue is committed when the
+    block exits normally and discarded otherwise. Commits hold a file lock in the git directory,
+    so that workflows running in parallel on the same checkout, e.g. under
+    :func:`~scvi_hub_models.utils.run_scheduled`, publish their outputs one after another.
+
+    Parameters
+    ----------
+    dvc_repo
+        The :class:`dvc.repo.Repo` that tracks the outputs.
+    git_repo
+        The :class:`git.Repo` of the same repository.
+    jobs
+        Number of parallel jobs for ``dvc push``. Defaults to DVC's default.
+    dvc_remote
+        Name of the DVC remote to push to. Defaults to the repository's default remote.
+    git_remote
+        Name of the git remote to push to.
+    """
+
+    def __init__(
+        self,
+        dvc_repo,
+        git_repo,
+        jobs: int | None = None,
+        dvc_remote: str | None = None,
+        git_remote: str = "origin",
+    ):
+        self.dvc_repo = dvc_repo
+        self.git_repo = git_repo
+        self.jobs = jobs
+        self.dvc_remote = dvc_remote
+        self.git_remote = git_remote
+        self._queue = []
+        self._depth = 0
+        self._lock = FileLock(os.path.join(git_repo.git_dir, "scvi-hub-models-tracking.lock"))
+
+    @property
+    def queued(self) -> list[str]:
+        """Outputs that will be tracked by the next :meth:`commit`."""
+        return list(self._queue)
+
+    def track(self, path: str) -> None:
+        """Queue ``path`` for tracking.
+
+        Outside of a transaction, i.e. when not used as a context manager, the output is
+        committed right away.
+        """
+        path = os.path.abspath(path)
+        if path not in self._queue:
+            self._queue.append(path)
+        if self._depth == 0:
+            self.commit()
+
+    def discard(self) -> None:
+        """Drop all queued outputs without tracking them."""
+        if self._queue:
+            logger.info(f"Discarding {len(self._queue)} queued output(s).")
+        self._queue = []
+
+    def _metadata_files(self, paths: list[str]) -> list[str]:
+        files = [f"{path}.dvc" for path in paths]
+        files += sorted({os.path.join(os.path.dirname(path), ".gitignore") for path in paths})
+        return [os.path.relpath(file, self.git_repo.working_tree_dir) for file in files]
+
+    def _rollback(self, head_commit, files: list[str]) -> None:
+        logger.warning("Rolling back DVC tracking.")
+        self.git_repo.head.reset(head_commit, index=True, working_tree=False)
+        tracked = {item.path for item in head_commit.tree.traverse()}
+        for file in files:
+            if file in tracked:
+                self.git_repo.git.checkout(head_commit.hexsha, "--", file)
+            elif os.path.exists(os.path.join(self.git_repo.working_tree_dir, file)):
+                os.remove(os.path.join(self.git_repo.working_tree_dir, file))
+
+    def commit(self, message: str | None = None) -> None:
+        """Track all queued outputs with a single DVC add, commit and push."""
+        if not self._queue:
+            return
+        paths, self._queue = self._queue, []
+        rel_paths = [os.path.relpath(path, self.git_repo.working_tree_dir) for path in paths]
+        if message is None:
+            message = f"Track {', '.join(rel_paths)} with DVC"
+        files = self._metadata_files(paths)
+
+        with self._lock:
+            head_commit = self.git_repo.head.commit
+            logger.info(f"Tracking {len(paths)} output(s) with DVC.")
+            try:
+                self.dvc_repo.add(paths)
+                self.git_repo.index.add(
+                    [file for file in files if os.path.exists(os.path.join(self.git_repo.working_tree_dir, file))]
+                )
+                self.git_repo.index.commit(message)
+                self.dvc_repo.push(targets=paths, jobs=self.jobs, remote=self.dvc_remote)
+                self.git_repo.remote(self.git_remote).push().raise_if_error()
+            except Exception:
+                self._rollback(head_commit, files)
+                raise
+
+    def __enter__(self) -> "ArtifactTracker":
+        self._depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self._depth -= 1
+        if self._depth > 0:
+            return
+        if exc_type is None:
+            self.commit()
+        else:
+            self.discard()
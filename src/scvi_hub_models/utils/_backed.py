@@ -0,0 +1,247 @@
+import logging
+import os
+
+import anndata
+import numpy as np
+from scipy import sparse
+
+logger = logging.getLogger(__name__)
+
+# `uns` key listing the layers that are stored as `X` in backed copies
+LAYER_ALIASES_KEY = "layer_aliases"
+
+
+def _as_positions(index, n: int) -> np.ndarray:
+    if index is None:
+        return np.arange(n)
+    index = np.asarray(index)
+    if index.dtype == bool:
+        return np.flatnonzero(index)
+    return np.sort(index)
+
+
+def _take_rows(value, rows: np.ndarray):
+    return value.iloc[rows] if hasattr(value, "iloc") else value[rows]
+
+
+def _read_csc_subset(matrix, rows: np.ndarray, columns: np.ndarray, chunk_size: int) -> sparse.csr_matrix:
+    """Column-chunked :func:`read_matrix_subset` for CSC datasets, whose row slices read every column."""
+    blocks = []
+    select_rows = len(rows) != matrix.shape[0]
+    for chunk_start in range(0, len(columns), chunk_size):
+        chunk_columns = columns[chunk_start : chunk_start + chunk_size]
+        start, stop = chunk_columns[0], chunk_columns[-1] + 1
+        block = matrix[:, start:stop]
+        if len(chunk_columns) != stop - start:
+            block = block[:, chunk_columns - start]
+        if select_rows:
+            block = block[rows]
+        blocks.append(sparse.csc_matrix(block))
+    if not blocks:
+        return sparse.csr_matrix((len(rows), 0))
+    return sparse.hstack(blocks, format="csr")
+
+
+def read_matrix_subset(matrix, obs_index=None, var_index=None, chunk_size: int = 50_000):
+    """Read the rows ``obs_index`` and columns ``var_index`` of an on-disk matrix in chunks.
+
+    Dense and CSR matrices are read in chunks of rows. CSC matrices are read in chunks of columns
+    with as many elements as ``chunk_size`` rows, since every row slice of a CSC matrix reads all
+    of it.
+
+    Parameters
+    ----------
+    matrix
+        An h5py dataset (dense) or an :func:`~anndata.io.sparse_dataset`, e.g. of ``X`` or
+        ``raw/X`` of a backed AnnData.
+    obs_index, var_index
+        Boolean masks or positions of the rows and columns to read, all if ``None``.
+    chunk_size
+        Number of rows read from disk at a time.
+
+    Returns
+    -------
+    The selected slice in memory, CSR if ``matrix`` is sparse. Only one chunk of rows with all
+    columns, or of columns with all rows, is held in memory in addition to the result.
+    """
+    from anndata.abc import CSCDataset, CSRDataset
+
+    n_obs, n_vars = matrix.shape
+    rows = _as_positions(obs_index, n_obs)
+    columns = None if var_index is None else _as_positions(var_index, n_vars)
+    is_sparse = isinstance(matrix, CSRDataset | CSCDataset)
+    if isinstance(matrix, CSCDataset):
+        column_chunk_size = max(1, chunk_size * n_vars // max(n_obs, 1))
+        columns = np.arange(n_vars) if columns is None else columns
+        return _read_csc_subset(matrix, rows, columns, column_chunk_size)
+
+    blocks = []
+    for chunk_start in range(0, len(rows), chunk_size):
+        chunk_rows = rows[chunk_start : chunk_start + chunk_size]
+        start, stop = chunk_rows[0], chunk_rows[-1] + 1
+        block = matrix[start:stop]
+        if len(chunk_rows) != stop - start:
+            block = block[chunk_rows - start]
+        if columns is not None:
+            block = block[:, columns]
+        blocks.append(sparse.csr_matrix(block) if is_sparse else np.asarray(block))
+    if not blocks:
+        shape = (0, n_vars if columns is None else len(columns))
+        return sparse.csr_matrix(shape) if is_sparse else np.empty(shape)
+    return sparse.vstack(blocks, format="csr") if is_sparse else np.concatenate(blocks)
+
+
+def read_backed_subset(
+    adata: anndata.AnnData,
+    obs_index=None,
+    var_index=None,
+    x_key: str = "X",
+    chunk_size: int = 50_000,
+) -> anndata.AnnData:
+    """Load a slice of a backed AnnData into memory, reading only the selected rows from disk.
+
+    Selections are resolved on ``adata.obs``/``adata.var`` beforehand, e.g.
+    ``obs_index=adata.obs["core_or_extension"] == "core"``.
+
+    Parameters
+    ----------
+    adata
+        AnnData opened with ``backed="r"``.
+    obs_index, var_index
+        Boolean masks or positions of the cells and genes to load, all if ``None``.
+    x_key
+        Path of the matrix in the file that becomes ``X``, e.g. ``"raw/X"`` for raw counts with
+        the same genes as ``var``.
+    chunk_size
+        Number of rows read from disk at a time.
+
+    Returns
+    -------
+    AnnData with ``obs``, ``var``, ``obsm``, ``obsp``, ``varm`` and ``uns`` of the slice. Layers
+    and ``raw`` are not loaded.
+    """
+    import h5py
+    from anndata.io import sparse_dataset
+
+    if not adata.isbacked:
+        raise ValueError("`adata` must be opened in backed mode.")
+    rows = _as_positions(obs_index, adata.n_obs)
+    columns = _as_positions(var_index, adata.n_vars)
+
+    element = adata.file[x_key]
+    matrix = element if isinstance(element, h5py.Dataset) else sparse_dataset(element)
+    if matrix.shape != adata.shape:
+        raise ValueError(f"Shape of {x_key} {matrix.shape} does not match the dataset {adata.shape}.")
+    logger.info(f"Reading {len(rows)} cells and {len(columns)} genes of {x_key} from {adata.filename}.")
+    X = read_matrix_subset(
+        matrix,
+        obs_index=None if len(rows) == adata.n_obs else rows,
+        var_index=None if len(columns) == adata.n_vars else columns,
+        chunk_size=chunk_size,
+    )
+
+    return anndata.AnnData(
+        X=X,
+        obs=adata.obs.iloc[rows].copy(),
+        var=adata.var.iloc[columns].copy(),
+        obsm={key: _take_rows(value, rows) for key, value in adata.obsm.items()},
+        obsp={key: value[rows][:, rows] for key, value in adata.obsp.items()},
+        varm={key: _take_rows(value, columns) for key, value in adata.varm.items()},
+        uns=dict(adata.uns),
+    )
+
+
+def _modalities(adata) -> list[anndata.AnnData]:
+    return [adata] if isinstance(adata, anndata.AnnData) else list(adata.mod.values())
+
+
+def _copy_counts_as_x(source, target, layer: str) -> None:
+    """Copy the AnnData group ``source`` to ``target`` with ``layers[layer]`` stored as ``X``."""
+    from anndata.io import write_elem
+
+    target.attrs.update(source.attrs)
+    for key in source:
+        if key not in ("X", "layers"):
+            source.copy(source[key], target, name=key)
+    layers = target.create_group("layers")
+    layers.attrs.update(source["layers"].attrs)
+    for key in source["layers"]:
+        if key != layer:
+            source.copy(source["layers"][key], layers, name=key)
+    source.copy(source["layers"][layer], target, name="X")
+    write_elem(target["uns"], LAYER_ALIASES_KEY, np.array([layer]))
+
+
+def write_backed_copy(path: str, copy_path: str, layer: str = "counts") -> str:
+    """Copy an ``.h5ad`` or ``.h5mu`` file for backed reading, storing the ``layer`` of every modality as ``X``.
+
+    anndata only streams ``X`` from disk in backed mode and reads all layers into memory, so the
+    copy replaces ``X`` of modalities with ``layer`` by ``layer``. The replaced ``X``, e.g.
+    normalized expression, is dropped and :func:`read_dataset` restores ``layer`` as an alias of
+    ``X``. Groups are copied within HDF5 without loading them, and ``path`` itself is left as is.
+
+    Returns
+    -------
+    ``copy_path``, or ``path`` if no modality has ``layer`` and the file can be read as is. A copy
+    newer than ``path`` is reused.
+    """
+    import h5py
+
+    with h5py.File(path, "r") as source:
+        modalities = [source] if "mod" not in source else [source["mod"][mod] for mod in source["mod"]]
+        if not any(layer in mod.get("layers", {}) for mod in modalities):
+            return path
+        if os.path.exists(copy_path) and os.path.getmtime(copy_path) >= os.path.getmtime(path):
+            return copy_path
+
+        logger.info(f"Copying {path} to {copy_path} with the {layer} layer as X.")
+        os.makedirs(os.path.dirname(os.path.abspath(copy_path)), exist_ok=True)
+        tmp_path = f"{copy_path}.tmp"
+        # MuData identifies its files by a header in the HDF5 user block
+        with h5py.File(tmp_path, "w", userblock_size=source.userblock_size) as target:
+            if "mod" not in source:
+                _copy_counts_as_x(source, target, layer)
+            else:
+                target.attrs.update(source.attrs)
+                for key in source:
+                    if key != "mod":
+                        source.copy(source[key], target, name=key)
+                target_mods = target.create_group("mod")
+                target_mods.attrs.update(source["mod"].attrs)
+                for mod in source["mod"]:
+                    if layer in source["mod"][mod].get("layers", {}):
+                        _copy_counts_as_x(source["mod"][mod], target_mods.create_group(mod), layer)
+                    else:
+                        source.copy(source["mod"][mod], target_mods, name=mod)
+        userblock_size = source.userblock_size
+    if userblock_size:
+        with open(path, "rb") as f, open(tmp_path, "r+b") as target:
+            target.write(f.read(userblock_size))
+    os.replace(tmp_path, copy_path)
+    return copy_path
+
+
+def read_dataset(path: str, backed: bool = False):
+    """Read an ``.h5ad`` or ``.h5mu`` file, e.g. a copy written by :func:`write_backed_copy`.
+
+    Layers that were stored as ``X`` refer to ``X`` again, so in backed mode they are streamed from
+    disk like ``X``. anndata reads all other layers into memory even in backed mode, which is logged as
+    a warning.
+    """
+    if path.endswith(".h5mu"):
+        import mudata
+
+        adata = mudata.read_h5mu(path, backed=backed)
+    else:
+        adata = anndata.io.read_h5ad(path, backed="r" if backed else None)
+    for mod in _modalities(adata):
+        aliases = [str(layer) for layer in mod.uns.pop(LAYER_ALIASES_KEY, [])]
+        for layer in aliases:
+            mod.layers[layer] = mod.X
+        in_memory = [layer for layer in mod.layers.keys() if layer not in aliases]
+        if backed and in_memory:
+            logger.warning(
+                f"Layers {', '.join(in_memory)} of {path} are read into memory, only X and layers aliasing "
+                "it are streamed from disk in backed mode."
+            )
+    return adata
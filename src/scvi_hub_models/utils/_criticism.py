@@ -0,0 +1,157 @@
+import json
+import os
+
+import mudata
+import numpy as np
+import pandas as pd
+import sparse
+from scipy.sparse import csr_matrix, vstack
+from scvi import REGISTRY_KEYS
+from scvi.criticism import PosteriorPredictiveCheck
+from scvi.model.base import BaseModelClass
+from xarray import DataArray, Dataset
+
+RAW = "Raw"
+MODEL = "model"
+
+
+def _dense(array) -> np.ndarray:
+    return array.todense() if isinstance(array, sparse.SparseArray) else np.asarray(array)
+
+
+def _to_csr(array) -> csr_matrix:
+    return csr_matrix(array.to_scipy_sparse()) if isinstance(array, sparse.SparseArray) else csr_matrix(array)
+
+
+class _DrawnPosteriorPredictiveCheck(PosteriorPredictiveCheck):
+    """:class:`~scvi.criticism.PosteriorPredictiveCheck` on one posterior predictive sample drawn beforehand."""
+
+    def __init__(self, adata, models_dict: dict[str, BaseModelClass], sample: csr_matrix, modality: str | None = None):
+        self._sample = sample
+        super().__init__(adata, models_dict, n_samples=1, modality=modality)
+
+    def _store_posterior_predictive_samples(self, batch_size: int = 32, indices=None) -> None:
+        self.batch_size = batch_size
+        cells, features = list(self.adata.obs_names), list(self.adata.var_names)
+        self.samples_dataset = Dataset(
+            {
+                MODEL: DataArray(
+                    data=sparse.COO.from_scipy_sparse(self._sample)[:, :, None],
+                    coords={"cells": cells, "features": features, "samples": np.arange(1)},
+                ),
+                RAW: DataArray(data=self.raw_counts, coords={"cells": cells, "features": features}),
+            }
+        )
+
+
+def _gene_cv(sums: np.ndarray, squares: np.ndarray, n_obs: int) -> np.ndarray:
+    """Coefficient of variation across cells from the sums of counts and squared counts per gene."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = sums / n_obs
+        return np.sqrt(np.maximum(squares / n_obs - np.square(mean), 0)) / mean
+
+
+def _chunked_check(
+    model: BaseModelClass,
+    n_samples: int,
+    chunk_size: int,
+    modality: str | None,
+) -> PosteriorPredictiveCheck:
+    """Compute the coefficients of variation of the report chunk by chunk of cells.
+
+    Cell-wise coefficients only depend on the cells of a chunk. Gene-wise coefficients are
+    computed from the sums of counts and squared counts over all chunks. The differential
+    expression only uses the first posterior predictive sample, which is kept for all cells.
+    """
+    adata = model.adata
+    cell_cvs, de_samples = [], []
+    sums = squares = raw_sums = raw_squares = 0
+    for start in range(0, adata.n_obs, chunk_size):
+        indices = np.arange(start, min(start + chunk_size, adata.n_obs))
+        ppc = PosteriorPredictiveCheck(adata, {MODEL: model}, n_samples=n_samples, indices=indices, modality=modality)
+        samples = ppc.samples_dataset[MODEL].data
+        raw = ppc.samples_dataset[RAW].data
+        de_samples.append(_to_csr(samples[:, :, 0]))
+        sums = sums + _dense(samples.sum(axis=0)).astype(np.float64)
+        squares = squares + _dense(np.square(samples).sum(axis=0)).astype(np.float64)
+        raw_sums = raw_sums + _dense(raw.sum(axis=0)).astype(np.float64)
+        raw_squares = raw_squares + _dense(np.square(raw).sum(axis=0)).astype(np.float64)
+        ppc.coefficient_of_variation("features")
+        cell_cvs.append(ppc.metrics["cv_cell"])
+
+    ppc = _DrawnPosteriorPredictiveCheck(adata, {MODEL: model}, vstack(de_samples, format="csr"), modality=modality)
+    features = pd.Index(ppc.adata.var_names, name="features")
+    ppc.metrics["cv_cell"] = pd.concat(cell_cvs)
+    ppc.metrics["cv_gene"] = pd.DataFrame(
+        {
+            MODEL: np.nanmean(_gene_cv(sums, squares, adata.n_obs), axis=1),
+            RAW: np.nan_to_num(_gene_cv(raw_sums, raw_squares, adata.n_obs)),
+        },
+        index=features,
+    )
+    return ppc
+
+
+def create_chunked_criticism_report(
+    model: BaseModelClass,
+    save_folder: str,
+    chunk_size: int,
+    n_samples: int = 3,
+    label_key: str | None = None,
+) -> None:
+    """Create the criticism report of :func:`~scvi.criticism.create_criticism_report` chunk by chunk.
+
+    Posterior predictive samples are drawn for ``chunk_size`` cells at a time, so that only one
+    chunk of samples is held in memory next to the single sample used for the differential
+    expression. The report and the annotations of ``model.adata`` have the same format as the
+    ones of scvi-tools.
+
+    Parameters
+    ----------
+    model
+        Trained model, the report is created for all cells of ``model.adata``.
+    save_folder
+        Folder to write ``metrics.json`` to.
+    chunk_size
+        Number of cells to draw posterior predictive samples for at a time.
+    n_samples
+        Number of posterior predictive samples per cell.
+    label_key
+        Key in ``obs`` to group cells by for the differential expression. Defaults to the labels of
+        the model.
+    """
+    from scvi.criticism._create_criticism_report import _cv_metrics, _dataframe_to_markdown
+
+    if isinstance(model.adata, mudata.MuData):
+        modalities = model.registry_["setup_args"]["modalities"]
+        modalities = [modalities[key] for key in modalities if "layer" in key]
+    else:
+        modalities = [None]
+    if label_key is None:
+        labels_state_registry = model.adata_manager.get_state_registry(REGISTRY_KEYS.LABELS_KEY)
+        if labels_state_registry.original_key != "_scvi_labels":
+            label_key = labels_state_registry.original_key
+
+    markdown = {"cell_wise_cv": "", "gene_wise_cv": "", "diff_exp": ""}
+    for modality in modalities:
+        ppc = _chunked_check(model, n_samples, chunk_size, modality)
+        ppc.differential_expression(de_groupby=label_key, p_val_thresh=0.2)
+        summary = ppc.metrics["diff_exp"]["summary"].set_index("group").drop(columns=["model"])
+        sections = {
+            "cell_wise_cv": _cv_metrics(ppc, model, cell_wise=True),
+            "gene_wise_cv": _cv_metrics(ppc, model, cell_wise=False),
+            "diff_exp": _dataframe_to_markdown(summary.sort_values(by="n_cells", ascending=False)),
+        }
+        for key, section in sections.items():
+            markdown[key] += section if modality is None else f"Modality: {modality}\n\n{section}\n\n"
+
+        adata = model.adata if modality is None else model.adata[modality]
+        cv_gene, cv_cell = ppc.metrics["cv_gene"], ppc.metrics["cv_cell"]
+        adata.var["cv_gene_ratio"] = (cv_gene[MODEL] / (cv_gene[MODEL] + cv_gene[RAW])).to_numpy()
+        adata.obs["cv_cell_ratio"] = (cv_cell[MODEL] / (cv_cell[MODEL] + cv_cell[RAW])).to_numpy()
+        lfcs = ppc.metrics["diff_exp"]["lfc_per_model_per_group"][MODEL]
+        for key, source in (("lfc_model", "approx"), ("lfc_raw", "raw")):
+            adata.varm[key] = pd.DataFrame({group: value[source] for group, value in lfcs.items()}).loc[adata.var_names]
+
+    with open(os.path.join(save_folder, "metrics.json"), "w") as f:
+        json.dump(markdown, f, indent=4)
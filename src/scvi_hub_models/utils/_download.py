@@ -0,0 +1,369 @@
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from ._artifact_cache import normalize_hash
+from ._instrumentation import record_transfer
+from ._retry import is_transient_error
+
+logger = logging.getLogger(__name__)
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def _hash_file(path: str, algorithm: str, chunk_size: int = 2**20) -> str:
+    hasher = hashlib.new(algorithm)
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def s3_to_https(uri: str, region: str | None = None) -> str:
+    """Public HTTPS URL of an ``s3://bucket/key`` URI, other URIs are returned unchanged."""
+    if not uri.startswith("s3://"):
+        return uri
+    bucket, _, key = uri[len("s3://") :].partition("/")
+    host = f"{bucket}.s3.amazonaws.com" if region is None else f"{bucket}.s3.{region}.amazonaws.com"
+    return f"https://{host}/{key}"
+
+
+def host_session(url: str, max_connections: int = 10):
+    """Process-wide :class:`requests.Session` for the host of ``url``.
+
+    Connections to a host are kept alive and reused across downloads. The pool holds the largest
+    ``max_connections`` requested for the host so far.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    parts = urlsplit(url)
+    prefix = f"{parts.scheme}://{parts.netloc}"
+    with _sessions_lock:
+        session, pool_size = _sessions.get(prefix, (None, 0))
+        if session is None:
+            session = requests.Session()
+        if max_connections > pool_size:
+            pool_size = max_connections
+            session.mount(prefix, HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        _sessions[prefix] = (session, pool_size)
+        return session
+
+
+def _probe(session, url: str, timeout: float) -> tuple[int | None, str | None]:
+    """Size and validator (``ETag`` or ``Last-Modified``) of ``url`` if the server supports ranges."""
+    with session.get(url, headers={"Range": "bytes=0-0"}, stream=True, timeout=timeout) as response:
+        if response.status_code == 416:
+            # empty files have no satisfiable range
+            return None, None
+        response.raise_for_status()
+        content_range = response.headers.get("Content-Range", "")
+        if response.status_code != 206 or "/" not in content_range or "Content-Encoding" in response.headers:
+            return None, None
+        size = content_range.rsplit("/", 1)[1]
+        if not size.isdigit():
+            return None, None
+        return int(size), response.headers.get("ETag", response.headers.get("Last-Modified", None))
+
+
+class _RangeDownload:
+    """Download of byte ranges of ``url`` into a preallocated file, resumable from a state file."""
+
+    def __init__(self, session, url: str, part_path: str, size: int, validator: str | None, n_ranges: int):
+        self.session = session
+        self.url = url
+        self.part_path = part_path
+        self.state_path = f"{part_path}.json"
+        self.size = size
+        self.validator = validator
+        self.lock = threading.Condition()
+        self.failed = False
+        self._saved = 0.0
+
+        state = self._load_state()
+        if state is not None and os.path.exists(part_path):
+            self.ranges = state["ranges"]
+        else:
+            bounds = [size * i // n_ranges for i in range(n_ranges + 1)]
+            self.ranges = [[start, stop, 0] for start, stop in zip(bounds[:-1], bounds[1:], strict=True)]
+            with open(part_path, "wb") as f:
+                f.truncate(size)
+        self.resumed = sum(done for _, _, done in self.ranges)
+
+    def _load_state(self) -> dict | None:
+        try:
+            with open(self.state_path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if state.get("url") != self.url or state.get("size") != self.size or state.get("validator") != self.validator:
+            logger.info(f"Remote file {self.url} changed, discarding the partial download.")
+            return None
+        return state
+
+    def save_state(self, force: bool = False) -> None:
+        with self.lock:
+            if not force and time.monotonic() - self._saved < 1.0:
+                return
+            self._saved = time.monotonic()
+            ranges = [list(progress) for progress in self.ranges]
+        state = {"url": self.url, "size": self.size, "validator": self.validator, "ranges": ranges}
+        tmp_path = f"{self.state_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+    def frontier(self) -> int:
+        """End of the contiguous downloaded prefix of the file."""
+        for start, stop, done in self.ranges:
+            if start + done < stop:
+                return start + done
+        return self.size
+
+    def fetch_range(self, index: int, fd: int, chunk_size: int, timeout: float, hasher=None) -> None:
+        """Download the rest of range ``index``, updating its progress after every chunk."""
+        start, stop, done = self.ranges[index]
+        position = start + done
+        if position >= stop:
+            return
+        headers = {"Range": f"bytes={position}-{stop - 1}"}
+        if self.validator is not None:
+            headers["If-Range"] = self.validator
+        with self.session.get(self.url, headers=headers, stream=True, timeout=timeout) as response:
+            response.raise_for_status()
+            if response.status_code != 206:
+                raise ValueError(f"{self.url} changed during the download or does not support ranges anymore.")
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                if self.failed:
+                    return
+                chunk = chunk[: stop - position]
+                os.pwrite(fd, chunk, position)
+                record_transfer("download", len(chunk))
+                if hasher is not None:
+                    hasher.update(chunk)
+                position += len(chunk)
+                with self.lock:
+                    self.ranges[index][2] = position - start
+                    self.lock.notify_all()
+                self.save_state()
+                if position >= stop:
+                    break
+        if position < stop:
+            raise ConnectionError(f"Connection closed after {position - start} of {stop - start} bytes.")
+
+
+def _with_retries(fetch, retries: int, backoff: float, progress):
+    """Call ``fetch`` until it succeeds, retrying transient errors that did not make progress ``retries`` times."""
+    attempt = 0
+    while True:
+        before = progress()
+        try:
+            return fetch()
+        except Exception as e:
+            attempt = 1 if progress() > before else attempt + 1
+            if attempt > retries or not is_transient_error(e):
+                raise
+            delay = min(backoff * 2 ** (attempt - 1), 60.0) * random.uniform(0.5, 1.0)
+            logger.warning(f"Download interrupted ({e.__class__.__name__}: {e}), resuming in {delay:.1f}s.")
+            time.sleep(delay)
+
+
+def _download_ranges(
+    download: _RangeDownload,
+    algorithm: str | None,
+    connections: int,
+    chunk_size: int,
+    timeout: float,
+    retries: int,
+    backoff: float,
+):
+    """Download all ranges and return the hasher of the full file, ``None`` without ``algorithm``."""
+    hasher = None if algorithm is None else hashlib.new(algorithm)
+    fd = os.open(download.part_path, os.O_RDWR)
+    try:
+        if len(download.ranges) == 1:
+            # a single range is hashed as it is written, after the bytes of a previous attempt
+            if hasher is not None and download.resumed:
+                with open(download.part_path, "rb") as f:
+                    remaining = download.resumed
+                    while remaining and (chunk := f.read(min(chunk_size, remaining))):
+                        hasher.update(chunk)
+                        remaining -= len(chunk)
+            _with_retries(
+                lambda: download.fetch_range(0, fd, chunk_size, timeout, hasher=hasher),
+                retries,
+                backoff,
+                download.frontier,
+            )
+            return hasher
+
+        # ranges complete out of order, so the contiguous prefix is hashed from the page cache
+        # while the remaining ranges are downloaded
+        with ThreadPoolExecutor(max_workers=connections, thread_name_prefix="download") as executor:
+            futures = [
+                executor.submit(
+                    contextvars.copy_context().run,
+                    _with_retries,
+                    lambda index=index: download.fetch_range(index, fd, chunk_size, timeout),
+                    retries,
+                    backoff,
+                    lambda index=index: download.ranges[index][2],
+                )
+                for index in range(len(download.ranges))
+            ]
+            try:
+                hashed = 0
+                while hashed < download.size and hasher is not None:
+                    with download.lock:
+                        while download.frontier() == hashed and not all(future.done() for future in futures):
+                            if any(future.done() and future.exception() is not None for future in futures):
+                                break
+                            download.lock.wait(0.5)
+                        frontier = download.frontier()
+                    if frontier == hashed:
+                        break
+                    while hashed < frontier:
+                        chunk = os.pread(fd, min(chunk_size, frontier - hashed), hashed)
+                        hasher.update(chunk)
+                        hashed += len(chunk)
+                for future in futures:
+                    future.result()
+            except BaseException:
+                download.failed = True
+                raise
+        return hasher
+    finally:
+        os.close(fd)
+        download.save_state(force=True)
+
+
+def _download_stream(session, url: str, part_path: str, algorithm: str | None, chunk_size: int, timeout: float):
+    """Download ``url`` in a single request, for servers that do not support ranges."""
+    hasher = None if algorithm is None else hashlib.new(algorithm)
+    size = 0
+    with session.get(url, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        expected_size = None
+        if "Content-Length" in response.headers and "Content-Encoding" not in response.headers:
+            expected_size = int(response.headers["Content-Length"])
+        with open(part_path, "wb") as f:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                f.write(chunk)
+                record_transfer("download", len(chunk))
+                if hasher is not None:
+                    hasher.update(chunk)
+                size += len(chunk)
+    if expected_size is not None and size != expected_size:
+        raise ConnectionError(f"Download of {url} is incomplete: received {size} of {expected_size} bytes.")
+    return hasher
+
+
+def download_file(
+    url: str,
+    path: str,
+    known_hash: str | None = None,
+    connections: int = 1,
+    min_split_size: int = 64 * 2**20,
+    retries: int = 5,
+    backoff: float = 1.0,
+    chunk_size: int = 2**20,
+    timeout: float = 60.0,
+    session=None,
+) -> str:
+    """Stream ``url`` to ``path``, hashing the bytes as they are written.
+
+    The file is written to ``<path>.part`` and only renamed to ``path`` once the hash matches
+    ``known_hash``, so a single-connection download is never read back from disk for the check.
+    If the server supports HTTP range requests, interrupted downloads are resumed where they
+    stopped, within the call for transient errors and across calls from the progress recorded
+    in ``<path>.part.json``. Files larger than ``min_split_size`` are downloaded in up to
+    ``connections`` parallel byte ranges. An existing ``path`` is reused if it matches
+    ``known_hash``.
+
+    Parameters
+    ----------
+    url
+        HTTP(S) URL of the file.
+    path
+        Destination file, parent directories are created.
+    known_hash
+        Pooch-style hash, e.g. ``"md5:<hexdigest>"`` as reported by Zenodo or a plain SHA256.
+        Without it, only the size is checked.
+    connections
+        Maximum number of parallel connections to the host.
+    min_split_size
+        Minimum number of bytes per range when splitting a download across connections.
+    retries
+        Number of consecutive retries of a transient error without any progress in between.
+    backoff
+        Delay in seconds before the first retry, doubled for every further retry.
+    chunk_size
+        Number of bytes read from the connection at a time.
+    timeout
+        Timeout of the connection and of every read in seconds.
+    session
+        :class:`requests.Session` to use, defaults to the pooled session of the host, see
+        :func:`host_session`.
+
+    Returns
+    -------
+    ``path``. A :class:`ValueError` is raised if the content does not match ``known_hash``.
+    """
+    algorithm = digest = None
+    if known_hash is not None:
+        algorithm, digest = normalize_hash(known_hash).split("-", 1)
+    if os.path.exists(path):
+        if known_hash is None or _hash_file(path, algorithm) == digest:
+            logger.info(f"Using existing {path}.")
+            return path
+        logger.warning(f"Existing {path} does not match {known_hash}, downloading it again.")
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    session = session or host_session(url, max_connections=connections)
+    part_path = f"{path}.part"
+    start = time.perf_counter()
+
+    size, validator = _with_retries(lambda: _probe(session, url, timeout), retries, backoff, lambda: 0)
+    if size is None:
+        resumed, n_ranges = 0, 1
+        hasher = _with_retries(
+            lambda: _download_stream(session, url, part_path, algorithm, chunk_size, timeout),
+            retries,
+            backoff,
+            lambda: 0,
+        )
+    else:
+        n_ranges = max(1, min(connections, size // max(min_split_size, 1)))
+        download = _RangeDownload(session, url, part_path, size, validator, n_ranges)
+        resumed, n_ranges = download.resumed, len(download.ranges)
+        if resumed:
+            logger.info(f"Resuming download of {url} at {resumed / 1024**2:.1f} of {size / 1024**2:.1f} MB.")
+        hasher = _download_ranges(download, algorithm, connections, chunk_size, timeout, retries, backoff)
+
+    if hasher is not None and hasher.hexdigest() != digest:
+        for stale in (part_path, f"{part_path}.json"):
+            if os.path.exists(stale):
+                os.remove(stale)
+        raise ValueError(
+            f"{algorithm.upper()} hash of downloaded file {url} ({hasher.hexdigest()}) does not match the "
+            f"known hash {digest}."
+        )
+    os.replace(part_path, path)
+    if os.path.exists(f"{part_path}.json"):
+        os.remove(f"{part_path}.json")
+
+    elapsed = time.perf_counter() - start
+    transferred = os.path.getsize(path) - resumed
+    logger.info(
+        f"Downloaded {url} ({transferred / 1024**2:.1f} MB over {n_ranges} connection(s)) in {elapsed:.1f}s "
+        f"({transferred / 1024**2 / max(elapsed, 1e-9):.1f} MB/s)."
+    )
+    return path
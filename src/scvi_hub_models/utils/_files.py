@@ -0,0 +1,107 @@
+import logging
+import os
+import shutil
+import tarfile
+from pathlib import PurePosixPath
+
+logger = logging.getLogger(__name__)
+
+# ioctl that clones the extents of a file on copy-on-write filesystems (btrfs, XFS)
+_FICLONE = 0x40049409
+
+
+class ExtractMembers:
+    """Pooch processor that extracts only the members of a tar archive under some directories.
+
+    The archive is read in a single streaming pass and members outside of ``directories`` are
+    skipped instead of written to disk. Can be used like :class:`pooch.Untar`.
+
+    Parameters
+    ----------
+    directories
+        Names of directories to extract, matched against every component of the member paths,
+        e.g. ``["scvi", "scanvi"]`` extracts ``models/scvi/model.pt`` but not ``models/condscvi/model.pt``.
+    extract_dir
+        Directory to extract into, relative to the archive. Defaults to ``<archive>.untar``.
+    """
+
+    def __init__(self, directories: list[str], extract_dir: str | None = None):
+        self.directories = sorted(set(directories))
+        self.extract_dir = extract_dir
+
+    @property
+    def variant(self) -> str:
+        """Name of the extracted subset, e.g. to tell cached extractions of the same archive apart."""
+        return "-".join(["untar", *self.directories])
+
+    def _selected(self, name: str) -> bool:
+        return any(part in self.directories for part in PurePosixPath(name).parts[:-1])
+
+    def __call__(self, fname: str, action: str | None = None, pooch=None) -> list[str]:
+        if self.extract_dir is None:
+            self.extract_dir = f"{fname}.untar"
+        else:
+            self.extract_dir = os.path.join(os.path.dirname(fname), self.extract_dir)
+        os.makedirs(self.extract_dir, exist_ok=True)
+
+        # the data filter rejects absolute member paths and paths that leave extract_dir
+        filter_kwargs = {"filter": "data"} if hasattr(tarfile, "data_filter") else {}
+        extracted = []
+        n_members = size = 0
+        with tarfile.open(fname, mode="r|*") as tar:
+            for member in tar:
+                n_members += 1
+                if not member.isfile() or not self._selected(member.name):
+                    continue
+                tar.extract(member, self.extract_dir, **filter_kwargs)
+                extracted.append(os.path.join(self.extract_dir, member.name))
+                size += member.size
+        logger.info(
+            f"Extracted {len(extracted)} of {n_members} members ({size / 1024**2:.1f} MB) of {fname} "
+            f"under {', '.join(self.directories)}."
+        )
+        return extracted
+
+
+def _link_file(source: str, destination: str) -> str:
+    """Hardlink, else reflink, else copy ``source`` to ``destination`` and return the method used."""
+    try:
+        os.link(source, destination)
+        return "hardlink"
+    except OSError:
+        pass
+    try:
+        import fcntl
+
+        with open(source, "rb") as src, open(destination, "wb") as dst:
+            fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+        shutil.copystat(source, destination)
+        return "reflink"
+    except (OSError, ImportError):
+        if os.path.exists(destination):
+            os.remove(destination)
+    shutil.copy2(source, destination)
+    return "copy"
+
+
+def link_tree(source: str, destination: str) -> dict[str, int]:
+    """Mirror the directory tree ``source`` into ``destination`` without copying file contents.
+
+    Files are hardlinked, or reflinked if ``source`` is on another filesystem that supports it, and
+    only copied as a last resort. Existing files in ``destination`` are replaced. Linked files share
+    their content with ``source``, so they must not be modified in place.
+
+    Returns
+    -------
+    Number of files per method, ``"hardlink"``, ``"reflink"`` and ``"copy"``.
+    """
+    counts = {"hardlink": 0, "reflink": 0, "copy": 0}
+    for root, _, files in os.walk(source):
+        target_root = os.path.join(destination, os.path.relpath(root, source))
+        os.makedirs(target_root, exist_ok=True)
+        for file in files:
+            target = os.path.join(target_root, file)
+            if os.path.lexists(target):
+                os.remove(target)
+            counts[_link_file(os.path.join(root, file), target)] += 1
+    return counts
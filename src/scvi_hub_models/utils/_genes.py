@@ -0,0 +1,112 @@
+import logging
+from collections.abc import Sequence
+
+import anndata
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+logger = logging.getLogger(__name__)
+
+
+def gene_indexer(var_names: Sequence[str], genes: Sequence[str]) -> np.ndarray:
+    """Positions of ``genes`` in ``var_names`` in a single vectorized lookup.
+
+    Duplicated ``var_names`` resolve to their first occurrence. Genes that are missing in
+    ``var_names`` get position ``-1``.
+    """
+    var_names = pd.Index(var_names)
+    genes = pd.Index(genes)
+    if genes.has_duplicates:
+        raise ValueError(f"Genes to align to are not unique: {list(genes[genes.duplicated()][:5])}.")
+    if not var_names.has_duplicates:
+        return var_names.get_indexer(genes)
+    first = ~var_names.duplicated()
+    logger.info(f"Using the first of {int((~first).sum())} duplicated gene names.")
+    positions = var_names[first].get_indexer(genes)
+    return np.where(positions < 0, -1, np.flatnonzero(first)[positions])
+
+
+def _align_matrix(matrix, indexer: np.ndarray):
+    """Columns ``indexer`` of ``matrix``, with all-zero columns where ``indexer`` is ``-1``."""
+    found = indexer >= 0
+    n_obs = matrix.shape[0]
+    if found.all():
+        return matrix[:, indexer]
+    if sparse.issparse(matrix) and matrix.format == "csr":
+        # relabel the columns of the present genes instead of stacking and permuting
+        present = sparse.csr_matrix(matrix[:, indexer[found]])
+        indices = np.flatnonzero(found)[present.indices].astype(present.indices.dtype, copy=False)
+        return sparse.csr_matrix((present.data, indices, present.indptr), shape=(n_obs, len(indexer)))
+    if sparse.issparse(matrix):
+        padding = sparse.csr_matrix((n_obs, int((~found).sum())), dtype=matrix.dtype)
+        stacked = sparse.hstack([matrix[:, indexer[found]], padding], format=matrix.format)
+        order = np.empty(len(indexer), dtype=np.int64)
+        order[found] = np.arange(found.sum())
+        order[~found] = found.sum() + np.arange((~found).sum())
+        return stacked[:, order]
+    aligned = np.zeros((n_obs, len(indexer)), dtype=matrix.dtype)
+    aligned[:, found] = np.asarray(matrix)[:, indexer[found]]
+    return aligned
+
+
+def align_genes(adata: anndata.AnnData, genes: Sequence[str], layers: bool = True) -> anndata.AnnData:
+    """Reorder the genes of ``adata`` to ``genes``, padding missing genes with zero counts.
+
+    This is the vectorized equivalent of subsetting to the genes of a reference model followed by
+    :meth:`~scvi.model.base.ArchesMixin.prepare_query_anndata`. Sparse matrices stay sparse.
+
+    Parameters
+    ----------
+    adata
+        The dataset, in memory.
+    genes
+        Gene names of the result, e.g. the ``var_names`` a model was trained on.
+    layers
+        Whether to align the layers as well, otherwise they are dropped.
+
+    Returns
+    -------
+    New AnnData with ``var_names`` equal to ``genes``. Padded genes have missing values in
+    ``var``, see :func:`backfill_var`. ``obs``, ``obsm`` and ``uns`` are shared with ``adata``.
+    """
+    indexer = gene_indexer(adata.var_names, genes)
+    n_missing = int((indexer < 0).sum())
+    if n_missing:
+        logger.info(f"Padding {n_missing} of {len(indexer)} genes with zeros.")
+
+    X = None if adata.X is None else _align_matrix(adata.X, indexer)
+    aligned_layers = {}
+    if layers:
+        for layer, matrix in adata.layers.items():
+            aligned_layers[layer] = X if matrix is adata.X else _align_matrix(matrix, indexer)
+    genes = pd.Index(genes, name=adata.var.index.name)
+    var = adata.var.iloc[indexer[indexer >= 0]].copy()
+    var.index = genes[indexer >= 0]
+    var = var.reindex(genes)
+    return anndata.AnnData(
+        X=X,
+        layers=aligned_layers,
+        obs=adata.obs,
+        var=var,
+        obsm=dict(adata.obsm),
+        obsp=dict(adata.obsp),
+        uns=adata.uns,
+    )
+
+
+def backfill_var(adata: anndata.AnnData, column: str, values: dict[str, object]) -> anndata.AnnData:
+    """Set ``adata.var[column]`` for the genes in ``values``, e.g. feature names of padded genes.
+
+    Missing categories are added to categorical columns. Genes that are not in ``adata`` are
+    ignored.
+    """
+    positions = adata.var_names.get_indexer(list(values))
+    present = positions >= 0
+    new_values = np.asarray(list(values.values()), dtype=object)[present]
+    if isinstance(adata.var[column].dtype, pd.CategoricalDtype):
+        categories = adata.var[column].cat.categories
+        adata.var[column] = adata.var[column].cat.add_categories(pd.Index(new_values).difference(categories).unique())
+    column_position = adata.var.columns.get_loc(column)
+    adata.var.iloc[positions[present], column_position] = new_values
+    return adata
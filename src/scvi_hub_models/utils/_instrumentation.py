@@ -0,0 +1,204 @@
+import json
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import UTC, datetime
+
+logger = logging.getLogger(__name__)
+
+_transfer_lock = threading.Lock()
+# records of the profiled stages that are active in the current context, outermost first
+_active_records: ContextVar[tuple[dict, ...]] = ContextVar("active_records", default=())
+
+
+def record_transfer(direction: str, nbytes: int) -> None:
+    """Add ``nbytes`` downloaded or uploaded (``direction``) to the profiled stages of the current context.
+
+    Transfers in background threads count towards the stages that started them if the thread runs
+    in a copy of their context, see :func:`contextvars.copy_context`, as uploads of
+    :class:`~scvi_hub_models.utils.UploadQueue`, fetches of :func:`~scvi_hub_models.utils.prefetch`
+    and the connections of :func:`~scvi_hub_models.utils.download_file` do.
+    """
+    with _transfer_lock:
+        for record in _active_records.get():
+            record[f"bytes_{direction}ed"] += nbytes
+
+
+def _current_rss() -> int:
+    """Resident set size of the current process in bytes."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # no procfs, fall back to the peak of the process lifetime
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+def _io_counters() -> dict[str, int] | None:
+    """Bytes passed through read and write syscalls by the current process, if available."""
+    try:
+        with open("/proc/self/io") as f:
+            counters = dict(line.split(": ") for line in f.read().splitlines())
+    except OSError:
+        return None
+    return {"read": int(counters["rchar"]), "written": int(counters["wchar"])}
+
+
+class _RSSSampler(threading.Thread):
+    def __init__(self, interval: float):
+        super().__init__(daemon=True, name="rss-sampler")
+        self.interval = interval
+        self.peak = _current_rss()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.peak = max(self.peak, _current_rss())
+
+    def stop(self) -> int:
+        self._stop_event.set()
+        self.join()
+        self.peak = max(self.peak, _current_rss())
+        return self.peak
+
+
+class Profiler:
+    """Record wall time, CPU time, memory and I/O of workflow stages.
+
+    Every :meth:`profile` block adds a record with ``wall_time``, ``cpu_time`` and
+    ``process_cpu_time`` in seconds, ``peak_rss`` (sampled) and ``tracemalloc_peak`` in bytes,
+    ``bytes_read``/``bytes_written`` through syscalls and ``bytes_downloaded``/``bytes_uploaded``
+    reported with :func:`record_transfer`. Nested blocks are recorded separately and included in
+    their parents.
+
+    ``cpu_time`` is the CPU time of the thread that ran the block, ``process_cpu_time`` that of the
+    whole process, including native compute threads (e.g. of PyTorch) but also background uploads
+    and prefetches of other stages. Like ``peak_rss`` and the syscall counters, it is a
+    process-wide measure. Downloads and uploads are only counted for the stages that started them,
+    also if they complete in the background after the block, in which case the record is updated
+    with the next report.
+
+    Parameters
+    ----------
+    report_path
+        JSON file to which the records are written after every block.
+    trace_memory
+        Whether to record the peak of Python allocations with :mod:`tracemalloc`. Off by default
+        because tracing slows down allocation-heavy stages.
+    sample_interval
+        Interval in seconds at which the resident set size is sampled.
+    """
+
+    def __init__(self, report_path: str | None = None, trace_memory: bool = False, sample_interval: float = 0.1):
+        self.report_path = report_path
+        self.trace_memory = trace_memory
+        self.sample_interval = sample_interval
+        self.records = []
+        self._stack = []
+
+    @contextmanager
+    def profile(self, name: str):
+        """Profile the enclosed block as stage ``name``."""
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            _, peak = tracemalloc.get_traced_memory()
+            # resetting the peak would hide it from enclosing stages
+            for parent in self._stack:
+                parent["tracemalloc_peak"] = max(parent["tracemalloc_peak"], peak)
+            tracemalloc.reset_peak()
+        entry = {"tracemalloc_peak": 0}
+        # records are kept in start order, so that nested stages follow their parent
+        record = {
+            "stage": name,
+            "depth": len(self._stack),
+            "status": "running",
+            "start": datetime.now(UTC).isoformat(),
+            "bytes_downloaded": 0,
+            "bytes_uploaded": 0,
+        }
+        self.records.append(record)
+        self._stack.append(entry)
+        token = _active_records.set((*_active_records.get(), record))
+
+        sampler = _RSSSampler(self.sample_interval)
+        sampler.start()
+        io_start = _io_counters()
+        wall_start, cpu_start, process_cpu_start = time.perf_counter(), time.thread_time(), time.process_time()
+        status = "failed"
+        try:
+            yield
+            status = "success"
+        finally:
+            wall_time = time.perf_counter() - wall_start
+            cpu_time, process_cpu_time = time.thread_time() - cpu_start, time.process_time() - process_cpu_start
+            peak_rss = sampler.stop()
+            io_end = _io_counters()
+            _active_records.reset(token)
+            self._stack.pop()
+            tracemalloc_peak = None
+            if self.trace_memory:
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc_peak = max(entry["tracemalloc_peak"], peak)
+                for parent in self._stack:
+                    parent["tracemalloc_peak"] = max(parent["tracemalloc_peak"], tracemalloc_peak)
+
+            record.update(
+                {
+                    "status": status,
+                    "wall_time": wall_time,
+                    "cpu_time": cpu_time,
+                    "process_cpu_time": process_cpu_time,
+                    "peak_rss": peak_rss,
+                    "tracemalloc_peak": tracemalloc_peak,
+                    "bytes_read": None if io_start is None else io_end["read"] - io_start["read"],
+                    "bytes_written": None if io_start is None else io_end["written"] - io_start["written"],
+                }
+            )
+            logger.info(f"Stage {name} took {wall_time:.1f}s, peak RSS {peak_rss / 1024**3:.2f} GB.")
+            self.write()
+
+    def write(self) -> None:
+        """Write the records to :attr:`report_path`."""
+        if self.report_path is None:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.report_path)), exist_ok=True)
+        # background transfers may still update the records
+        with _transfer_lock:
+            records = [dict(record) for record in self.records]
+        with open(self.report_path, "w") as f:
+            json.dump({"stages": records}, f, indent=2)
+
+    def format_table(self) -> str:
+        """Format the records as a plain-text summary table."""
+
+        def _bytes(value):
+            return "n/a" if value is None else f"{value / 1024**2:.1f}"
+
+        header = ("stage", "status", "wall [s]", "cpu [s]", "process cpu [s]", "peak RSS [MB]", "read [MB]",
+                  "written [MB]", "down [MB]", "up [MB]")
+        rows = [header] + [
+            (
+                "  " * record["depth"] + record["stage"],
+                record["status"],
+                f"{record['wall_time']:.1f}",
+                f"{record['cpu_time']:.1f}",
+                f"{record['process_cpu_time']:.1f}",
+                _bytes(record["peak_rss"]),
+                _bytes(record["bytes_read"]),
+                _bytes(record["bytes_written"]),
+                _bytes(record["bytes_downloaded"]),
+                _bytes(record["bytes_uploaded"]),
+            )
+            for record in self.records
+            if record["status"] != "running"
+        ]
+        widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+        return "\n".join("  ".join(cell.ljust(width) for cell, width in zip(row, widths, strict=True)) for row in rows)
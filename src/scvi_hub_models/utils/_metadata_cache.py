@@ -0,0 +1,117 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+from filelock import FileLock
+
+from ._artifact_cache import DEFAULT_CACHE_DIR
+from ._download import host_session
+
+logger = logging.getLogger(__name__)
+
+
+class MetadataCache:
+    """On-disk cache of JSON metadata of remote records, e.g. Zenodo file listings, keyed by URL.
+
+    Responses younger than ``ttl`` are served without a request. Older ones are revalidated with
+    a conditional request (``If-None-Match``/``If-Modified-Since``), so an unchanged record costs
+    a ``304 Not Modified`` instead of the full listing. Every URL has its own file lock, so that
+    concurrent runs on the same machine wait for the first one to fetch the record instead of
+    all querying the API. If the server cannot be reached, a stale response is used.
+
+    Parameters
+    ----------
+    path
+        Directory with one JSON file per URL. Defaults to ``metadata`` in
+        ``$SCVI_HUB_MODELS_CACHE_DIR`` or ``~/.cache/scvi-hub-models``.
+    ttl
+        Time in seconds for which a response is used without revalidation.
+    timeout
+        Timeout of requests in seconds.
+    """
+
+    def __init__(self, path: str | None = None, ttl: float = 3600.0, timeout: float = 30.0):
+        if path is None:
+            path = os.path.join(os.environ.get("SCVI_HUB_MODELS_CACHE_DIR", DEFAULT_CACHE_DIR), "metadata")
+        self.path = Path(path)
+        self.ttl = ttl
+        self.timeout = timeout
+
+    def _entry_path(self, url: str) -> Path:
+        return self.path / f"{hashlib.sha256(url.encode()).hexdigest()[:32]}.json"
+
+    def _load(self, url: str) -> dict | None:
+        entry_path = self._entry_path(url)
+        if not entry_path.exists():
+            return None
+        with open(entry_path) as f:
+            entry = json.load(f)
+        return entry if entry.get("url") == url else None
+
+    def _save(self, url: str, entry: dict) -> None:
+        entry_path = self._entry_path(url)
+        tmp_path = entry_path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, entry_path)
+
+    def _refresh(self, url: str, entry: dict | None) -> dict:
+        """Return a fresh entry for ``url``, revalidating or fetching ``entry`` if it expired."""
+        import requests
+
+        if entry is not None and time.time() - entry["fetched_at"] < self.ttl:
+            return entry
+        headers = {}
+        if entry is not None and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry is not None and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        try:
+            response = host_session(url).get(url, headers=headers, timeout=self.timeout)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            if entry is None:
+                raise
+            logger.warning(f"Could not revalidate {url} ({e.__class__.__name__}: {e}), using the cached response.")
+            return entry
+
+        if response.status_code == 304:
+            logger.info(f"Metadata of {url} not modified.")
+            entry["fetched_at"] = time.time()
+        else:
+            body = response.json()
+            digest = hashlib.sha256(json.dumps(body, sort_keys=True).encode()).hexdigest()
+            if entry is None or entry["digest"] != digest:
+                logger.info(f"Fetched metadata of {url}.")
+                entry = {"url": url, "digest": digest, "body": body, "parsed": {}}
+            entry.update(
+                fetched_at=time.time(),
+                etag=response.headers.get("ETag", None),
+                last_modified=response.headers.get("Last-Modified", None),
+            )
+        self._save(url, entry)
+        return entry
+
+    def get(self, url: str) -> object:
+        """Decoded JSON response of ``url``."""
+        self.path.mkdir(parents=True, exist_ok=True)
+        with FileLock(str(self._entry_path(url).with_suffix(".lock"))):
+            return self._refresh(url, self._load(url))["body"]
+
+    def get_parsed(self, url: str, parse: Callable[[object], object], key: str) -> object:
+        """Result of ``parse`` applied to the JSON response of ``url``, cached under ``key``.
+
+        ``key`` must identify ``parse`` and its parameters, e.g. a :func:`hash_inputs` digest.
+        Parsed results are JSON-serializable and discarded whenever the response changes.
+        """
+        self.path.mkdir(parents=True, exist_ok=True)
+        with FileLock(str(self._entry_path(url).with_suffix(".lock"))):
+            entry = self._refresh(url, self._load(url))
+            if key not in entry["parsed"]:
+                entry["parsed"][key] = parse(entry["body"])
+                self._save(url, entry)
+            return entry["parsed"][key]
@@ -0,0 +1,93 @@
+import logging
+
+import anndata
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def cast_latent(array: np.ndarray, dtype: str = "float32", chunk_size: int = 100_000) -> tuple[np.ndarray, float]:
+    """Cast a latent representation to ``dtype`` for storage, measuring the loss of precision.
+
+    Parameters
+    ----------
+    array
+        Latent representation, e.g. posterior means or variances, possibly memory-mapped.
+    dtype
+        Floating point type to store, e.g. ``"float16"`` to halve the size of ``"float32"`` latents.
+    chunk_size
+        Number of rows converted at a time, so that no full-size temporary arrays are created.
+
+    Returns
+    -------
+    The cast array and the maximum relative error of its values. Values below the smallest normal
+    number of ``dtype`` are compared to that number instead, values that overflow ``dtype`` have an
+    infinite error.
+    """
+    dtype = np.dtype(dtype)
+    if not np.issubdtype(dtype, np.floating):
+        raise ValueError(f"Latent representations must be stored as floating point, got {dtype}.")
+    if array.dtype == dtype:
+        return array, 0.0
+    tiny = np.finfo(dtype).tiny
+    cast = np.empty(array.shape, dtype=dtype)
+    max_error = 0.0
+    with np.errstate(over="ignore", invalid="ignore"):
+        for start in range(0, array.shape[0], chunk_size):
+            original = np.asarray(array[start : start + chunk_size], dtype=np.float64)
+            cast[start : start + chunk_size] = original
+            if not original.size:
+                continue
+            error = np.abs(cast[start : start + chunk_size] - original) / np.maximum(np.abs(original), tiny)
+            max_error = max(max_error, float(np.nan_to_num(error, nan=np.inf, posinf=np.inf).max()))
+    return cast, max_error
+
+
+def write_compact_h5ad(
+    adata: anndata.AnnData,
+    path: str,
+    compression: str | None = None,
+    compression_opts: int | None = None,
+    chunk_rows: int | None = None,
+) -> None:
+    """Write ``adata`` as ``.h5ad`` with HDF5 compression and row-chunked embeddings.
+
+    Parameters
+    ----------
+    adata
+        The dataset, in memory.
+    path
+        Destination file.
+    compression
+        HDF5 compression filter of all arrays, ``"gzip"`` or ``"lzf"``.
+    compression_opts
+        Level of ``"gzip"`` compression, from 0 to 9.
+    chunk_rows
+        Number of cells per HDF5 chunk of the dense arrays in ``obsm``, e.g. latent
+        representations, so that reading a subset of cells only decompresses the chunks it spans.
+        Chunk shapes are chosen by h5py if ``None``.
+    """
+    import h5py
+    from anndata.io import write_elem
+
+    from ._overlay import dataset_overlay
+
+    dataset_kwargs = {}
+    if compression is not None:
+        dataset_kwargs["compression"] = compression
+    if compression_opts is not None:
+        dataset_kwargs["compression_opts"] = compression_opts
+
+    chunked = {}
+    if chunk_rows is not None:
+        chunked = {key: value for key, value in adata.obsm.items() if isinstance(value, np.ndarray) and value.ndim == 2}
+    if chunked:
+        adata = dataset_overlay(adata)
+        for key in chunked:
+            del adata.obsm[key]
+
+    with h5py.File(path, "w") as f:
+        write_elem(f, "/", adata, dataset_kwargs=dataset_kwargs)
+        for key, value in chunked.items():
+            chunks = (max(1, min(chunk_rows, value.shape[0])), max(1, value.shape[1]))
+            write_elem(f, f"obsm/{key}", value, dataset_kwargs={**dataset_kwargs, "chunks": chunks})
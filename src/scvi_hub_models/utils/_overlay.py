@@ -0,0 +1,52 @@
+import logging
+
+import anndata
+
+logger = logging.getLogger(__name__)
+
+
+def dataset_overlay(adata):
+    """Independent handle on a dataset that shares its counts and annotations without copying them.
+
+    Models register fields in ``obs`` and ``uns`` and minification adds latent representations to
+    ``obsm``. The overlay gets its own ``obs``, ``var``, ``obsm``, ``obsp``, ``varm``, ``layers``
+    and ``uns`` containers, so that these changes do not leak into ``adata`` or other overlays,
+    while ``X``, the layer matrices, embeddings and ``raw`` are shared by reference. Values of
+    ``uns`` are not copied, so they must only be replaced, not modified in place.
+
+    Backed datasets are opened again from their file instead.
+
+    Parameters
+    ----------
+    adata
+        An :class:`~anndata.AnnData` or :class:`~mudata.MuData`.
+    """
+    if adata.isbacked:
+        from ._backed import read_dataset
+
+        return read_dataset(str(adata.filename), backed=True)
+
+    if not isinstance(adata, anndata.AnnData):
+        import mudata
+
+        overlay = mudata.MuData({mod: dataset_overlay(mod_adata) for mod, mod_adata in adata.mod.items()})
+        global_columns = adata.obs.columns.difference(overlay.obs.columns)
+        if len(global_columns):
+            overlay.obs[global_columns] = adata.obs[global_columns]
+        for key, value in adata.obsm.items():
+            if key not in overlay.obsm:
+                overlay.obsm[key] = value
+        overlay.uns.update(adata.uns)
+        return overlay
+
+    return anndata.AnnData(
+        X=adata.X,
+        layers=dict(adata.layers),
+        obs=adata.obs.copy(deep=False),
+        var=adata.var.copy(deep=False),
+        obsm=dict(adata.obsm),
+        varm=dict(adata.varm),
+        obsp=dict(adata.obsp),
+        uns=dict(adata.uns),
+        raw=adata.raw,
+    )
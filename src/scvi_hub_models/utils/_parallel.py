@@ -0,0 +1,133 @@
+import logging
+import os
+import sys
+import time
+import traceback
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+
+logger = logging.getLogger(__name__)
+
+_THREAD_ENV_VARS = (
+    "OMP_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+)
+
+
+def limit_threads(n_threads: int) -> None:
+    """Cap the number of torch and BLAS threads used by the current process.
+
+    The environment variables only take effect for libraries that are not imported yet, e.g. when
+    called as a process pool initializer. Thread pools of libraries that are already loaded are
+    capped through torch and, if installed, :mod:`threadpoolctl`.
+    """
+    for env_var in _THREAD_ENV_VARS:
+        os.environ[env_var] = str(n_threads)
+    if "torch" in sys.modules:
+        import torch
+
+        torch.set_num_threads(n_threads)
+    if "numpy" in sys.modules:
+        try:
+            from threadpoolctl import threadpool_limits
+        except ImportError:
+            return
+        threadpool_limits(limits=n_threads)
+
+
+def summarize_call(fn: Callable, args: tuple = (), kwargs: dict | None = None) -> dict:
+    """Call ``fn`` and summarize the outcome instead of raising.
+
+    Returns a dictionary with ``status`` (``"success"`` or ``"failed"``), ``error``,
+    ``traceback``, ``elapsed`` seconds and the ``result`` of ``fn``.
+    """
+    start = time.perf_counter()
+    try:
+        result = fn(*args, **(kwargs or {}))
+    except Exception as e:  # noqa: BLE001
+        return {
+            "status": "failed",
+            "error": f"{e.__class__.__name__}: {e}",
+            "traceback": traceback.format_exc(),
+            "elapsed": time.perf_counter() - start,
+            "result": None,
+        }
+    return {
+        "status": "success",
+        "error": None,
+        "traceback": None,
+        "elapsed": time.perf_counter() - start,
+        "result": result,
+    }
+
+
+def _run_task(fn: Callable, args: tuple, kwargs: dict, n_threads: int) -> dict:
+    limit_threads(n_threads)
+    return summarize_call(fn, args, kwargs)
+
+
+def run_in_processes(
+    fn: Callable,
+    tasks: dict[str, tuple],
+    workers: int,
+    threads_per_worker: int | None = None,
+    task_kwargs: dict | None = None,
+) -> dict[str, dict]:
+    """Run ``fn(*args, **task_kwargs)`` for every task in its own worker process.
+
+    Parameters
+    ----------
+    fn
+        Module-level (picklable) function to run for each task.
+    tasks
+        Mapping from task name to the positional arguments for ``fn``.
+    workers
+        Maximum number of concurrent worker processes.
+    threads_per_worker
+        Number of torch/BLAS threads per worker. Defaults to splitting the available CPUs evenly.
+    task_kwargs
+        Keyword arguments passed to every call of ``fn``.
+
+    Returns
+    -------
+    Mapping from task name to the :func:`summarize_call` summary of the task. A failing task does
+    not stop the others.
+    """
+    if threads_per_worker is None:
+        threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+    task_kwargs = task_kwargs or {}
+
+    summary = {}
+    # spawn so that workers do not inherit torch/BLAS thread pools from the parent
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=get_context("spawn"),
+        initializer=limit_threads,
+        initargs=(threads_per_worker,),
+    ) as executor:
+        futures = {
+            executor.submit(_run_task, fn, args, task_kwargs, threads_per_worker): name
+            for name, args in tasks.items()
+        }
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                summary[name] = future.result()
+            except Exception as e:  # noqa: BLE001
+                # e.g. the worker process died
+                summary[name] = {"status": "failed", "error": repr(e), "traceback": None, "elapsed": None, "result": None}
+            logger.info(f"Task {name} finished with status {summary[name]['status']}.")
+    return {name: summary[name] for name in tasks}
+
+
+def log_summary(summary: dict[str, dict]) -> None:
+    """Log a one-line status per task and the tracebacks of failed tasks."""
+    for name, result in summary.items():
+        elapsed = "n/a" if result["elapsed"] is None else f"{result['elapsed']:.1f}s"
+        logger.info(f"{name}: {result['status']} ({elapsed})")
+        if result["status"] == "failed":
+            logger.error(f"{name} failed with {result['error']}\n{result['traceback'] or ''}")
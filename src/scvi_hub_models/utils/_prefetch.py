@@ -0,0 +1,85 @@
+import contextvars
+import logging
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+def prefetch(
+    items: Iterable,
+    fetch: Callable,
+    depth: int = 1,
+    size: Callable | None = None,
+    max_bytes: int | None = None,
+) -> Iterator[tuple[object, Future]]:
+    """Iterate over ``items`` while fetching upcoming items in background threads.
+
+    Use this for workflows that iterate over several datasets, so that downloads of the next
+    datasets overlap with processing of the current one.
+
+    Parameters
+    ----------
+    items
+        Items to iterate over, e.g. ``(name, url)`` tuples.
+    fetch
+        Callable that fetches a single item and returns its result, e.g. local file paths.
+    depth
+        Number of items to fetch ahead of the item that is currently processed. ``0`` disables
+        prefetching.
+    size
+        Callable returning the estimated on-disk size in bytes of an item. Required for
+        ``max_bytes``.
+    max_bytes
+        Disk-space budget for fetched items that have not been processed yet, including the
+        current one. Look-ahead stops while the budget is exhausted, but the next item is always
+        fetched.
+
+    Yields
+    ------
+    Tuples of an item and the :class:`~concurrent.futures.Future` of its fetch. Calling
+    ``future.result()`` waits for the fetch and re-raises its errors, so callers can handle failed
+    fetches per item.
+    """
+    if max_bytes is not None and size is None:
+        raise ValueError("`size` is required to enforce `max_bytes`.")
+
+    iterator = iter(items)
+    pending = deque()
+    reserved_bytes = 0
+    next_item = None
+    exhausted = False
+
+    with ThreadPoolExecutor(max_workers=max(depth, 1), thread_name_prefix="prefetch") as executor:
+        try:
+            while True:
+                # fill up to the current item plus `depth` items ahead
+                while not exhausted and len(pending) <= depth:
+                    if next_item is None:
+                        try:
+                            next_item = (next(iterator),)
+                        except StopIteration:
+                            exhausted = True
+                            break
+                    item = next_item[0]
+                    item_bytes = size(item) if size is not None else 0
+                    if pending and max_bytes is not None and reserved_bytes + item_bytes > max_bytes:
+                        logger.debug("Prefetch disk budget exhausted, waiting for the current item.")
+                        break
+                    # downloads of the fetch count towards the profiled stages that started it
+                    future = executor.submit(contextvars.copy_context().run, fetch, item)
+                    pending.append((item, future, item_bytes))
+                    reserved_bytes += item_bytes
+                    next_item = None
+                    if len(pending) > 1:
+                        logger.info(f"Prefetching {item}.")
+
+                if not pending:
+                    return
+                item, future, item_bytes = pending.popleft()
+                yield item, future
+                reserved_bytes -= item_bytes
+        finally:
+            for _, future, _ in pending:
+                future.cancel()
@@ -0,0 +1,146 @@
+import hashlib
+
+import anndata
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+def _hash_array(array) -> str:
+    hasher = hashlib.sha256()
+    if sparse.issparse(array):
+        array = array.tocsr() if array.format not in ("csr", "csc") else array
+        hasher.update(array.format.encode())
+        for buffer in (array.data, array.indices, array.indptr):
+            hasher.update(np.ascontiguousarray(buffer))
+    else:
+        hasher.update(np.ascontiguousarray(np.asarray(array)))
+    hasher.update(str(array.shape).encode())
+    return hasher.hexdigest()
+
+
+def hash_anndata(adata: anndata.AnnData, layers: tuple = (None,), obs_keys: tuple = ()) -> str:
+    """Content hash of the parts of an AnnData that preprocessing depends on.
+
+    Parameters
+    ----------
+    adata
+        The dataset.
+    layers
+        Layers to hash, ``None`` stands for ``X``. A layer that is the same object as an
+        already hashed one is only read once.
+    obs_keys
+        Columns of ``obs`` to hash, e.g. the batch key.
+    """
+    hasher = hashlib.sha256()
+    hasher.update("\0".join(adata.obs_names).encode())
+    hasher.update("\0".join(adata.var_names).encode())
+    digests = {}
+    for layer in layers:
+        matrix = adata.X if layer is None else adata.layers[layer]
+        if id(matrix) not in digests:
+            digests[id(matrix)] = _hash_array(matrix)
+        hasher.update(f"{layer}:{digests[id(matrix)]}".encode())
+    for key in obs_keys:
+        hasher.update(key.encode())
+        hasher.update("\0".join(adata.obs[key].astype(str)).encode())
+    return hasher.hexdigest()
+
+
+def gene_counts(matrix) -> np.ndarray:
+    """Total counts per gene (column) of a dense or sparse matrix, without densifying it."""
+    return np.asarray(matrix.sum(axis=0)).ravel()
+
+
+def alias_layer(adata: anndata.AnnData, layer: str = "counts") -> anndata.AnnData:
+    """Store ``X`` as ``layer`` by reference instead of copying it.
+
+    Only valid as long as ``X`` is not modified in place afterwards, e.g. by normalization.
+    """
+    adata.layers[layer] = adata.X
+    return adata
+
+
+def subset_var(adata: anndata.AnnData, index, layers: list[str] | None = None) -> anndata.AnnData:
+    """New AnnData with the columns ``index`` (boolean mask or positions) of ``adata``.
+
+    Only the selected columns of ``X`` and ``layers`` (default: all layers) are copied, sparse
+    matrices stay sparse and layers aliasing ``X`` keep aliasing it. The subset gets its own
+    ``obs``, ``obsm``, ``obsp`` and ``uns`` containers, whose columns and values are shared with
+    ``adata`` instead of copied, so that several subsets of one dataset, e.g. of its RNA and
+    protein features, can be annotated independently.
+    """
+    index = np.asarray(index)
+    if index.dtype == bool:
+        index = np.flatnonzero(index)
+    X = None if adata.X is None else adata.X[:, index]
+    subset_layers = {}
+    for layer in adata.layers.keys() if layers is None else layers:
+        matrix = adata.layers[layer]
+        subset_layers[layer] = X if matrix is adata.X else matrix[:, index]
+    return anndata.AnnData(
+        X=X,
+        layers=subset_layers,
+        obs=adata.obs.copy(deep=False),
+        var=adata.var.iloc[index],
+        obsm=dict(adata.obsm),
+        obsp=dict(adata.obsp),
+        uns=dict(adata.uns),
+    )
+
+
+def compute_gene_selection(
+    adata: anndata.AnnData,
+    layer: str | None = None,
+    min_counts: int | None = None,
+    var_mask: np.ndarray | None = None,
+    **hvg_kwargs,
+) -> pd.DataFrame:
+    """Filter genes and subset ``adata`` to highly variable genes in place.
+
+    Genes outside of ``var_mask`` and with fewer than ``min_counts`` counts in ``X`` are removed
+    first, then :func:`scanpy.pp.highly_variable_genes` runs on ``layer`` with ``hvg_kwargs``.
+    Only the columns of ``layer`` that pass the filter are copied for the selection, and
+    ``adata`` is subset once, to the selected genes.
+
+    Returns
+    -------
+    The ``var`` columns added by the selection (``n_counts`` if filtered by ``min_counts`` and
+    the columns of :func:`scanpy.pp.highly_variable_genes`), for the selected genes.
+    """
+    import scanpy as sc
+
+    keep = np.ones(adata.n_vars, dtype=bool) if var_mask is None else np.asarray(var_mask, dtype=bool)
+    n_counts = None
+    if min_counts is not None:
+        n_counts = gene_counts(adata.X)
+        keep &= n_counts >= min_counts
+
+    matrix = adata.X if layer is None else adata.layers[layer]
+    batch_key = hvg_kwargs.get("batch_key", None)
+    filtered = anndata.AnnData(
+        X=matrix if keep.all() else matrix[:, np.flatnonzero(keep)],
+        obs=pd.DataFrame(index=adata.obs_names) if batch_key is None else adata.obs[[batch_key]],
+        var=pd.DataFrame(index=adata.var_names[keep]),
+    )
+    sc.pp.highly_variable_genes(filtered, **hvg_kwargs)
+    selected = filtered.var["highly_variable"].to_numpy()
+    selection = filtered.var[selected].copy()
+    del filtered
+    if n_counts is not None:
+        selection.insert(0, "n_counts", n_counts[keep][selected])
+    apply_gene_selection(adata, selection)
+    return selection
+
+
+def apply_gene_selection(adata: anndata.AnnData, selection: pd.DataFrame) -> None:
+    """Subset ``adata`` in place to the genes of a :func:`compute_gene_selection` result."""
+    indexer = adata.var_names.get_indexer(selection.index)
+    if (indexer < 0).any():
+        raise ValueError("The gene selection contains genes that are not in the dataset.")
+    aliases = [layer for layer, matrix in adata.layers.items() if matrix is adata.X]
+    adata._inplace_subset_var(indexer)
+    for layer in aliases:
+        adata.layers[layer] = adata.X
+    for column in selection.columns:
+        adata.var[column] = selection[column].to_numpy()
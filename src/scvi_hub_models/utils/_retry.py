@@ -0,0 +1,11 @@
+def is_transient_error(error: BaseException) -> bool:
+    """Whether a transfer that failed with ``error`` is worth retrying.
+
+    HTTP errors are retried for server errors and rate limiting (429), other connection-level
+    errors (:class:`OSError`, which includes :mod:`requests` exceptions) always.
+    """
+    response = getattr(error, "response", None)
+    status_code = getattr(response, "status_code", None)
+    if status_code is not None:
+        return status_code >= 500 or status_code == 429
+    return isinstance(error, OSError)
@@ -0,0 +1,136 @@
+import logging
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import get_context
+
+from ._parallel import _run_task
+
+logger = logging.getLogger(__name__)
+
+
+def total_memory_gb() -> float | None:
+    """Physical memory of the machine in GB, if it can be determined."""
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / 1024**3
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def preload_modules(modules: tuple[str, ...]) -> None:
+    """Import ``modules`` so that long-lived workers pay for them once."""
+    from importlib import import_module
+
+    for module in modules:
+        import_module(module)
+
+
+def run_scheduled(
+    jobs: list[dict],
+    workers: int,
+    max_memory_gb: float | None = None,
+    max_threads: int | None = None,
+    preload: tuple[str, ...] = (),
+) -> dict[str, dict]:
+    """Run jobs in long-lived worker processes, admitting them by their resource hints.
+
+    A job starts once a worker is free and its ``memory_gb`` and ``threads`` hints fit into what
+    is left of ``max_memory_gb`` and ``max_threads``. Jobs that do not fit are skipped in favor of
+    later jobs that do, and a job that exceeds the limits on its own runs once nothing else is
+    running.
+
+    Parameters
+    ----------
+    jobs
+        Dictionaries with a unique ``name``, a picklable ``fn``, optional ``args`` and ``kwargs``
+        and the optional hints ``memory_gb`` (default ``0``) and ``threads`` (default: an even
+        share of ``max_threads``). ``fn`` runs with torch/BLAS threads capped to ``threads``.
+    workers
+        Maximum number of concurrent jobs.
+    max_memory_gb
+        Memory budget shared by running jobs. Defaults to the physical memory of the machine.
+    max_threads
+        Thread budget shared by running jobs. Defaults to the number of CPUs.
+    preload
+        Modules imported once by every worker when it starts, e.g. ``("scvi", "scanpy")``.
+
+    Returns
+    -------
+    Mapping from job name to the :func:`summarize_call` summary of the job, extended by its
+    ``memory_gb`` and ``threads`` hints.
+    """
+    if max_memory_gb is None:
+        max_memory_gb = total_memory_gb() or float("inf")
+    if max_threads is None:
+        max_threads = os.cpu_count() or 1
+    default_threads = max(1, max_threads // workers)
+
+    pending = [{"memory_gb": 0, "threads": default_threads, "args": (), "kwargs": {}, **job} for job in jobs]
+    running = {}
+    summary = {}
+    free_memory, free_threads = max_memory_gb, max_threads
+
+    def fits(job: dict) -> bool:
+        if not running:
+            return True
+        return job["memory_gb"] <= free_memory and job["threads"] <= free_threads
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=get_context("spawn"),
+        initializer=preload_modules,
+        initargs=(preload,),
+    ) as executor:
+        while pending or running:
+            for job in list(pending):
+                if len(running) >= workers:
+                    break
+                if not fits(job):
+                    continue
+                pending.remove(job)
+                free_memory -= job["memory_gb"]
+                free_threads -= job["threads"]
+                logger.info(f"Starting {job['name']} ({job['memory_gb']} GB, {job['threads']} threads).")
+                future = executor.submit(_run_task, job["fn"], job["args"], job["kwargs"], job["threads"])
+                running[future] = job
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                job = running.pop(future)
+                free_memory += job["memory_gb"]
+                free_threads += job["threads"]
+                try:
+                    result = future.result()
+                except Exception as e:  # noqa: BLE001
+                    # e.g. the worker process died
+                    result = {
+                        "status": "failed",
+                        "error": repr(e),
+                        "traceback": None,
+                        "elapsed": None,
+                        "result": None,
+                    }
+                summary[job["name"]] = {**result, "memory_gb": job["memory_gb"], "threads": job["threads"]}
+                logger.info(f"Job {job['name']} finished with status {result['status']}.")
+
+    return {job["name"]: summary[job["name"]] for job in jobs}
+
+
+def format_summary(summary: dict[str, dict]) -> str:
+    """Format a job summary as a plain-text status table."""
+    header = ("job", "status", "elapsed [s]", "memory [GB]", "threads", "error")
+    rows = [header] + [
+        (
+            name,
+            result["status"],
+            "n/a" if result["elapsed"] is None else f"{result['elapsed']:.1f}",
+            str(result.get("memory_gb", "n/a")),
+            str(result.get("threads", "n/a")),
+            result["error"] or "",
+        )
+        for name, result in summary.items()
+    ]
+    widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+    return "\n".join(
+        "  ".join(cell.ljust(width) for cell, width in zip(row, widths, strict=True)).rstrip() for row in rows
+    )
+
@@ -0,0 +1,83 @@
+import hashlib
+import json
+import logging
+import os
+from datetime import UTC, datetime
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+def hash_inputs(inputs: dict) -> str:
+    """Hash JSON-serializable stage inputs independently of key order."""
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def file_fingerprint(path: str) -> dict | None:
+    """Cheap fingerprint of a file or directory tree: relative paths, sizes and modification times.
+
+    Used as a stage input instead of a content hash so that checking multi-GB inputs stays fast.
+    Returns ``None`` if ``path`` does not exist.
+    """
+    path = Path(path)
+    if not path.exists():
+        return None
+    files = [path] if path.is_file() else sorted(p for p in path.rglob("*") if p.is_file())
+    return {
+        str(file.relative_to(path) if path.is_dir() else file.name): [file.stat().st_size, file.stat().st_mtime_ns]
+        for file in files
+    }
+
+
+class Stage:
+    """A checkpointed workflow stage.
+
+    Parameters
+    ----------
+    name
+        Name of the stage, unique within the workflow, e.g. ``"minify"`` or ``"Lung.SCVI.upload"``.
+    manifest_path
+        Path of the stage's completion manifest.
+    inputs
+        JSON-serializable inputs of the stage. The stage is only considered complete if they
+        match the inputs recorded in the manifest.
+    resume
+        Whether a completed stage may be skipped.
+    """
+
+    def __init__(self, name: str, manifest_path: str, inputs: dict | None = None, resume: bool = False):
+        self.name = name
+        self.manifest_path = manifest_path
+        self.inputs_hash = hash_inputs(inputs or {})
+        self.outputs = {}
+        self.done = resume and self._load()
+
+    def _load(self) -> bool:
+        if not os.path.exists(self.manifest_path):
+            return False
+        with open(self.manifest_path) as f:
+            manifest = json.load(f)
+        if manifest["inputs_hash"] != self.inputs_hash:
+            logger.info(f"Inputs of stage {self.name} changed, rerunning it.")
+            return False
+        paths = [value for value in manifest["outputs"].values() if isinstance(value, str) and os.path.isabs(value)]
+        if not all(os.path.exists(path) for path in paths):
+            logger.info(f"Outputs of stage {self.name} are missing, rerunning it.")
+            return False
+        logger.info(f"Skipping stage {self.name}, completed at {manifest['timestamp']}.")
+        self.outputs = manifest["outputs"]
+        return True
+
+    def complete(self) -> None:
+        """Write the completion manifest of the stage."""
+        os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+        manifest = {
+            "name": self.name,
+            "inputs_hash": self.inputs_hash,
+            "outputs": self.outputs,
+            "timestamp": datetime.now(UTC).isoformat(),
+        }
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2, default=str)
+        os.replace(tmp_path, self.manifest_path)
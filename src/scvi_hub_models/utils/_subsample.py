@@ -0,0 +1,61 @@
+import numpy as np
+
+
+def stratified_subsample(
+    n_obs: int,
+    max_cells: int,
+    labels: np.ndarray | None = None,
+    seed: int = 0,
+) -> np.ndarray:
+    """Draw a reproducible subsample of at most ``max_cells`` cells.
+
+    Cells are sampled proportionally within each label, with at least one cell per label, so
+    rare cell types stay represented. If there are more labels than ``max_cells``, one cell is
+    drawn from each of the ``max_cells`` most frequent labels. Without labels, cells are sampled
+    uniformly.
+
+    Parameters
+    ----------
+    n_obs
+        Number of cells to sample from.
+    max_cells
+        Target number of cells. All cells are returned if ``n_obs <= max_cells``.
+    labels
+        Label of every cell, e.g. ``adata.obs[cell_type_key]``.
+    seed
+        Seed of the random number generator.
+
+    Returns
+    -------
+    Sorted integer indices of the sampled cells.
+    """
+    if n_obs <= max_cells:
+        return np.arange(n_obs)
+    rng = np.random.default_rng(seed)
+    if labels is None:
+        return np.sort(rng.choice(n_obs, size=max_cells, replace=False))
+
+    _, codes, counts = np.unique(np.asarray(labels).astype(str), return_inverse=True, return_counts=True)
+    expected = counts * max_cells / n_obs
+    if len(counts) >= max_cells:
+        allocation = np.zeros_like(counts)
+        allocation[np.argsort(-counts, kind="stable")[:max_cells]] = 1
+    else:
+        allocation = np.minimum(counts, np.maximum(1, np.floor(expected).astype(int)))
+        # cells guaranteed to rare labels are taken from the labels with the largest allocations
+        for _ in range(allocation.sum() - max_cells):
+            allocation[np.argmax(allocation)] -= 1
+    # hand out the cells lost to rounding to the labels with the largest remainders
+    remaining = max_cells - allocation.sum()
+    for group in np.argsort(-(expected - np.floor(expected)), kind="stable"):
+        if remaining <= 0:
+            break
+        if allocation[group] < counts[group]:
+            allocation[group] += 1
+            remaining -= 1
+
+    indices = [
+        rng.choice(np.flatnonzero(codes == group), size=n_cells, replace=False)
+        for group, n_cells in enumerate(allocation)
+    ]
+    return np.sort(np.concatenate(indices))
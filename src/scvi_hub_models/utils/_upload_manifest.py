@@ -0,0 +1,124 @@
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+
+from ._artifact_cache import DEFAULT_CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+_CHUNK_SIZE = 8 * 1024**2
+
+
+def _file_digests(source: str | bytes) -> dict:
+    """Size, SHA-256 and git blob SHA-1 of a file path or of in-memory ``bytes``.
+
+    The git blob hash is what the Hugging Face Hub reports for files that are not stored with LFS.
+    """
+    size = len(source) if isinstance(source, bytes) else os.path.getsize(source)
+    sha256 = hashlib.sha256()
+    git_sha1 = hashlib.sha1(f"blob {size}\0".encode())
+    if isinstance(source, bytes):
+        sha256.update(source)
+        git_sha1.update(source)
+    else:
+        with open(source, "rb") as f:
+            while chunk := f.read(_CHUNK_SIZE):
+                sha256.update(chunk)
+                git_sha1.update(chunk)
+    return {"size": size, "sha256": sha256.hexdigest(), "git_sha1": git_sha1.hexdigest()}
+
+
+def content_manifest(files: dict[str, str | bytes]) -> dict[str, dict]:
+    """Content manifest of the files of an upload.
+
+    Parameters
+    ----------
+    files
+        Mapping from path in the repository to a local file path or the file content.
+
+    Returns
+    -------
+    Mapping from path in the repository to ``size``, ``sha256`` and ``git_sha1`` of the content.
+    """
+    return {path_in_repo: _file_digests(source) for path_in_repo, source in files.items()}
+
+
+def _same_content(entry: dict, previous: dict) -> bool:
+    for key in ("sha256", "git_sha1"):
+        if entry.get(key) is not None and previous.get(key) is not None:
+            return entry[key] == previous[key]
+    return False
+
+
+def changed_files(manifest: dict[str, dict], previous: dict[str, dict] | None) -> list[str]:
+    """Paths of ``manifest`` whose content differs from ``previous`` or that are missing in it."""
+    previous = previous or {}
+    return [path for path, entry in manifest.items() if path not in previous or not _same_content(entry, previous[path])]
+
+
+def remote_manifest(repo_name: str, paths: list[str], token: str | None = None) -> dict[str, dict] | None:
+    """Content manifest of ``paths`` as published in a Hugging Face model repository.
+
+    LFS files are described by their SHA-256, other files by their git blob SHA-1. Returns
+    ``None`` if the repository does not exist or cannot be reached.
+    """
+    from huggingface_hub import HfApi
+    from huggingface_hub.utils import HfHubHTTPError
+
+    try:
+        infos = HfApi().get_paths_info(repo_name, paths, token=token)
+    except (HfHubHTTPError, OSError) as e:
+        logger.info(f"Could not read the files of {repo_name}: {e}")
+        return None
+    manifest = {}
+    for info in infos:
+        lfs = getattr(info, "lfs", None)
+        manifest[info.path] = {
+            "size": getattr(info, "size", None),
+            "sha256": None if lfs is None else lfs.sha256,
+            # the blob of an LFS file is its pointer, not its content
+            "git_sha1": getattr(info, "blob_id", None) if lfs is None else None,
+        }
+    return manifest
+
+
+class UploadManifestStore:
+    """Local record of the content last pushed to each Hugging Face repository.
+
+    Parameters
+    ----------
+    path
+        Directory with one JSON manifest per repository. Defaults to ``uploads`` in
+        ``$SCVI_HUB_MODELS_CACHE_DIR`` or ``~/.cache/scvi-hub-models``.
+    """
+
+    def __init__(self, path: str | None = None):
+        if path is None:
+            path = os.path.join(os.environ.get("SCVI_HUB_MODELS_CACHE_DIR", DEFAULT_CACHE_DIR), "uploads")
+        self.path = Path(path)
+
+    def _manifest_path(self, repo_name: str) -> Path:
+        return self.path / f"{repo_name.replace('/', '--')}.json"
+
+    def load(self, repo_name: str) -> dict[str, dict] | None:
+        """Manifest of the last successful push to ``repo_name``, ``None`` if there is none."""
+        manifest_path = self._manifest_path(repo_name)
+        if not manifest_path.exists():
+            return None
+        with open(manifest_path) as f:
+            return json.load(f)
+
+    def save(self, repo_name: str, manifest: dict[str, dict]) -> None:
+        """Record ``manifest`` as the content of ``repo_name``."""
+        self.path.mkdir(parents=True, exist_ok=True)
+        manifest_path = self._manifest_path(repo_name)
+        tmp_path = manifest_path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, manifest_path)
+
+    def discard(self, repo_name: str) -> None:
+        """Forget the content of ``repo_name``, e.g. after a push that may have partially succeeded."""
+        self._manifest_path(repo_name).unlink(missing_ok=True)
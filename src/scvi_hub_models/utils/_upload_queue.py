@@ -0,0 +1,127 @@
+import contextvars
+import logging
+import random
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from ._instrumentation import record_transfer
+from ._retry import is_transient_error
+
+logger = logging.getLogger(__name__)
+
+
+class UploadQueue:
+    """Upload in background threads while the caller continues computing.
+
+    Failed uploads are retried with exponential backoff and jitter if the error is transient, see
+    :func:`is_transient_error`. Throughput of every upload is logged and kept in :attr:`summary`.
+    Leaving the queue as a context manager waits for all submitted uploads.
+
+    Parameters
+    ----------
+    max_workers
+        Maximum number of concurrent uploads.
+    retries
+        Number of retries of a failed upload.
+    backoff
+        Delay in seconds before the first retry, doubled for every further retry.
+    max_backoff
+        Upper bound of the delay between retries.
+    """
+
+    def __init__(self, max_workers: int = 2, retries: int = 3, backoff: float = 1.0, max_backoff: float = 60.0):
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.summary = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="upload")
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        name: str,
+        upload: Callable[[], object],
+        size: int | None = None,
+        on_success: Callable[[], object] | None = None,
+    ) -> Future:
+        """Schedule ``upload`` under the unique ``name``.
+
+        ``size`` in bytes is used for the throughput and the upload counter of the profiler. If
+        ``upload`` returns an ``int``, it is taken as the number of bytes actually sent instead,
+        e.g. when unchanged files were skipped. ``on_success`` is called in the upload thread once
+        ``upload`` returned.
+        """
+        logger.info(f"Queued upload {name}.")
+        # the upload counts towards the profiled stages that submitted it
+        future = self._executor.submit(contextvars.copy_context().run, self._upload, name, upload, size, on_success)
+        with self._lock:
+            self._futures[name] = future
+        return future
+
+    def _upload(self, name: str, upload: Callable, size: int | None, on_success: Callable | None):
+        start = time.perf_counter()
+        for attempt in range(1, self.retries + 2):
+            try:
+                result = upload()
+                break
+            except Exception as e:
+                if attempt > self.retries or not is_transient_error(e):
+                    raise
+                delay = min(self.backoff * 2 ** (attempt - 1), self.max_backoff) * random.uniform(0.5, 1.0)
+                logger.warning(f"Upload {name} failed ({e.__class__.__name__}: {e}), retrying in {delay:.1f}s.")
+                time.sleep(delay)
+        elapsed = time.perf_counter() - start
+        if isinstance(result, int):
+            size = result
+        if size is not None:
+            record_transfer("upload", size)
+        if on_success is not None:
+            on_success()
+
+        throughput = None if size is None or elapsed == 0 else size / elapsed
+        with self._lock:
+            self.summary[name] = {"size": size, "elapsed": elapsed, "attempts": attempt, "throughput": throughput}
+        rate = "" if throughput is None else f", {throughput / 1024**2:.1f} MB/s"
+        logger.info(f"Uploaded {name} in {elapsed:.1f}s after {attempt} attempt(s){rate}.")
+        return result
+
+    @property
+    def pending(self) -> int:
+        """Number of uploads that did not finish yet."""
+        with self._lock:
+            return sum(not future.done() for future in self._futures.values())
+
+    def wait(self) -> dict[str, dict]:
+        """Wait for all submitted uploads and return :attr:`summary`.
+
+        Raises a :class:`RuntimeError` naming the failed uploads after all uploads finished.
+        """
+        with self._lock:
+            futures, self._futures = self._futures, {}
+        failed = {}
+        for name, future in futures.items():
+            try:
+                future.result()
+            except Exception as e:  # noqa: BLE001
+                logger.error(f"Upload {name} failed: {e.__class__.__name__}: {e}")
+                failed[name] = e
+        if failed:
+            raise RuntimeError(f"Uploads failed: {', '.join(failed)}.") from next(iter(failed.values()))
+        return self.summary
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):
+        if exc_type is None:
+            self.wait()
+            return
+        # do not mask the original error with upload failures
+        try:
+            self.wait()
+        except RuntimeError:
+            pass
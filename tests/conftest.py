@@ -0,0 +1,77 @@
+import os
+import re
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+class _RangeHandler(SimpleHTTPRequestHandler):
+    """Static file handler with single byte-range requests and injectable connection failures.
+
+    While ``server.failures`` is positive, every response is cut off after ``server.fail_after``
+    bytes and the counter is decremented.
+    """
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        path = self.translate_path(self.path)
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return
+        size = os.path.getsize(path)
+        etag = f'"{os.stat(path).st_mtime_ns}-{size}"'
+        start, stop = 0, size
+        match = re.fullmatch(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        if match and self.headers.get("If-Range", etag) == etag:
+            start = int(match.group(1))
+            stop = min(int(match.group(2)) + 1, size) if match.group(2) else size
+            if start >= size:
+                self.send_error(416)
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{stop - 1}/{size}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(stop - start))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", etag)
+        self.end_headers()
+
+        limit = stop - start
+        with self.server.lock:
+            if self.server.failures > 0 and limit > self.server.fail_after:
+                self.server.failures -= 1
+                limit = self.server.fail_after
+                # the client sees the connection drop before the announced length
+                self.close_connection = True
+        with open(path, "rb") as f:
+            f.seek(start)
+            while limit > 0 and (chunk := f.read(min(2**20, limit))):
+                self.wfile.write(chunk)
+                limit -= len(chunk)
+
+
+@pytest.fixture
+def range_server(tmp_path):
+    """HTTP server on a free local port serving the files in its ``directory``.
+
+    The server supports byte ranges, its ``url`` is the base URL and connection failures are
+    injected by setting ``failures`` and ``fail_after`` while holding its ``lock``.
+    """
+    directory = tmp_path / "served"
+    directory.mkdir()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(_RangeHandler, directory=str(directory)))
+    server.directory = directory
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    server.lock = threading.Lock()
+    server.failures = 0
+    server.fail_after = None
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,71 @@
+import hashlib
+import os
+
+import anndata
+import numpy as np
+import pytest
+
+from scvi_hub_models.models import BaseModelWorkflow
+from scvi_hub_models.utils import ArtifactCache
+
+
+def _leases(cache: ArtifactCache) -> list[str]:
+    return sorted(path.name for path in (cache.cache_dir / "leases").rglob("*") if path.is_file())
+
+
+def _fetch_bytes(name: str, size: int):
+    def fetch(path: str) -> str:
+        file_path = os.path.join(path, name)
+        with open(file_path, "wb") as f:
+            f.write(name.encode().ljust(size, b"\0"))
+        return file_path
+
+    return fetch
+
+
+def test_release_allows_eviction(tmp_path):
+    cache = ArtifactCache(str(tmp_path / "cache"), max_size=150)
+    first = cache.fetch("first", _fetch_bytes("first.bin", 100))
+    # the first artifact is leased, so the cache exceeds its cap instead of evicting it
+    cache.fetch("second", _fetch_bytes("second.bin", 100))
+    assert os.path.exists(first)
+
+    cache.release(first)
+    cache.fetch("third", _fetch_bytes("third.bin", 10))
+    assert not os.path.exists(first)
+    assert cache.get("first") is None
+
+
+def test_leases_record_host(tmp_path, monkeypatch):
+    cache = ArtifactCache(str(tmp_path / "cache"), max_size=0)
+    path = cache.fetch("artifact", _fetch_bytes("artifact.bin", 10))
+    digest = os.path.relpath(path, cache.cache_dir / "objects").split(os.sep)[0]
+    (lease,) = _leases(cache)
+    pid, _, host = lease.split("-", 2)
+    assert int(pid) == os.getpid()
+
+    # a lease of an exited process on another host cannot be checked and is kept
+    lease_dir = cache.cache_dir / "leases" / digest
+    os.rename(lease_dir / lease, lease_dir / f"{2**22 + 1}-{'0' * 32}-{host}.elsewhere")
+    assert cache._is_leased(digest)
+    # on the same host, it is cleared
+    monkeypatch.setattr("socket.gethostname", lambda: f"{host}.elsewhere")
+    assert not cache._is_leased(digest)
+    assert _leases(cache) == []
+
+
+@pytest.mark.parametrize("load_mode", ["memory", "backed"])
+def test_get_adata_releases_lease_after_reading(range_server, tmp_path, load_mode):
+    adata = anndata.AnnData(X=np.ones((10, 5), dtype=np.float32))
+    adata.write_h5ad(range_server.directory / "data.h5ad")
+    sha256 = hashlib.sha256((range_server.directory / "data.h5ad").read_bytes()).hexdigest()
+    workflow = BaseModelWorkflow(
+        save_dir=str(tmp_path / "workflow"),
+        config={"load_mode": load_mode, "cache_settings": {"cache_dir": str(tmp_path / "cache")}},
+    )
+
+    read = workflow._get_adata(f"{range_server.url}/data.h5ad", sha256, "data.h5ad")
+
+    assert read.n_obs == 10
+    # backed datasets keep reading from the cached file
+    assert len(_leases(workflow.artifact_cache)) == (load_mode == "backed")
@@ -0,0 +1,89 @@
+import hashlib
+import os
+import subprocess
+import sys
+
+import pytest
+
+from scvi_hub_models.utils import ArtifactTracker
+
+
+def _git(*args, cwd) -> str:
+    return subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True, text=True).stdout
+
+
+@pytest.fixture
+def repos(tmp_path):
+    """Git repository with DVC, a bare git remote and a local DVC remote, yielding their paths."""
+    git_remote, dvc_remote, repo = tmp_path / "remote.git", tmp_path / "dvc-storage", tmp_path / "repo"
+    _git("init", "--bare", "-b", "main", str(git_remote), cwd=tmp_path)
+    _git("init", "-b", "main", str(repo), cwd=tmp_path)
+    _git("config", "user.name", "Test", cwd=repo)
+    _git("config", "user.email", "test@example.com", cwd=repo)
+    dvc = [sys.executable, "-m", "dvc"]
+    subprocess.run([*dvc, "init"], cwd=repo, check=True, capture_output=True)
+    subprocess.run([*dvc, "remote", "add", "-d", "storage", str(dvc_remote)], cwd=repo, check=True, capture_output=True)
+    _git("add", ".", cwd=repo)
+    _git("commit", "-m", "Initialize DVC", cwd=repo)
+    _git("remote", "add", "origin", str(git_remote), cwd=repo)
+    _git("push", "-u", "origin", "main", cwd=repo)
+    return repo, git_remote, dvc_remote
+
+
+def _tracker(repo, **kwargs) -> ArtifactTracker:
+    import git
+    from dvc.repo import Repo
+
+    return ArtifactTracker(Repo(str(repo)), git.Repo(str(repo)), **kwargs)
+
+
+def _write_output(repo, name: str, content: bytes) -> str:
+    path = repo / "data" / name
+    path.parent.mkdir(exist_ok=True)
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_commit_pushes_to_git_and_dvc_remotes(repos):
+    repo, git_remote, dvc_remote = repos
+    outputs = {"model.pt": b"weights", "adata.h5ad": b"counts"}
+    with _tracker(repo) as tracker:
+        for name, content in outputs.items():
+            tracker.track(_write_output(repo, name, content))
+        assert len(tracker.queued) == 2
+
+    assert tracker.queued == []
+    assert _git("rev-parse", "main", cwd=git_remote) == _git("rev-parse", "HEAD", cwd=repo)
+    committed = _git("show", "--name-only", "--format=%s", "main", cwd=git_remote).split()
+    assert {"data/model.pt.dvc", "data/adata.h5ad.dvc", "data/.gitignore"} <= set(committed)
+    for content in outputs.values():
+        md5 = hashlib.md5(content).hexdigest()
+        assert (dvc_remote / "files" / "md5" / md5[:2] / md5[2:]).read_bytes() == content
+
+
+def test_failed_push_rolls_back(repos):
+    repo, git_remote, dvc_remote = repos
+    head = _git("rev-parse", "HEAD", cwd=repo)
+    tracker = _tracker(repo, git_remote="missing")
+
+    with pytest.raises(ValueError):
+        tracker.track(_write_output(repo, "model.pt", b"weights"))
+
+    assert _git("rev-parse", "HEAD", cwd=repo) == head
+    assert _git("rev-parse", "main", cwd=git_remote) == head
+    assert not os.path.exists(repo / "data" / "model.pt.dvc")
+    assert _git("status", "--porcelain", "--untracked-files=no", cwd=repo) == ""
+
+
+def test_discard_on_error(repos):
+    repo, git_remote, dvc_remote = repos
+    head = _git("rev-parse", "HEAD", cwd=repo)
+
+    with pytest.raises(RuntimeError):
+        with _tracker(repo) as tracker:
+            tracker.track(_write_output(repo, "model.pt", b"weights"))
+            raise RuntimeError("training failed")
+
+    assert tracker.queued == []
+    assert _git("rev-parse", "HEAD", cwd=repo) == head
+    assert not os.path.exists(dvc_remote)
@@ -0,0 +1,102 @@
+import anndata
+import h5py
+import mudata
+import numpy as np
+import pytest
+from scipy import sparse
+
+from scvi_hub_models.models import BaseModelWorkflow
+from scvi_hub_models.utils import alias_layer, read_dataset, write_backed_copy
+
+
+def _adata(seed: int = 0) -> anndata.AnnData:
+    rng = np.random.default_rng(seed)
+    counts = sparse.random(100, 20, density=0.2, format="csr", dtype=np.float32, random_state=rng)
+    counts.data = rng.integers(1, 20, counts.nnz).astype(np.float32)
+    # normalized expression in X, as in the CITE-seq datasets
+    adata = anndata.AnnData(X=counts.multiply(1 / np.maximum(counts.sum(axis=1), 1)).tocsr())
+    adata.layers["counts"] = counts
+    adata.uns["source"] = "synthetic"
+    return adata
+
+
+def _workflow(tmp_path, load_mode: str) -> BaseModelWorkflow:
+    return BaseModelWorkflow(save_dir=str(tmp_path / "workflow"), config={"load_mode": load_mode})
+
+
+def test_published_files_keep_aliased_layers(tmp_path):
+    path = str(tmp_path / "data.h5ad")
+    adata = alias_layer(_adata())
+    _workflow(tmp_path, "backed")._write_adata(adata, path)
+
+    with h5py.File(path, "r") as f:
+        assert "counts" in f["layers"]
+        assert "layer_aliases" not in f["uns"]
+    assert adata.layers["counts"] is adata.X
+
+
+def test_backed_copy_streams_counts(tmp_path):
+    path = str(tmp_path / "data.h5ad")
+    adata = _adata()
+    adata.write_h5ad(path)
+    copy_path = write_backed_copy(path, str(tmp_path / "backed" / "data.h5ad"))
+
+    backed = read_dataset(copy_path, backed=True)
+    assert backed.isbacked
+    np.testing.assert_array_equal(backed.layers["counts"][:].toarray(), adata.layers["counts"].toarray())
+    assert dict(backed.uns) == {"source": "synthetic"}
+    # the source file is left as is
+    with h5py.File(path, "r") as f:
+        assert "counts" in f["layers"]
+    assert write_backed_copy(path, copy_path) == copy_path
+
+
+def test_backed_copy_of_mudata(tmp_path):
+    path = str(tmp_path / "data.h5mu")
+    rna = _adata()
+    protein = anndata.AnnData(X=np.ones((100, 3), dtype=np.float32))
+    mudata.MuData({"rna": rna, "protein": protein}).write_h5mu(path)
+    copy_path = write_backed_copy(path, str(tmp_path / "backed" / "data.h5mu"))
+
+    backed = read_dataset(copy_path, backed=True)
+    assert list(backed.mod) == ["rna", "protein"]
+    np.testing.assert_array_equal(backed.mod["rna"].X[:].toarray(), rna.layers["counts"].toarray())
+    assert "counts" in backed.mod["rna"].layers
+    np.testing.assert_array_equal(np.asarray(backed.mod["protein"].X[:]), protein.X)
+
+
+def test_backed_copy_without_layer_reads_source(tmp_path):
+    path = str(tmp_path / "data.h5ad")
+    anndata.AnnData(X=np.ones((10, 5), dtype=np.float32)).write_h5ad(path)
+    assert write_backed_copy(path, str(tmp_path / "backed" / "data.h5ad")) == path
+
+
+@pytest.mark.parametrize("load_mode", ["memory", "backed"])
+def test_read_dataset_in_load_mode(tmp_path, load_mode):
+    path = str(tmp_path / "data.h5ad")
+    adata = _adata()
+    adata.write_h5ad(path)
+
+    read = _workflow(tmp_path, load_mode)._read_dataset(path)
+    assert read.isbacked == (load_mode == "backed")
+    counts = read.layers["counts"]
+    counts = counts[:] if read.isbacked else counts
+    np.testing.assert_array_equal(counts.toarray(), adata.layers["counts"].toarray())
+
+
+def test_minify_backed_dataset(tmp_path):
+    import scvi
+
+    path = str(tmp_path / "synthetic.h5ad")
+    scvi.data.synthetic_iid(batch_size=100, n_genes=50).write_h5ad(path)
+    workflow = BaseModelWorkflow(
+        save_dir=str(tmp_path / "workflow"), config={"load_mode": "backed", "create_criticism_report": False}
+    )
+    adata = workflow._read_dataset(path)
+    scvi.model.SCVI.setup_anndata(adata, batch_key="batch")
+    model = scvi.model.SCVI(adata)
+    model.train(max_epochs=1, batch_size=50)
+
+    workflow._minify_and_save_model(model, adata)
+    assert model.minified_data_type is not None
+    assert "scvi_latent_qzm" in model.adata.obsm
@@ -0,0 +1,13 @@
+import pytest
+
+from scvi_hub_models.benchmarks import run_benchmark
+
+
+@pytest.mark.parametrize("load_mode", ["memory", "backed"])
+def test_run_benchmark(load_mode):
+    results = run_benchmark(
+        n_cells=300, n_genes=50, n_train_cells=100, load_mode=load_mode, create_criticism_report=False
+    )
+
+    assert {"load", "model_load", "minify", "latent", "save_model", "hub_model"} <= set(results)
+    assert all(metrics["wall_time"] >= 0 for metrics in results.values())
@@ -0,0 +1,169 @@
+import json
+import os
+
+import anndata
+import mudata
+import numpy as np
+import pytest
+import scvi
+
+from scvi_hub_models.models import BaseModelWorkflow
+from scvi_hub_models.utils import create_chunked_criticism_report
+
+
+def _criticism_workflow(tmp_path, max_cells: int) -> BaseModelWorkflow:
+    return BaseModelWorkflow(
+        save_dir=str(tmp_path / "workflow"),
+        config={"load_mode": "backed", "criticism_settings": {"max_cells": max_cells, "cell_type_key": "labels"}},
+    )
+
+
+@pytest.fixture
+def backed_mudata(tmp_path):
+    path = str(tmp_path / "synthetic.h5mu")
+    mdata = scvi.data.synthetic_iid(batch_size=100, n_genes=50, n_proteins=10, return_mudata=True)
+    # differential expression groups the cells of each modality by the label key
+    mdata.mod["rna"].obs["labels"] = mdata.obs["labels"]
+    mdata.write_h5mu(path)
+    return mudata.read_h5mu(path, backed=True)
+
+
+def test_load_subset_of_backed_mudata(backed_mudata):
+    indices = np.arange(0, backed_mudata.n_obs, 3)
+    subset = BaseModelWorkflow._load_subset(backed_mudata, indices)
+
+    assert isinstance(subset, mudata.MuData)
+    assert list(subset.obs_names) == list(backed_mudata.obs_names[indices])
+    assert list(subset.obs["labels"]) == list(backed_mudata.obs["labels"].iloc[indices])
+    for mod, mod_adata in subset.mod.items():
+        assert not mod_adata.isbacked
+        expected = backed_mudata.mod[mod].X[indices]
+        np.testing.assert_array_equal(np.asarray(mod_adata.X), np.asarray(expected))
+    assert backed_mudata.mod["rna"].isbacked
+
+
+def test_criticism_report_on_backed_subsample(tmp_path):
+    path = str(tmp_path / "synthetic.h5ad")
+    scvi.data.synthetic_iid(batch_size=100, n_genes=50).write_h5ad(path)
+    adata = anndata.read_h5ad(path, backed="r")
+    scvi.model.SCVI.setup_anndata(adata, batch_key="batch", labels_key="labels")
+    model = scvi.model.SCVI(adata)
+    model.train(max_epochs=1, batch_size=50)
+    save_folder = tmp_path / "criticism"
+    save_folder.mkdir()
+
+    _criticism_workflow(tmp_path, max_cells=60)._create_criticism_report(model, str(save_folder))
+
+    assert model.adata is adata
+    assert adata.isbacked
+    assert os.path.exists(save_folder / "metrics.json")
+    with open(save_folder / "criticism_subsample.json") as f:
+        subsample = json.load(f)
+    assert subsample["n_cells_total"] == adata.n_obs
+    assert subsample["n_cells"] == 60
+    assert subsample["stratify_key"] == "labels"
+    assert set(subsample["obs_names"]) <= set(adata.obs_names)
+    # annotations of the report are copied to the full dataset
+    assert adata.obs["cv_cell_ratio"].notna().sum() == 60
+    assert adata.var["cv_gene_ratio"].notna().all()
+    assert "lfc_model" in adata.varm
+
+
+@pytest.mark.xfail(
+    raises=NotImplementedError,
+    reason="scvi-tools passes dense TOTALVI samples to scanpy as xarray objects in the differential expression",
+)
+def test_criticism_report_on_backed_mudata_subsample(backed_mudata, tmp_path):
+    scvi.model.TOTALVI.setup_mudata(
+        backed_mudata,
+        batch_key="batch",
+        modalities={"rna_layer": "rna", "protein_layer": "protein_expression"},
+    )
+    model = scvi.model.TOTALVI(backed_mudata)
+    model.train(max_epochs=1, batch_size=50)
+    save_folder = tmp_path / "criticism"
+    save_folder.mkdir()
+
+    _criticism_workflow(tmp_path, max_cells=60)._create_criticism_report(model, str(save_folder))
+
+    assert model.adata is backed_mudata
+    assert backed_mudata.mod["rna"].isbacked
+    assert os.path.exists(save_folder / "metrics.json")
+    with open(save_folder / "criticism_subsample.json") as f:
+        assert json.load(f)["n_cells"] == 60
+    assert backed_mudata.mod["rna"].obs["cv_cell_ratio"].notna().sum() == 60
+
+
+@pytest.fixture
+def trained_scvi():
+    adata = scvi.data.synthetic_iid(batch_size=100, n_genes=50)
+    scvi.model.SCVI.setup_anndata(adata, batch_key="batch", labels_key="labels")
+    model = scvi.model.SCVI(adata)
+    model.train(max_epochs=1, batch_size=50)
+    return model
+
+
+def _report(tmp_path, model, name: str, **criticism_settings) -> dict:
+    save_folder = tmp_path / name
+    save_folder.mkdir()
+    workflow = BaseModelWorkflow(
+        save_dir=str(tmp_path / "workflow"),
+        config={"criticism_settings": {"cell_type_key": "labels", "seed": 1, **criticism_settings}},
+    )
+    workflow._create_criticism_report(model, str(save_folder))
+    with open(save_folder / "metrics.json") as f:
+        return json.load(f)
+
+
+def test_chunked_criticism_report_matches_full_report(tmp_path, trained_scvi):
+    import torch
+
+    save_folder = tmp_path / "chunked"
+    save_folder.mkdir()
+    full = _report(tmp_path, trained_scvi, "full")
+    cv_gene_ratio = trained_scvi.adata.var["cv_gene_ratio"].copy()
+    lfc_model = trained_scvi.adata.varm["lfc_model"].copy()
+
+    # a single chunk draws the same posterior predictive samples as the full report
+    torch.manual_seed(1)
+    create_chunked_criticism_report(trained_scvi, str(save_folder), chunk_size=trained_scvi.adata.n_obs)
+    with open(save_folder / "metrics.json") as f:
+        assert json.load(f) == full
+    np.testing.assert_allclose(trained_scvi.adata.var["cv_gene_ratio"], cv_gene_ratio)
+    np.testing.assert_allclose(trained_scvi.adata.varm["lfc_model"], lfc_model)
+
+
+def test_criticism_report_in_chunks(tmp_path, trained_scvi):
+    import torch
+
+    rng_state = torch.get_rng_state()
+    seed = scvi.settings.seed
+    report = _report(tmp_path, trained_scvi, "chunked", chunk_size=64)
+
+    assert set(report) == {"cell_wise_cv", "gene_wise_cv", "diff_exp"}
+    assert trained_scvi.adata.obs["cv_cell_ratio"].notna().all()
+    assert trained_scvi.adata.var["cv_gene_ratio"].notna().all()
+    assert trained_scvi.adata.varm["lfc_model"].shape == (trained_scvi.adata.n_vars, 3)
+    # the report does not reseed the process
+    assert torch.equal(torch.get_rng_state(), rng_state)
+    assert scvi.settings.seed == seed
+
+
+def test_failed_subsampled_report_restores_model(tmp_path, trained_scvi, monkeypatch):
+    import scvi_hub_models.models._base_workflow as base_workflow
+
+    def create_criticism_report(model, **kwargs):
+        assert model.adata.n_obs == 60
+        model.adata.obs["cv_cell_ratio"] = 1.0
+        raise RuntimeError("report failed")
+
+    monkeypatch.setattr(base_workflow, "create_criticism_report", create_criticism_report)
+    adata = trained_scvi.adata
+    train_indices = trained_scvi.train_indices.copy()
+    with pytest.raises(RuntimeError, match="report failed"):
+        _report(tmp_path, trained_scvi, "failed", max_cells=60)
+
+    assert trained_scvi.adata is adata
+    assert trained_scvi.adata_manager.adata is adata
+    np.testing.assert_array_equal(trained_scvi.train_indices, train_indices)
+    assert "cv_cell_ratio" not in adata.obs
@@ -0,0 +1,94 @@
+import hashlib
+import os
+import random
+
+import pytest
+
+from scvi_hub_models.utils import download_file
+
+
+@pytest.fixture(params=[8 * 2**20, 1000], ids=["8MiB", "1000B"])
+def served(request, range_server):
+    """Pseudo-random payload on the local range server, yielding the server, its URL, SHA256 and size."""
+    payload = random.Random(0).randbytes(request.param)
+    (range_server.directory / "payload.bin").write_bytes(payload)
+    return range_server, f"{range_server.url}/payload.bin", hashlib.sha256(payload).hexdigest(), request.param
+
+
+@pytest.fixture
+def downloads(tmp_path):
+    directory = tmp_path / "downloads"
+    directory.mkdir()
+    return directory
+
+
+def _sha256(path) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def test_download_verifies_hash(served, downloads):
+    _, url, sha256, _ = served
+    path = downloads / "payload.bin"
+    assert download_file(url, str(path), known_hash=sha256) == str(path)
+    assert _sha256(path) == sha256
+    assert os.listdir(downloads) == ["payload.bin"]
+
+
+def test_download_accepts_pooch_hashes(served, downloads):
+    server, url, sha256, _ = served
+    path = downloads / "payload.bin"
+    md5 = hashlib.md5((server.directory / "payload.bin").read_bytes()).hexdigest()
+    download_file(url, str(path), known_hash=f"md5:{md5}")
+    assert _sha256(path) == sha256
+
+
+def test_download_reuses_matching_file(served, downloads):
+    _, url, sha256, _ = served
+    path = downloads / "payload.bin"
+    download_file(url, str(path), known_hash=sha256)
+    modified = os.stat(path).st_mtime_ns
+    download_file(url, str(path), known_hash=sha256)
+    assert os.stat(path).st_mtime_ns == modified
+
+
+def test_download_wrong_hash_leaves_no_files(served, downloads):
+    _, url, _, _ = served
+    with pytest.raises(ValueError):
+        download_file(url, str(downloads / "payload.bin"), known_hash="md5:" + "0" * 32)
+    assert os.listdir(downloads) == []
+
+
+def test_download_parallel_ranges(served, downloads):
+    _, url, sha256, size = served
+    path = downloads / "payload.bin"
+    download_file(url, str(path), known_hash=sha256, connections=4, min_split_size=size // 8)
+    assert _sha256(path) == sha256
+    assert os.listdir(downloads) == ["payload.bin"]
+
+
+@pytest.mark.parametrize("connections", [1, 2])
+def test_download_resumes_interrupted_transfers(served, downloads, connections):
+    server, url, sha256, size = served
+    with server.lock:
+        server.failures, server.fail_after = 3, size // 3
+    path = downloads / "payload.bin"
+    download_file(url, str(path), known_hash=sha256, connections=connections, min_split_size=size // 8, backoff=0.01)
+    assert server.failures < 3
+    assert _sha256(path) == sha256
+    assert os.listdir(downloads) == ["payload.bin"]
+
+
+def test_download_resumes_across_calls(served, downloads):
+    server, url, sha256, size = served
+    with server.lock:
+        server.failures, server.fail_after = 1, size // 2
+    path = downloads / "payload.bin"
+    with pytest.raises(OSError):
+        download_file(url, str(path), known_hash=sha256, retries=0)
+    assert not path.exists()
+    assert os.path.exists(f"{path}.part.json")
+
+    download_file(url, str(path), known_hash=sha256)
+    assert _sha256(path) == sha256
+    assert os.listdir(downloads) == ["payload.bin"]
@@ -0,0 +1,77 @@
+import threading
+
+from scvi_hub_models.utils import Profiler, UploadQueue, download_file, prefetch, record_transfer
+
+
+def _records(profiler: Profiler) -> dict[str, dict]:
+    return {record["stage"]: record for record in profiler.records}
+
+
+def test_background_upload_counts_towards_submitting_stage():
+    profiler = Profiler()
+    started = threading.Event()
+    release = threading.Event()
+
+    def upload() -> int:
+        started.set()
+        release.wait(10)
+        return 100
+
+    with UploadQueue() as queue:
+        with profiler.profile("minify"):
+            queue.submit("model", upload)
+            started.wait(10)
+        with profiler.profile("next"):
+            release.set()
+            queue.wait()
+
+    records = _records(profiler)
+    assert records["minify"]["bytes_uploaded"] == 100
+    assert records["next"]["bytes_uploaded"] == 0
+
+
+def test_nested_stages_include_transfers():
+    profiler = Profiler()
+    with profiler.profile("outer"):
+        with profiler.profile("inner"):
+            record_transfer("download", 10)
+        record_transfer("download", 5)
+    record_transfer("download", 1)
+
+    records = _records(profiler)
+    assert records["inner"]["bytes_downloaded"] == 10
+    assert records["outer"]["bytes_downloaded"] == 15
+    assert records["outer"]["cpu_time"] <= records["outer"]["process_cpu_time"] + 0.1
+
+
+def test_downloads_count_transferred_bytes(range_server, tmp_path):
+    payload = b"x" * 2**20
+    (range_server.directory / "payload.bin").write_bytes(payload)
+    path = tmp_path / "payload.bin"
+    profiler = Profiler()
+    with profiler.profile("download"):
+        download_file(f"{range_server.url}/payload.bin", str(path), connections=4, min_split_size=2**16)
+    with profiler.profile("reuse"):
+        download_file(f"{range_server.url}/payload.bin", str(path))
+
+    records = _records(profiler)
+    assert records["download"]["bytes_downloaded"] == len(payload)
+    assert records["reuse"]["bytes_downloaded"] == 0
+
+
+def test_prefetch_counts_towards_starting_stage():
+    profiler = Profiler()
+
+    def fetch(item: int) -> int:
+        record_transfer("download", item)
+        return item
+
+    with profiler.profile("run"):
+        for item, future in prefetch([1, 10], fetch, depth=1):
+            with profiler.profile(f"item-{item}"):
+                future.result()
+
+    records = _records(profiler)
+    assert records["run"]["bytes_downloaded"] == 11
+    assert records["item-1"]["bytes_downloaded"] == 0
+    assert records["item-10"]["bytes_downloaded"] == 0
@@ -0,0 +1,115 @@
+import tracemalloc
+
+import anndata
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import sparse
+
+from scvi_hub_models.utils import (
+    alias_layer,
+    apply_gene_selection,
+    compute_gene_selection,
+    gene_counts,
+    hash_anndata,
+    subset_var,
+)
+
+N_OBS, N_VARS = 5000, 2000
+
+
+def _synthetic_adata(n_obs: int = N_OBS, n_vars: int = N_VARS, seed: int = 0) -> anndata.AnnData:
+    """Sparse counts with 5% non-zero entries, ten times smaller than their dense equivalent."""
+    rng = np.random.default_rng(seed)
+    X = sparse.random(n_obs, n_vars, density=0.05, format="csr", dtype=np.float32, random_state=rng)
+    X.data = rng.integers(1, 20, X.nnz).astype(np.float32)
+    obs = pd.DataFrame({"batch": rng.choice(["a", "b"], n_obs)}, index=[f"cell_{i}" for i in range(n_obs)])
+    return anndata.AnnData(X=X, obs=obs, var=pd.DataFrame(index=[f"gene_{i}" for i in range(n_vars)]))
+
+
+def _nbytes(matrix) -> int:
+    return matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+
+
+def _peak_memory(function, *args, **kwargs):
+    """Result of ``function`` and the peak memory in bytes allocated while it ran."""
+    tracemalloc.start()
+    try:
+        result = function(*args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, peak
+
+
+@pytest.fixture
+def adata():
+    return alias_layer(_synthetic_adata())
+
+
+@pytest.fixture(scope="module", autouse=True)
+def _warm_up():
+    # imports and numba compilation of the first call would count towards the peak
+    compute_gene_selection(
+        alias_layer(_synthetic_adata(200, 100)), layer="counts", n_top_genes=10, flavor="cell_ranger"
+    )
+
+
+def test_alias_layer_shares_x():
+    adata = _synthetic_adata()
+    adata, peak = _peak_memory(alias_layer, adata)
+    assert adata.layers["counts"] is adata.X
+    assert peak < 0.05 * _nbytes(adata.X)
+
+
+def test_gene_counts_does_not_densify(adata):
+    counts, peak = _peak_memory(gene_counts, adata.X)
+    np.testing.assert_allclose(counts, adata.X.toarray().sum(axis=0), rtol=1e-6)
+    assert peak < 0.1 * _nbytes(adata.X)
+
+
+def test_hash_anndata_does_not_copy(adata):
+    digest, peak = _peak_memory(hash_anndata, adata, layers=(None, "counts"), obs_keys=("batch",))
+    copied = _synthetic_adata()
+    copied.layers["counts"] = copied.X.copy()
+    assert digest == hash_anndata(copied, layers=(None, "counts"), obs_keys=("batch",))
+    assert peak < 0.1 * _nbytes(adata.X)
+
+
+def test_subset_var_copies_selected_columns_once(adata):
+    subset, peak = _peak_memory(subset_var, adata, np.arange(0, N_VARS, 2))
+    assert sparse.issparse(subset.X)
+    assert subset.layers["counts"] is subset.X
+    # half of the columns are copied, the aliased layer is not copied again
+    assert peak < _nbytes(adata.X)
+
+
+def test_subsets_of_one_dataset_are_annotated_independently(adata):
+    adata.uns["source"] = "synthetic"
+    first = subset_var(adata, np.arange(0, N_VARS, 2))
+    second = subset_var(adata, np.arange(1, N_VARS, 2))
+    first.obs["modality"] = "rna"
+    first.uns["modality"] = "rna"
+
+    assert "modality" not in second.obs and "modality" not in adata.obs
+    assert "modality" not in second.uns and "modality" not in adata.uns
+    assert second.uns["source"] == "synthetic"
+
+
+def test_compute_gene_selection_does_not_densify(adata):
+    selection, peak = _peak_memory(
+        compute_gene_selection, adata, layer="counts", min_counts=1, n_top_genes=500, flavor="cell_ranger"
+    )
+    assert adata.n_vars == len(selection) == 500
+    assert sparse.issparse(adata.X)
+    assert adata.layers["counts"] is adata.X
+    assert peak < 2 * _nbytes(_synthetic_adata().X)
+
+
+def test_apply_gene_selection_keeps_aliases(adata):
+    selection = compute_gene_selection(_synthetic_adata(), n_top_genes=500, flavor="cell_ranger")
+    n_bytes = _nbytes(adata.X)
+    _, peak = _peak_memory(apply_gene_selection, adata, selection)
+    assert list(adata.var_names) == list(selection.index)
+    assert adata.layers["counts"] is adata.X
+    assert peak < n_bytes
@@ -0,0 +1,56 @@
+import pytest
+
+from scvi_hub_models.models import BaseModelWorkflow
+
+CONFIG = {"model_dir": "model", "extra_data_kwargs": {"large_training_file_name": "data.h5ad", "hash": "abc"}}
+
+
+def _workflow(tmp_path, config=None, **kwargs) -> BaseModelWorkflow:
+    return BaseModelWorkflow(save_dir=str(tmp_path / "workflow"), config=config or CONFIG, resume=True, **kwargs)
+
+
+def _run_stage(workflow: BaseModelWorkflow, inputs: dict | None = None) -> bool:
+    """Run the stage ``"minify"``, returning whether it was skipped."""
+    with workflow.stage("minify", inputs=inputs) as stage:
+        if not stage.done:
+            stage.outputs["model_path"] = "model"
+    return stage.done
+
+
+def test_stage_is_skipped_with_same_inputs(tmp_path):
+    assert not _run_stage(_workflow(tmp_path), {"data": "abc"})
+    assert _run_stage(_workflow(tmp_path), {"data": "abc"})
+    assert not _run_stage(_workflow(tmp_path), {"data": "def"})
+
+
+@pytest.mark.parametrize("flag", ["reload_data", "reload_model"])
+def test_stage_reruns_when_reload_flags_change(tmp_path, flag):
+    assert not _run_stage(_workflow(tmp_path))
+    assert not _run_stage(_workflow(tmp_path, **{flag: False}))
+
+
+def test_artifact_digests_of_reloaded_data(tmp_path):
+    assert _workflow(tmp_path)._artifact_digests() == {"data": "abc", "model": None}
+
+
+def test_artifact_digests_resolve_census_version(tmp_path):
+    config = {"model_dir": "model", "extra_data_kwargs": {"reference_adata_cxg_id": "dataset"}}
+    workflow = _workflow(tmp_path, config)
+    workflow._census_releases = {"stable": "2025-01-30"}
+    assert workflow._artifact_digests()["data"] == "cellxgene:2025-01-30:dataset"
+
+
+def test_artifact_digests_of_pulled_data(tmp_path, monkeypatch):
+    import scvi_hub_models.models._base_workflow as base_workflow
+
+    monkeypatch.setattr(base_workflow, "repo_path", str(tmp_path))
+    (tmp_path / "data").mkdir()
+    workflow = _workflow(tmp_path, reload_data=False, reload_model=False)
+    assert workflow._artifact_digests() == {"data": None, "model": None}
+
+    (tmp_path / "data" / "data.h5ad.dvc").write_text("outs:\n- md5: 0123\n  path: data.h5ad\n")
+    (tmp_path / "data" / "model.dvc").write_text("outs:\n- md5: 4567\n  path: model\n")
+    digests = workflow._artifact_digests()
+    assert digests["data"] is not None and digests["model"] is not None
+    (tmp_path / "data" / "data.h5ad.dvc").write_text("outs:\n- md5: 89ab\n  path: data.h5ad\n")
+    assert workflow._artifact_digests()["data"] != digests["data"]
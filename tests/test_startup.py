@@ -0,0 +1,44 @@
+import json
+import subprocess
+import sys
+
+from scvi_hub_models.config import json_data_store
+
+_RUN_CLI = """
+import json, sys
+from scvi_hub_models.__main__ import run_workflow
+from scvi_hub_models.config import json_data_store
+
+run_workflow({args!r}, standalone_mode=False)
+print(json.dumps({{
+    "modules": {{name: name in sys.modules for name in ("dvc", "git", "scvi")}},
+    "configs": sorted(json_data_store._cache),
+}}))
+"""
+
+
+def _run_cli(args: list[str], cwd) -> dict:
+    """Run the CLI with ``args`` in a fresh interpreter and return which modules and configs it loaded."""
+    result = subprocess.run(
+        [sys.executable, "-c", _RUN_CLI.format(args=args)],
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+        timeout=600,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_dry_run_does_not_import_dvc_or_git(tmp_path):
+    assert "test_scvi" in json_data_store
+    loaded = _run_cli(["--model_name", "test_scvi", "--dry_run", "True"], tmp_path)
+    assert not loaded["modules"]["dvc"]
+    assert not loaded["modules"]["git"]
+    assert loaded["configs"] == ["test_scvi"]
+
+
+def test_help_does_not_import_scvi(tmp_path):
+    loaded = _run_cli(["--help"], tmp_path)
+    assert loaded["modules"] == {"dvc": False, "git": False, "scvi": False}
+    assert loaded["configs"] == []
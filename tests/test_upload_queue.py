@@ -0,0 +1,232 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+from scvi_hub_models.models import BaseModelWorkflow
+from scvi_hub_models.utils import UploadQueue
+
+
+class _FlakyHandler(BaseHTTPRequestHandler):
+    """Accepts PUT requests, answering the first ``server.failures`` of them with ``server.status``."""
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_PUT(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        time.sleep(self.server.delay)
+        with self.server.lock:
+            self.server.requests += 1
+            failed = self.server.failures > 0
+            if failed:
+                self.server.failures -= 1
+            else:
+                self.server.received[self.path] = body
+        self.send_response(self.server.status if failed else 200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FlakyHandler)
+    server.lock = threading.Lock()
+    server.failures, server.status, server.delay = 0, 503, 0.0
+    server.requests = 0
+    server.received = {}
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _put(url: str, payload: bytes):
+    def upload() -> int:
+        requests.put(url, data=payload, timeout=10).raise_for_status()
+        return len(payload)
+
+    return upload
+
+
+def test_upload_retries_transient_errors(server):
+    server.failures = 2
+    succeeded = []
+    with UploadQueue(retries=3, backoff=0.01) as queue:
+        queue.submit("model", _put(f"{server.url}/model", b"weights"), on_success=lambda: succeeded.append("model"))
+
+    assert server.received == {"/model": b"weights"}
+    assert server.requests == 3
+    assert succeeded == ["model"]
+    assert queue.summary["model"]["attempts"] == 3
+    assert queue.summary["model"]["size"] == len(b"weights")
+
+
+def test_upload_fails_after_retries(server):
+    server.failures = 5
+    succeeded = []
+    queue = UploadQueue(retries=2, backoff=0.01)
+    queue.submit("model", _put(f"{server.url}/model", b"weights"), on_success=lambda: succeeded.append("model"))
+
+    with pytest.raises(RuntimeError, match="model"):
+        queue.wait()
+    assert server.requests == 3
+    assert server.received == {}
+    assert succeeded == []
+
+
+def test_upload_does_not_retry_client_errors(server):
+    server.failures, server.status = 1, 404
+    queue = UploadQueue(retries=3, backoff=0.01)
+    queue.submit("model", _put(f"{server.url}/model", b"weights"))
+
+    with pytest.raises(RuntimeError, match="model"):
+        queue.wait()
+    assert server.requests == 1
+
+
+def test_exit_drains_pending_uploads(server):
+    server.failures, server.delay = 3, 0.05
+    names = [f"file_{i}" for i in range(6)]
+    with UploadQueue(max_workers=2, retries=3, backoff=0.01) as queue:
+        for name in names:
+            queue.submit(name, _put(f"{server.url}/{name}", name.encode()))
+        assert queue.pending > 0
+
+    assert queue.pending == 0
+    assert server.received == {f"/{name}": name.encode() for name in names}
+    assert set(queue.summary) == set(names)
+
+
+def test_exit_keeps_the_original_error(server):
+    server.failures = 5
+    with pytest.raises(ValueError, match="computation failed"):
+        with UploadQueue(retries=1, backoff=0.01) as queue:
+            queue.submit("model", _put(f"{server.url}/model", b"weights"))
+            raise ValueError("computation failed")
+    assert queue.pending == 0
+
+
+@pytest.fixture
+def hub_model(tmp_path):
+    from huggingface_hub import ModelCard
+    from scvi.hub import HubMetadata, HubModel
+
+    local_dir = tmp_path / "model"
+    local_dir.mkdir()
+    (local_dir / "model.pt").write_bytes(b"weights")
+    return HubModel(str(local_dir), metadata=HubMetadata("1.0.0", "0.10.0", "SCVI"), model_card=ModelCard("# Model"))
+
+
+@pytest.fixture
+def hub(monkeypatch):
+    """Fake Hugging Face Hub recording created repositories and pushes, ``push`` fails with queued errors."""
+    from scvi.hub import HubModel
+
+    hub = SimpleNamespace(created=[], pushes=[], errors=[], started=threading.Event(), release=threading.Event())
+    hub.release.set()
+
+    def push_to_huggingface_hub(self, repo_name, repo_create=False, **kwargs):
+        hub.started.set()
+        hub.release.wait(10)
+        hub.pushes.append((repo_name, repo_create))
+        if hub.errors:
+            raise hub.errors.pop(0)
+
+    monkeypatch.setattr(HubModel, "push_to_huggingface_hub", push_to_huggingface_hub)
+    monkeypatch.setattr("huggingface_hub.create_repo", lambda repo_name, **kwargs: hub.created.append(repo_name))
+    return hub
+
+
+def _upload_workflow(tmp_path, **settings) -> BaseModelWorkflow:
+    # by default, every push uploads all files
+    upload_settings = {
+        "retries": 2,
+        "backoff": 0.01,
+        "skip_unchanged": False,
+        "manifest_dir": str(tmp_path / "uploads"),
+        **settings,
+    }
+    return BaseModelWorkflow(save_dir=str(tmp_path / "workflow"), config={"upload_settings": upload_settings})
+
+
+def test_upload_hub_model_is_queued(tmp_path, hub_model, hub):
+    hub.release.clear()
+    workflow = _upload_workflow(tmp_path)
+    with workflow.upload_queue as queue:
+        workflow._upload_hub_model(hub_model, "scvi-tools/model")
+        # the workflow continues while the push runs
+        assert hub.started.wait(10)
+        assert queue.pending == 1
+        hub.release.set()
+
+    assert hub.pushes == [("scvi-tools/model", False)]
+    assert hub.created == ["scvi-tools/model"]
+    assert queue.summary["scvi-tools/model"]["attempts"] == 1
+
+
+def test_failed_push_surfaces_on_wait(tmp_path, hub_model, hub):
+    hub.errors = [ValueError("invalid model card")]
+    workflow = _upload_workflow(tmp_path)
+    workflow._upload_hub_model(hub_model, "scvi-tools/model")
+
+    with pytest.raises(RuntimeError, match="scvi-tools/model") as excinfo:
+        workflow.upload_queue.wait()
+    assert isinstance(excinfo.value.__cause__, ValueError)
+    assert len(hub.pushes) == 1
+
+
+def test_failed_push_surfaces_on_exit(tmp_path, hub_model, hub):
+    hub.errors = [ValueError("invalid model card")]
+    workflow = _upload_workflow(tmp_path)
+    with pytest.raises(RuntimeError, match="scvi-tools/model"):
+        with workflow.upload_queue:
+            workflow._upload_hub_model(hub_model, "scvi-tools/model")
+
+
+def test_retried_push_does_not_recreate_repo(tmp_path, hub_model, hub):
+    hub.errors = [requests.ConnectionError("connection reset"), requests.ConnectionError("connection reset")]
+    workflow = _upload_workflow(tmp_path)
+    with workflow.upload_queue as queue:
+        workflow._upload_hub_model(hub_model, "scvi-tools/model")
+
+    assert hub.pushes == [("scvi-tools/model", False)] * 3
+    assert hub.created == ["scvi-tools/model"]
+    assert queue.summary["scvi-tools/model"]["attempts"] == 3
+
+
+def test_changed_files_are_pushed_to_configured_collection(tmp_path, hub_model, hub, monkeypatch):
+    from huggingface_hub import HfApi
+
+    import scvi_hub_models.models._base_workflow as base_workflow
+
+    commits, collections = [], []
+    monkeypatch.setattr(base_workflow, "remote_manifest", lambda *args, **kwargs: None)
+    monkeypatch.setattr(
+        HfApi,
+        "create_commit",
+        lambda self, repo_id, operations, **kwargs: commits.append([op.path_in_repo for op in operations]),
+    )
+    monkeypatch.setattr(
+        "huggingface_hub.add_collection_item",
+        lambda collection_slug, item_id, **kwargs: collections.append((collection_slug, item_id)),
+    )
+    workflow = _upload_workflow(tmp_path, skip_unchanged=True, collections={"SCVI": "lab/scvi-models"})
+
+    with workflow.upload_queue:
+        workflow._upload_hub_model(hub_model, "lab/model")
+    (tmp_path / "model" / "model.pt").write_bytes(b"new weights")
+    with workflow.upload_queue:
+        workflow._upload_hub_model(hub_model, "lab/model")
+    with workflow.upload_queue:
+        workflow._upload_hub_model(hub_model, "lab/model")
+
+    assert hub.pushes == [("lab/model", False)]
+    assert commits == [["model.pt"]]
+    assert collections == [("lab/scvi-models", "lab/model")] * 2
+    assert workflow.upload_queue.summary["lab/model"]["size"] == 0